@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QObject, QTimer
+from PyQt5.QtGui import QImageReader, QPixmap
+
+import metrics
+
+# Frames shorter than this are treated like browsers do, as "use the default"
+MIN_FRAME_DELAY = 20
+DEFAULT_FRAME_DELAY = 100
+
+
+class DecodedAnimation:
+    def __init__(self, key, frames, delays):
+        self.key = key
+        self.frames = frames
+        self.delays = delays
+        self.cost = sum(frame.width() * frame.height() * 4 for frame in frames)
+
+
+def decode_animation(path, size=None):
+    reader = QImageReader(path)
+    frames = []
+    delays = []
+    while reader.canRead():
+        image = reader.read()
+        if image.isNull():
+            break
+        if size is not None and image.size() != size:
+            image = image.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        delay = reader.nextImageDelay()
+        frames.append(QPixmap.fromImage(image))
+        delays.append(delay if delay >= MIN_FRAME_DELAY else DEFAULT_FRAME_DELAY)
+    return frames, delays
+
+
+class AnimationCache:
+    # Decoded and scaled frames keyed by (path, size), evicted LRU past a byte budget
+    def __init__(self, budget_bytes=8 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()
+        self.total_cost = 0
+        self.hits = 0
+        self.misses = 0
+        self.decode_seconds = 0.0
+
+    def get(self, path, size=None):
+        key = (path, (size.width(), size.height()) if size is not None else None)
+        animation = self.entries.get(key)
+        if animation is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return animation
+
+        self.misses += 1
+        started = time.perf_counter()
+        frames, delays = decode_animation(path, size)
+        self.decode_seconds += time.perf_counter() - started
+        animation = DecodedAnimation(key, frames, delays)
+        if not frames:
+            return animation
+
+        self.entries[key] = animation
+        self.total_cost += animation.cost
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self.total_cost > self.budget_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_cost -= evicted.cost
+        return animation
+
+    def clear(self):
+        self.entries.clear()
+        self.total_cost = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_cost,
+            "hits": self.hits,
+            "misses": self.misses,
+            "decode_ms": self.decode_seconds * 1000,
+        }
+
+
+animation_cache = AnimationCache()
+metrics.add_source("animation_cache", animation_cache.stats)
+
+
+class AnimationPlayer(QObject):
+    # Steps a QLabel through pre-decoded frames; nothing is decoded during playback
+    def __init__(self, label, parent=None):
+        super().__init__(parent)
+        self.label = label
+        self.animation = None
+        self.frame_index = 0
+        self.paused = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.next_frame)
+
+    def play(self, animation):
+        if animation is self.animation:
+            return
+        self.animation = animation
+        self.frame_index = 0
+        self.timer.stop()
+        if animation.frames:
+            self.show_frame()
+        else:
+            self.label.clear()
+
+    def pause(self):
+        self.paused = True
+        self.timer.stop()
+
+    def resume(self):
+        self.paused = False
+        if self.animation is not None and self.animation.frames and not self.timer.isActive():
+            self.show_frame()
+
+    def stop(self):
+        self.timer.stop()
+        self.animation = None
+
+    def show_frame(self):
+        self.label.setPixmap(self.animation.frames[self.frame_index])
+        if len(self.animation.frames) > 1 and not self.paused:
+            self.timer.start(self.animation.delays[self.frame_index])
+
+    def next_frame(self):
+        self.frame_index = (self.frame_index + 1) % len(self.animation.frames)
+        self.show_frame()
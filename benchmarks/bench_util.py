@@ -0,0 +1,10 @@
+# Helpers shared by the benchmark scripts, which put this directory on sys.path
+from PyQt5.QtCore import QTimer, QEventLoop
+
+
+def spin(seconds):
+    # Runs the event loop for a while, so timers, signals and threads' queued
+    # calls are delivered as they would be in the widget's own loop
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
@@ -0,0 +1,189 @@
+# Stand-in for vlc.MediaPlayer that needs no libVLC. It plays a silent track
+# of a given length in real time and delivers events from its own thread,
+# just like libVLC does.
+import time
+import threading
+from types import SimpleNamespace
+
+import vlc
+
+
+class FakeEventManager:
+    def __init__(self):
+        self.callbacks = {}
+        # Events that reached an attached callback, i.e. woke the widget
+        self.delivered = 0
+
+    def event_attach(self, event_type, callback, *args, **kwargs):
+        self.callbacks[event_type] = (callback, args, kwargs)
+
+    def event_detach(self, event_type):
+        self.callbacks.pop(event_type, None)
+
+    def emit(self, event_type, **fields):
+        entry = self.callbacks.get(event_type)
+        if entry is not None:
+            self.delivered += 1
+            callback, args, kwargs = entry
+            callback(SimpleNamespace(type=event_type, u=SimpleNamespace(**fields)), *args, **kwargs)
+
+
+class FakeMedia:
+    # Preparsing takes parse_delay_s and reports the player's track length
+    def __init__(self, mrl, length_ms, parse_delay_s):
+        self.mrl = mrl
+        self.length_ms = length_ms
+        self.parse_delay_s = parse_delay_s
+        self.events = FakeEventManager()
+        self.parsed_status = 0
+        self.parses = 0
+
+    def event_manager(self):
+        return self.events
+
+    def parse_with_options(self, flags, timeout_ms):
+        self.parses += 1
+        threading.Thread(target=self._parse, daemon=True).start()
+        return 0
+
+    def _parse(self):
+        time.sleep(self.parse_delay_s)
+        self.parsed_status = vlc.MediaParsedStatus.done
+        self.events.emit(vlc.EventType.MediaParsedChanged, new_status=self.parsed_status)
+
+    def get_parsed_status(self):
+        return self.parsed_status
+
+    def get_duration(self):
+        return self.length_ms if self.parsed_status == vlc.MediaParsedStatus.done else -1
+
+    def get_meta(self, meta):
+        return None
+
+
+class FakeInstance:
+    def __init__(self, player):
+        self.player = player
+
+    def media_new(self, mrl):
+        media = FakeMedia(mrl, self.player.length_ms, self.player.parse_delay_s)
+        self.player.media_created.append(media)
+        return media
+
+
+class FakeMediaPlayer:
+    def __init__(self, length_ms=3000, time_step_ms=250, parse_delay_s=0.05):
+        self.length_ms = length_ms
+        self.time_step_ms = time_step_ms
+        self.events = FakeEventManager()
+        self.mrl = None
+        self.state = vlc.State.NothingSpecial
+        self.position_ms = 0
+        self.started_at = None
+        self.calls = []
+        self.lock = threading.Lock()
+        self.run_id = 0
+        self.ended_at = []
+        self.restarted_at = []
+        self.parse_delay_s = parse_delay_s
+        self.media_created = []
+        self.volume = 100
+
+    def event_manager(self):
+        return self.events
+
+    def get_instance(self):
+        return FakeInstance(self)
+
+    def set_media(self, media):
+        self.calls.append("set_media")
+        self.stop()
+        self.mrl = media.mrl
+        self.position_ms = 0
+
+    def set_mrl(self, mrl):
+        self.calls.append("set_mrl")
+        self.stop()
+        self.mrl = mrl
+        self.position_ms = 0
+
+    def play(self):
+        self.calls.append("play")
+        with self.lock:
+            if self.state == vlc.State.Playing:
+                return 0
+            if self.state in (vlc.State.Ended, vlc.State.Stopped):
+                self.position_ms = 0
+            if self.ended_at and len(self.restarted_at) < len(self.ended_at):
+                self.restarted_at.append(time.monotonic())
+            self.state = vlc.State.Playing
+            self.started_at = time.monotonic() - self.position_ms / 1000
+            self.run_id += 1
+            run_id = self.run_id
+        self.events.emit(vlc.EventType.MediaPlayerLengthChanged, new_length=self.length_ms)
+        self.events.emit(vlc.EventType.MediaPlayerPlaying)
+        threading.Thread(target=self._run, args=(run_id,), daemon=True).start()
+        return 0
+
+    def pause(self):
+        self.calls.append("pause")
+        with self.lock:
+            if self.state != vlc.State.Playing:
+                return
+            self.position_ms = self.get_time()
+            self.state = vlc.State.Paused
+        self.events.emit(vlc.EventType.MediaPlayerPaused)
+
+    def stop(self):
+        self.calls.append("stop")
+        with self.lock:
+            if self.state in (vlc.State.NothingSpecial, vlc.State.Stopped):
+                return
+            self.state = vlc.State.Stopped
+            self.position_ms = 0
+        self.events.emit(vlc.EventType.MediaPlayerStopped)
+
+    def is_playing(self):
+        return self.state == vlc.State.Playing
+
+    def get_state(self):
+        return self.state
+
+    def get_length(self):
+        return self.length_ms
+
+    def get_time(self):
+        if self.state == vlc.State.Playing:
+            return min(self.length_ms, int((time.monotonic() - self.started_at) * 1000))
+        return self.position_ms
+
+    def set_time(self, time_ms):
+        self.calls.append("set_time")
+        with self.lock:
+            self.position_ms = max(0, min(self.length_ms, int(time_ms)))
+            self.started_at = time.monotonic() - self.position_ms / 1000
+
+    def audio_set_volume(self, volume):
+        self.calls.append("audio_set_volume")
+        self.volume = volume
+        return 0
+
+    def audio_get_volume(self):
+        return self.volume
+
+    def _run(self, run_id):
+        while True:
+            time.sleep(self.time_step_ms / 1000)
+            with self.lock:
+                if self.state != vlc.State.Playing or run_id != self.run_id:
+                    return
+                now = self.get_time()
+                ended = now >= self.length_ms
+                if ended:
+                    self.state = vlc.State.Ended
+                    self.position_ms = self.length_ms
+                    self.ended_at.append(time.monotonic())
+            self.events.emit(vlc.EventType.MediaPlayerTimeChanged, new_time=now)
+            if ended:
+                self.events.emit(vlc.EventType.MediaPlayerEndReached)
+                return
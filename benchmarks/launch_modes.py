@@ -0,0 +1,77 @@
+# Compares launcher host mode (all widgets in one QApplication) against
+# isolated mode (one interpreter per widget).
+#
+#   python benchmarks/launch_modes.py [--widgets clock,weather,mplayer]
+#
+# Run with QT_QPA_PLATFORM=offscreen to benchmark without a display.
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_child(names, spawned_at):
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import importlib
+    from PyQt5.QtWidgets import QApplication
+    from launcher import WIDGETS
+
+    app = QApplication(sys.argv[:1])
+    windows = []
+    for name in names:
+        _, _, module_name, factory = WIDGETS[name]
+        module = importlib.import_module(module_name)
+        windows.append(getattr(module, factory)(hosted=True))
+    app.processEvents()
+    print(json.dumps({"elapsed": time.time() - spawned_at, "rss_kb": rss_kb()}))
+
+
+def spawn(names):
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), "--child", ",".join(names), str(time.time())],
+        cwd=ROOT,
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--widgets", default="clock,weather,mplayer")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("spawned_at", nargs="?", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child.split(","), args.spawned_at)
+        return
+
+    names = args.widgets.split(",")
+    hosted = spawn(names)
+    isolated = [spawn([name]) for name in names]
+
+    print(f"{'mode':<10}{'processes':>10}{'startup s':>12}{'RSS MB':>10}")
+    print(f"{'host':<10}{1:>10}{hosted['elapsed']:>12.2f}{hosted['rss_kb'] / 1024:>10.1f}")
+    print(f"{'isolated':<10}{len(isolated):>10}"
+          f"{sum(r['elapsed'] for r in isolated):>12.2f}"
+          f"{sum(r['rss_kb'] for r in isolated) / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
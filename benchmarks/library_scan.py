@@ -0,0 +1,73 @@
+# Scan throughput of the music library indexer on a synthetic folder tree
+# of short WAV files: a cold full scan followed by an incremental rescan
+# after touching a fraction of the files.
+#
+#   python benchmarks/library_scan.py [--files 2000] [--depth 3]
+import os
+import sys
+import wave
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from music_library import scan_folders, LibraryIndex
+
+
+def write_wav(path, frames):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(b"\0\0" * frames)
+
+
+def build_tree(root, files, depth, fanout=8):
+    paths = []
+    for i in range(files):
+        parts = [f"dir{(i // fanout ** level) % fanout}" for level in range(1, depth + 1)]
+        directory = os.path.join(root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"track{i:05d}.wav")
+        write_wav(path, 800 + i % 800)
+        paths.append(path)
+    return paths
+
+
+def report(label, stats):
+    rate = stats["files"] / stats["seconds"] if stats["seconds"] else float("inf")
+    print(f"{label:<18}{stats['files']:>8}{stats['probed']:>8}{stats['seconds']:>10.3f}{rate:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--touch", type=float, default=0.05, help="fraction of files modified before the rescan")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="library-bench-")
+    try:
+        music = os.path.join(workdir, "music")
+        index_path = os.path.join(workdir, "library.sqlite3")
+        paths = build_tree(music, args.files, args.depth)
+
+        print(f"{'scan':<18}{'files':>8}{'probed':>8}{'seconds':>10}{'files/s':>12}")
+        report("cold", scan_folders(index_path, [music], workers=args.workers))
+        report("unchanged", scan_folders(index_path, [music], workers=args.workers))
+        for path in paths[::max(1, int(1 / args.touch))]:
+            write_wav(path, 1600)
+        report("incremental", scan_folders(index_path, [music], workers=args.workers))
+
+        index = LibraryIndex(index_path)
+        print(f"indexed tracks: {index.count()}, sample search: {len(index.search('track01'))} hits")
+        index.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
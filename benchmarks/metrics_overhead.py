@@ -0,0 +1,50 @@
+# Cost of the instrumentation calls the widgets make, with collection off and on.
+#
+#   python benchmarks/metrics_overhead.py [--calls 200000]
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics
+
+
+def per_call_ns(calls, fn):
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) * 1e9 / calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    counter = metrics.counter("bench.counter")
+    histogram = metrics.histogram("bench.latency_ms")
+
+    def timed():
+        with histogram.time():
+            pass
+
+    cases = [
+        ("empty loop", lambda: None),
+        ("counter.inc", counter.inc),
+        ("histogram.observe", lambda: histogram.observe(1.5)),
+        ("histogram.time", timed),
+    ]
+    print(f"{'call':<20} {'off ns':>8} {'on ns':>8}")
+    for name, fn in cases:
+        metrics.disable()
+        off = per_call_ns(args.calls, fn)
+        metrics.enable()
+        on = per_call_ns(args.calls, fn)
+        print(f"{name:<20} {off:>8.0f} {on:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
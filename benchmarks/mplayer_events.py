@@ -0,0 +1,75 @@
+# Drives TransparentMusicPlayer with a fake libVLC player and reports how
+# long opening a track takes to show its duration (first open and reopen),
+# how quickly looping restarts after EndReached and how often the UI timer
+# wakes while visible and while hidden.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/mplayer_events.py
+import os
+import sys
+import time
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+# Keep the media info cache written by this run away from the real one
+os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="mplayer-events-")
+
+from PyQt5.QtWidgets import QApplication
+
+from bench_util import spin
+from fake_vlc import FakeMediaPlayer
+
+
+def time_to_duration(widget, path):
+    started = time.perf_counter()
+    widget.open_track(path)
+    while not widget.length_ms and time.perf_counter() - started < 2:
+        QApplication.processEvents()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    app = QApplication(sys.argv[:1])
+    import mplayer
+
+    fake = FakeMediaPlayer(length_ms=1200)
+    widget = mplayer.TransparentMusicPlayer(hosted=True, player=fake)
+    widget.show()
+
+    track = os.path.join(os.environ["WIDGETS_DATA_DIR"], "silence.mp3")
+    with open(track, "wb") as f:
+        f.write(b"\0" * 1024)
+    first_open = time_to_duration(widget, track)
+    reopen = time_to_duration(widget, track)
+    parses = sum(media.parses for media in fake.media_created)
+    plays_while_loading = fake.calls.count("play")
+
+    wakeups = []
+    widget.timer.triggered.connect(lambda: wakeups.append(widget.isVisible()))
+
+    widget.toggle_loop()
+    widget.toggle_play_pause()
+    spin(4.0)
+    visible_wakeups = len(wakeups)
+
+    widget.hide()
+    spin(4.0)
+    hidden_wakeups = len(wakeups) - visible_wakeups
+
+    print(f"duration, first open:   {first_open:.1f} ms")
+    print(f"duration, reopen:       {reopen:.1f} ms")
+    print(f"parses for 2 opens:     {parses}")
+    print(f"play() while loading:   {plays_while_loading}")
+    latencies = [(r - e) * 1000 for e, r in zip(fake.ended_at, fake.restarted_at)]
+    print(f"loop restarts:          {len(latencies)}")
+    if latencies:
+        print(f"restart latency:        max {max(latencies):.1f} ms, mean {sum(latencies) / len(latencies):.1f} ms")
+    print(f"UI wakeups visible 4s:  {visible_wakeups}")
+    print(f"UI wakeups hidden 4s:   {hidden_wakeups}")
+    widget.exit_widget()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Plays a long track on the fake libVLC player and reports how the progress
+# display behaves: GUI wakeups per second (progress redraws plus libVLC
+# events delivered) while visible and while hidden, how far the playhead is
+# from the player's own time at each redraw and how far it moves per redraw,
+# and how a drag across the progress bar turns into set_time calls. Fails if
+# the playhead jumps more than a pixel per redraw, or if playback wakes the
+# GUI thread more often than the time label and the playhead change.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/mplayer_progress.py [--length 240] [--seconds 10]
+import os
+import sys
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="mplayer-progress-")
+
+from PyQt5.QtCore import Qt, QEvent, QPoint
+from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtWidgets import QApplication
+
+from bench_util import spin
+from fake_vlc import FakeMediaPlayer
+
+
+def mouse(widget, kind, x, buttons=Qt.LeftButton):
+    button = Qt.LeftButton if kind != QEvent.MouseMove else Qt.NoButton
+    event = QMouseEvent(kind, QPoint(x, widget.height() // 2), button, buttons, Qt.NoModifier)
+    QApplication.sendEvent(widget, event)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--length", type=float, default=240, help="track length in seconds")
+    parser.add_argument("--seconds", type=float, default=10, help="how long to play while visible")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    import mplayer
+
+    fake = FakeMediaPlayer(length_ms=int(args.length * 1000))
+    widget = mplayer.TransparentMusicPlayer(hosted=True, player=fake)
+    widget.show()
+    track = os.path.join(os.environ["WIDGETS_DATA_DIR"], "track.mp3")
+    with open(track, "wb") as f:
+        f.write(b"\0" * 1024)
+    widget.open_track(track)
+    spin(0.3)
+
+    ticks = []
+
+    def on_tick():
+        ticks.append((fake.get_time(), widget.playback_position_ms(), widget.seek_bar.played_x))
+
+    widget.timer.triggered.connect(on_tick)
+    widget.toggle_play_pause()
+    events_before = fake.events.delivered
+    spin(args.seconds)
+    visible_ticks = len(ticks)
+    visible_events = fake.events.delivered - events_before
+    visible_rate = (visible_ticks + visible_events) / args.seconds
+
+    widget.hide()
+    events_before = fake.events.delivered
+    spin(args.seconds / 2)
+    hidden_wakeups = len(ticks) - visible_ticks + fake.events.delivered - events_before
+    widget.show()
+    spin(0.2)
+
+    errors = [abs(displayed - actual) for actual, displayed, _ in ticks[:visible_ticks]]
+    steps = [b[2] - a[2] for a, b in zip(ticks, ticks[1:visible_ticks])]
+    print(f"{args.length:.0f} s track, {widget.seek_bar.width()} px bar, player time step {fake.time_step_ms} ms")
+    print(f"visible: {visible_rate:.2f} wakeups/s "
+          f"({visible_ticks} redraws, {visible_events} libVLC events)")
+    print(f"hidden:  {hidden_wakeups / (args.seconds / 2):.2f} wakeups/s")
+    print(f"playhead vs player time: max {max(errors)} ms off; moves per redraw: max {max(steps)} px, "
+          f"{sum(1 for step in steps if step == 0)} redraws for the label only")
+
+    # Drag from a quarter to three quarters of the bar over 0.6 s, 60 mouse moves
+    bar = widget.seek_bar
+    set_time_before = fake.calls.count("set_time")
+    mouse(bar, QEvent.MouseButtonPress, bar.width() // 4)
+    for step in range(60):
+        x = bar.width() // 4 + step * (bar.width() // 2) // 60
+        mouse(bar, QEvent.MouseMove, x)
+        spin(0.01)
+    target = bar.width() * 3 // 4
+    mouse(bar, QEvent.MouseButtonRelease, target, Qt.NoButton)
+    spin(0.05)
+    expected = target / bar.width() * fake.length_ms
+    print(f"drag with 60 moves: {fake.calls.count('set_time') - set_time_before} set_time calls, "
+          f"player lands {abs(fake.get_time() - expected):.0f} ms from the release point")
+    widget.exit_widget()
+    assert max(steps) <= 1, f"the playhead jumped {max(steps)} px in one redraw"
+    # One wakeup per label change and per pixel step, plus one for a partial second
+    changes = args.seconds * (1 + bar.width() / args.length) + 1
+    assert visible_ticks + visible_events <= changes, \
+        f"playback woke the GUI {visible_ticks + visible_events} times for {changes:.0f} label and playhead changes"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# Paint time per frame of a player-sized widget while it is dragged, fully
+# repainted and while its labels update, comparing the old cascading
+# stylesheet background with TranslucentPanel. "show" is construction through
+# the first paint, over 20 windows. "drag" is a move as the dragger does it,
+# with the paints it caused counted; "repaint" forces the whole window to
+# redraw, as when it is first exposed. The stylesheet's own background is never
+# drawn on a translucent window (only its children get one), so it does less
+# work per full repaint than the panel; the last column says which drew it.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/repaint_cost.py [--frames 300]
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt5.QtCore import Qt, QSize, QObject, QEvent
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QPushButton, QProgressBar, QVBoxLayout, QHBoxLayout
+
+from panel import TranslucentPanel
+
+CASCADE = """
+    QWidget {
+        background-color: rgba(0, 0, 0, 180);
+        color: white;
+        border-radius: 10px;
+    }
+    QLabel {
+        color: white;
+        font-size: 14px;
+    }
+"""
+LABEL = "color: white; font-size: 14px;"
+BUTTON = "background-color: transparent; border: none;"
+
+
+def populate(window, label_style):
+    layout = QVBoxLayout(window)
+    window.title = QLabel("No Music Loaded", window)
+    window.time = QLabel("00:00 / 00:00", window)
+    progress = QProgressBar(window)
+    progress.setTextVisible(False)
+    progress.setValue(40)
+    controls = QHBoxLayout()
+    for text in ("Play", "Stop", "Load"):
+        button = QPushButton(text, window)
+        button.setIconSize(QSize(32, 32))
+        button.setStyleSheet(BUTTON)
+        controls.addWidget(button)
+    for label in (window.title, window.time):
+        label.setAlignment(Qt.AlignCenter)
+        if label_style:
+            label.setStyleSheet(label_style)
+        layout.addWidget(label)
+    layout.addWidget(progress)
+    layout.addLayout(controls)
+    return window
+
+
+def make_stylesheet():
+    window = QWidget()
+    window.setAttribute(Qt.WA_TranslucentBackground)
+    window.setStyleSheet(CASCADE)
+    return populate(window, None)
+
+
+def make_panel():
+    window = TranslucentPanel(QColor(0, 0, 0, 180), radius=10)
+    return populate(window, LABEL)
+
+
+APPROACHES = [
+    ("stylesheet", make_stylesheet),
+    ("panel", make_panel),
+]
+
+
+class PaintCounter(QObject):
+    def __init__(self):
+        super().__init__()
+        self.paints = 0
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            self.paints += 1
+        return False
+
+
+def time_frames(frames, frame):
+    samples = []
+    for i in range(frames):
+        start = time.perf_counter()
+        frame(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def build(factory):
+    window = factory()
+    window.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool)
+    window.resize(300, 200)
+    window.show()
+    QApplication.processEvents()
+    return window
+
+
+def close(window):
+    window.close()
+    window.deleteLater()
+    QApplication.processEvents()
+
+
+def measure(factory, frames):
+    # Construction through the first paint, which is where stylesheet polishing lands
+    first_show = time_frames(20, lambda i: close(build(factory)))
+    window = build(factory)
+    # Warm up polish and any caches so only steady-state frames are timed
+    window.repaint()
+    # A point well inside the rounded corner but clear of the labels
+    background_drawn = window.grab().toImage().pixelColor(20, 10).alpha() > 0
+    counter = PaintCounter()
+    for widget in [window] + window.findChildren(QWidget):
+        widget.installEventFilter(counter)
+
+    def drag(i):
+        window.move(100 + i % 200, 100 + i % 50)
+        QApplication.processEvents()
+
+    def repaint(i):
+        window.repaint()
+
+    def update(i):
+        window.time.setText(f"00:{i % 60:02d} / 03:00")
+        window.time.repaint()
+
+    results = {"show": first_show, "drag": time_frames(frames, drag)}
+    drag_paints = counter.paints / frames
+    results["repaint"] = time_frames(frames, repaint)
+    results["update"] = time_frames(frames, update)
+    close(window)
+    return results, drag_paints, background_drawn
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    # Throwaway round so font loading and style setup are not billed to whichever runs first
+    measure(APPROACHES[0][1], 10)
+    print(f"{'approach':<12} {'scenario':<8} {'median ms':>9} {'p95 ms':>8}")
+    for name, factory in APPROACHES:
+        results, drag_paints, background_drawn = measure(factory, args.frames)
+        for scenario, samples in results.items():
+            samples.sort()
+            p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+            print(f"{name:<12} {scenario:<8} {statistics.median(samples):>9.3f} {p95:>8.3f}")
+        print(f"{name:<12} {drag_paints:.2f} paints per drag step, "
+              f"window background {'drawn' if background_drawn else 'not drawn'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Runs the clock (with seconds), weather and a playing music player in one
+# process and reports how many scheduler wakeups served their periodic jobs.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/scheduler_coalescing.py [--seconds 10]
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+os.chdir(ROOT)
+
+from PyQt5.QtWidgets import QApplication
+
+from wakeups import spin, make_clock_seconds, make_weather, make_mplayer_playing
+from weather_stub import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="widgets-scheduler-")
+    server, env = start_stub_server()
+    os.environ.update(env)
+    app = QApplication(sys.argv[:1])
+
+    from scheduler import Scheduler
+    widgets = [make_clock_seconds(), make_weather(), make_mplayer_playing()]
+    for widget in widgets:
+        widget.show()
+    scheduler = Scheduler.instance()
+    wakeups_before = scheduler.wakeups
+    runs_before = sum(job.runs for job in scheduler.jobs)
+    spin(args.seconds)
+
+    stats = scheduler.stats()
+    wakeups = stats["wakeups"] - wakeups_before
+    runs = stats["runs"] - runs_before
+    print(f"job runs:           {runs}")
+    print(f"scheduler wakeups:  {wakeups}")
+    print(f"wakeups saved:      {runs - wakeups} ({(runs - wakeups) / runs * 100 if runs else 0:.0f}%)")
+    print(json.dumps(stats["per_job"], indent=2))
+    for widget in widgets:
+        widget.exit_widget()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# Measures the shared settings store: file writes for a burst of changes (a
+# drag, a volume scroll, loop toggles) against writing on every change, the
+# cost of loading at startup and of the unchanged-file fast path, and several
+# processes changing their own keys in the same file at once while a reader
+# checks it is never seen half written.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/settings_writes.py [--processes 4]
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("WIDGETS_DATA_DIR", tempfile.mkdtemp(prefix="settings-bench-"))
+
+from PyQt5.QtCore import QCoreApplication
+
+import metrics
+import settings
+from settings import Settings
+from storage import FileLock, read_json, atomic_write_json
+from bench_util import spin
+
+
+def naive_set(path, key, value):
+    # What saving on every change would cost: lock, merge, write and rename
+    with FileLock(path + ".lock"):
+        values = read_json(path, {})
+        values[key] = value
+        atomic_write_json(path, values)
+
+
+def burst(set_value):
+    # 120 drag releases, 40 wheel notches and 6 loop toggles, as fast as they come
+    for i in range(120):
+        set_value("clock.position", [100 + i, 40])
+    for i in range(40):
+        set_value("mplayer.volume", 40 + i)
+    for i in range(6):
+        set_value("mplayer.loop", i % 2 == 0)
+    return 166
+
+
+def child(path, name, rounds):
+    # One widget process: change its own keys, write, repeat
+    app = QCoreApplication(sys.argv[:1])
+    store = Settings(path)
+    for i in range(rounds):
+        store.set(name + ".counter", i)
+        store.set(name + ".position", [i, i])
+        store.flush()
+
+
+def reader(path, seconds):
+    bad = reads = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                json.load(f)
+            reads += 1
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            bad += 1
+    print(f"{reads} {bad}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--child", nargs=3)
+    parser.add_argument("--reader", nargs=2)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child[0], args.child[1], int(args.child[2]))
+    if args.reader:
+        return reader(args.reader[0], float(args.reader[1]))
+
+    app = QCoreApplication(sys.argv[:1])
+    metrics.enable()
+    directory = os.environ["WIDGETS_DATA_DIR"]
+
+    naive_path = os.path.join(directory, "naive.json")
+    started = time.perf_counter()
+    changes = burst(lambda key, value: naive_set(naive_path, key, value))
+    naive_ms = (time.perf_counter() - started) * 1000
+    print(f"{changes} changes written one by one: {changes} writes, {naive_ms:.0f} ms on the GUI thread")
+
+    settings.SAVE_DELAY_MS = 200
+    store = Settings(os.path.join(directory, "burst.json"))
+    started = time.perf_counter()
+    burst(store.set)
+    set_ms = (time.perf_counter() - started) * 1000
+    spin(0.5)
+    print(f"{changes} changes through Settings: {store.writes.value} write(s), "
+          f"{set_ms:.2f} ms to record them, {read_json(store.path)}")
+
+    # Startup: a settings file with a few hundred keys
+    path = os.path.join(directory, "startup.json")
+    atomic_write_json(path, {f"widget{i}.key{j}": [i, j] for i in range(30) for j in range(10)})
+    started = time.perf_counter()
+    loaded = Settings(path)
+    load_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for _ in range(1000):
+        loaded.reload()
+    fast_us = (time.perf_counter() - started) * 1000
+    print(f"startup load of {len(loaded.values)} keys: {load_ms:.2f} ms; reload of an unchanged file {fast_us:.1f} us")
+
+    # Several processes writing their own keys to one file, with a reader watching
+    shared = os.path.join(directory, "shared.json")
+    names = [f"proc{i}" for i in range(args.processes)]
+    started = time.perf_counter()
+    watcher = subprocess.Popen([sys.executable, __file__, "--reader", shared, "3"], stdout=subprocess.PIPE, text=True)
+    writers = [subprocess.Popen([sys.executable, __file__, "--child", shared, name, str(args.rounds)]) for name in names]
+    for process in writers:
+        process.wait()
+    elapsed = time.perf_counter() - started
+    reads, bad = watcher.communicate()[0].split()
+    final = read_json(shared, {})
+    lost = [name for name in names
+            if final.get(name + ".counter") != args.rounds - 1 or final.get(name + ".position") != [args.rounds - 1] * 2]
+    print(f"{args.processes} processes x {args.rounds} writes in {elapsed:.1f} s: "
+          f"{'no keys lost' if not lost else 'lost updates from ' + ', '.join(lost)}; "
+          f"reader saw {reads} complete files and {bad} partial ones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# Startup latency of the launcher and every widget it knows about.
+#
+# Each entry point runs in a fresh interpreter under the Qt offscreen
+# platform, with the weather APIs served by a local stub and libVLC replaced
+# by benchmarks/fake_vlc.py. For each run we record Qt init, module import,
+# construction and time to first paint, plus the peak RSS of the process and
+# any font that failed to load.
+#
+#   python benchmarks/startup.py --output startup.json
+#   python benchmarks/startup.py --output new.json --compare startup.json
+#   python benchmarks/startup.py --compare startup.json new.json
+#
+# New widgets are picked up automatically from launcher.WIDGETS.
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+METRICS = ("qt_init_ms", "import_ms", "construct_ms", "first_paint_ms", "total_ms", "peak_rss_kb")
+
+# A metric regresses when it is this much worse than the baseline, relatively and absolutely
+REGRESSION_RATIO = 0.15
+REGRESSION_FLOOR = {"peak_rss_kb": 2048}
+REGRESSION_FLOOR_MS = 5.0
+
+
+def peak_rss_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def entry_points():
+    sys.path.insert(0, ROOT)
+    from launcher import WIDGETS
+    entries = {"launcher": ("launcher", "create_launcher")}
+    for name, (_, _, module, factory) in WIDGETS.items():
+        entries[name] = (module, factory)
+    return entries
+
+
+def run_child(module_name, factory_name):
+    started = time.perf_counter()
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, BENCH_DIR)
+    import importlib
+    from PyQt5.QtCore import QObject, QEvent, QEventLoop, QTimer
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    qt_ready = time.perf_counter()
+
+    module = importlib.import_module(module_name)
+    imported = time.perf_counter()
+
+    import vlc
+    from fake_vlc import FakeMediaPlayer
+    vlc.MediaPlayer = FakeMediaPlayer
+
+    painted = []
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and not painted:
+                painted.append(time.perf_counter())
+                loop.quit()
+            return False
+
+    watcher = PaintWatcher()
+    app.installEventFilter(watcher)
+    loop = QEventLoop()
+    before_construct = time.perf_counter()
+    window = getattr(module, factory_name)()
+    constructed = time.perf_counter()
+    if not painted:
+        QTimer.singleShot(5000, loop.quit)
+        loop.exec_()
+    first_paint = painted[0] if painted else time.perf_counter()
+
+    import resources
+
+    result = {
+        "qt_init_ms": (qt_ready - started) * 1000,
+        "import_ms": (imported - qt_ready) * 1000,
+        "construct_ms": (constructed - before_construct) * 1000,
+        "first_paint_ms": (first_paint - constructed) * 1000,
+        "total_ms": (first_paint - started) * 1000,
+        "peak_rss_kb": peak_rss_kb(),
+        "font_fallbacks": sorted(resources.fallback_fonts),
+    }
+    print(json.dumps(result))
+
+
+def measure(name, module, factory, env, repeats):
+    runs = []
+    for _ in range(repeats):
+        # A cold data dir per run, so caches from earlier runs do not help
+        run_env = dict(env, WIDGETS_DATA_DIR=tempfile.mkdtemp(prefix="widgets-startup-"))
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "--child", module, factory],
+            cwd=ROOT, env=run_env, stderr=subprocess.DEVNULL,
+        )
+        runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+    result = {metric: statistics.median(run[metric] for run in runs) for metric in METRICS}
+    result["font_fallbacks"] = runs[-1]["font_fallbacks"]
+    return result
+
+
+def print_results(results):
+    print(f"{'entry':<12}" + "".join(f"{metric:>16}" for metric in METRICS))
+    for name, values in results.items():
+        print(f"{name:<12}" + "".join(f"{values[metric]:>16.1f}" for metric in METRICS))
+    for name, values in results.items():
+        for font in values["font_fallbacks"]:
+            print(f"WARNING {name} could not load {font} and fell back to a system font")
+
+
+def compare(baseline, current):
+    regressions = []
+    for name, values in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        for metric in METRICS:
+            before, after = old[metric], values[metric]
+            floor = REGRESSION_FLOOR.get(metric, REGRESSION_FLOOR_MS)
+            if after - before > max(floor, before * REGRESSION_RATIO):
+                regressions.append((name, metric, before, after))
+    for name, values in current["results"].items():
+        old = baseline["results"].get(name, {})
+        for font in set(values.get("font_fallbacks", [])) - set(old.get("font_fallbacks", [])):
+            regressions.append((name, "font " + font, 0, 1))
+    for name, metric, before, after in regressions:
+        print(f"REGRESSION {name}.{metric}: {before:.1f} -> {after:.1f}")
+    if not regressions:
+        print("No regressions against baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", nargs=2, metavar=("MODULE", "FACTORY"), help=argparse.SUPPRESS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", help="comma separated entry names")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", nargs="+", metavar="JSON",
+                        help="baseline to compare this run against, or two result files to compare")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        sys.exit(1 if compare(baseline, current) else 0)
+
+    sys.path.insert(0, BENCH_DIR)
+    from weather_stub import start_stub_server
+    server, stub_env = start_stub_server()
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", **stub_env)
+
+    entries = entry_points()
+    names = args.only.split(",") if args.only else list(entries)
+    results = {name: measure(name, *entries[name], env, args.repeats) for name in names}
+    server.shutdown()
+
+    current = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(baseline, current) else 0)
+
+
+if __name__ == "__main__":
+    main()
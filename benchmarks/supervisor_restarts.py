@@ -0,0 +1,104 @@
+# Exercises the launcher's process supervisor with stand-in children:
+#   - a child that always crashes, to show the restart backoff;
+#   - a child burning CPU and one holding memory, to show the /proc sampling;
+#   - a launcher process killed with SIGKILL, to check its children go too;
+#   - the cost of one supervision poll.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/supervisor_restarts.py
+import os
+import sys
+import time
+import signal
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="supervisor-bench-")
+
+from PyQt5.QtCore import QCoreApplication
+
+import supervisor
+from bench_util import spin
+
+CRASH = "import sys, time; time.sleep(0.05); sys.exit(3)"
+BURN = "import time\nwhile True: pass"
+HOLD = "import time; block = bytearray(200 * 2 ** 20); block[::4096] = b'x' * len(block[::4096]); time.sleep(60)"
+SLEEP = "import time; time.sleep(60)"
+
+
+def alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def orphan_check():
+    # Child mode: supervise one sleeper, print its pid, then wait to be killed
+    app = QCoreApplication(sys.argv[:1])
+    sup = supervisor.Supervisor()
+    child = sup.start("sleeper", [sys.executable, "-c", SLEEP])
+    print(child.process.pid, flush=True)
+    spin(60)
+
+
+def main():
+    if "--orphan-check" in sys.argv:
+        orphan_check()
+        return
+    app = QCoreApplication(sys.argv[:1])
+    # Short delays so the demo fits in a few seconds; the shape is what matters
+    supervisor.BACKOFF_BASE_S = 0.1
+    supervisor.SUPERVISE_INTERVAL_MS = 50
+    sup = supervisor.Supervisor()
+    starts = []
+    spawn = sup._spawn
+
+    def record_spawn(child):
+        starts.append(time.monotonic())
+        spawn(child)
+
+    sup._spawn = record_spawn
+    began = time.monotonic()
+    sup.start("crasher", [sys.executable, "-c", CRASH])
+    spin(4.0)
+    crasher = sup.children["crasher"]
+    print(f"always-crashing child: {crasher.restarts} restarts in 4 s, "
+          f"next delay {min(supervisor.BACKOFF_MAX_S, supervisor.BACKOFF_BASE_S * 2 ** crasher.crashes):.1f} s")
+    print("  started at " + ", ".join(f"{t - began:.2f}" for t in starts) + " s")
+    sup.shutdown()
+
+    sup = supervisor.Supervisor()
+    sup.start("burner", [sys.executable, "-c", BURN])
+    sup.start("holder", [sys.executable, "-c", HOLD])
+    sup.watch(True)
+    spin(2.0)
+    for name, usage in sup.stats()["children"].items():
+        print(f"{name:<7} pid {usage['pid']}: {usage['rss_mb']:.0f} MB, {usage['cpu_percent']:.0f}% CPU")
+    launcher = sup.stats()["launcher"]
+    print(f"launcher pid {launcher['pid']}: {launcher['rss_mb']:.0f} MB, {launcher['cpu_percent']:.1f}% CPU")
+    runs = 200
+    started = time.perf_counter()
+    for _ in range(runs):
+        sup.poll()
+    print(f"one poll of 2 children: {(time.perf_counter() - started) / runs * 1e6:.0f} us")
+    pids = [child.process.pid for child in sup.children.values()]
+    started = time.perf_counter()
+    sup.shutdown()
+    print(f"shutdown: {(time.perf_counter() - started) * 1000:.0f} ms, children left: {sum(alive(pid) for pid in pids)}")
+
+    launcher_process = subprocess.Popen([sys.executable, __file__, "--orphan-check"], stdout=subprocess.PIPE, text=True)
+    child_pid = int(launcher_process.stdout.readline())
+    launcher_process.send_signal(signal.SIGKILL)
+    launcher_process.wait()
+    deadline = time.monotonic() + 2
+    while alive(child_pid) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    print(f"launcher killed with SIGKILL: its child is {'still running' if alive(child_pid) else 'gone'}")
+
+
+if __name__ == "__main__":
+    main()
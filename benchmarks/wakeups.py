@@ -0,0 +1,86 @@
+# Wakeups per minute of each widget while shown and while hidden to the tray.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/wakeups.py [--seconds 5]
+import os
+import sys
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+os.chdir(ROOT)
+
+from PyQt5.QtWidgets import QApplication
+
+from bench_util import spin
+from fake_vlc import FakeMediaPlayer
+from weather_stub import start_stub_server
+
+
+def make_clock_seconds():
+    import clock
+    return clock.DraggableWindow(hosted=True, show_seconds=True)
+
+
+def make_weather():
+    import weather
+    widget = weather.WeatherWidget(hosted=True)
+    widget.update_ui("Clear", 20)
+    return widget
+
+
+def make_mplayer_paused():
+    import mplayer
+    widget = mplayer.TransparentMusicPlayer(hosted=True, player=FakeMediaPlayer(length_ms=600000))
+    widget.open_track("silence.mp3")
+    spin(0.3)
+    widget.toggle_play_pause()
+    spin(0.3)
+    widget.toggle_play_pause()
+    return widget
+
+
+def make_mplayer_playing():
+    import mplayer
+    widget = mplayer.TransparentMusicPlayer(hosted=True, player=FakeMediaPlayer(length_ms=600000))
+    widget.open_track("silence.mp3")
+    spin(0.3)
+    widget.toggle_play_pause()
+    return widget
+
+
+WIDGETS = {
+    "clock (seconds)": make_clock_seconds,
+    "weather": make_weather,
+    "mplayer playing": make_mplayer_playing,
+    "mplayer paused": make_mplayer_paused,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5.0, help="time spent in each state")
+    args = parser.parse_args()
+
+    os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="widgets-wakeups-")
+    server, env = start_stub_server()
+    os.environ.update(env)
+    app = QApplication(sys.argv[:1])
+
+    print(f"{'widget':<18}{'shown /min':>12}{'hidden /min':>13}")
+    for name, make in WIDGETS.items():
+        widget = make()
+        widget.show()
+        spin(args.seconds)
+        widget.hide()
+        spin(args.seconds)
+        rates = widget.power.wakeups_per_minute()
+        print(f"{name:<18}{rates['active']:>12.0f}{rates['suspended']:>13.0f}")
+        widget.exit_widget()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Measures the music player's waveform and spectrum on a synthetic track:
+# analysis time (decode alone, then decode with peaks and spectrum) and its
+# peak memory against the size of the decoded PCM, reopening from the disk
+# cache, paint cost of the waveform bar on the 1 s position tick and how many
+# ticks actually repaint, spectrum paint cost against the frame budget, and
+# the spectrum backing off when painting is made artificially slow.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/waveform_cost.py [--minutes 4]
+import os
+import sys
+import time
+import wave
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="waveform-bench-")
+
+import numpy
+from PyQt5.QtWidgets import QApplication
+
+import metrics
+import waveform
+from bench_util import spin
+
+
+def write_track(path, minutes, rate=44100):
+    # A chirp under a slow swell, so both the peaks and the spectrum move
+    t = numpy.arange(int(minutes * 60 * rate)) / rate
+    chirp = numpy.sin(2 * numpy.pi * (100 + 40 * t) * t)
+    swell = 0.2 + 0.8 * numpy.abs(numpy.sin(2 * numpy.pi * t / 20))
+    mono = (chirp * swell * 20000).astype(numpy.int16)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(numpy.repeat(mono, 2).tobytes())
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=4.0)
+    args = parser.parse_args()
+
+    track = os.path.join(os.environ["WIDGETS_DATA_DIR"], "chirp.wav")
+    write_track(track, args.minutes)
+    print(f"{args.minutes:.0f} min 44.1 kHz stereo WAV, {os.path.getsize(track) / 1e6:.0f} MB")
+
+    rate, chunks = waveform.decode_pcm(track)
+    samples, decode_ms = timed(lambda: sum(len(chunk) for chunk in chunks))
+    tracemalloc.start()
+    analysis, analyze_ms = timed(lambda: waveform.analyze(track))
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  decode {decode_ms:.0f} ms, decode and analyse {analyze_ms:.0f} ms "
+          f"({len(analysis['spectrum'])} frames x {waveform.SPECTRUM_BANDS} bands); "
+          f"peak {peak_bytes / 1e6:.1f} MB against {samples * 4 / 1e6:.0f} MB of decoded PCM")
+    _, first_ms = timed(lambda: waveform.load_analysis(track))
+    (analysis, cached), reopen_ms = timed(lambda: waveform.load_analysis(track))
+    cache_file = waveform.cache_path(track, os.stat(track).st_mtime, os.stat(track).st_size)
+    print(f"  first open {first_ms:.0f} ms, reopen from cache {reopen_ms:.1f} ms (cached={cached}, "
+          f"{os.path.getsize(cache_file) / 1024:.0f} KiB on disk)")
+
+    app = QApplication(sys.argv[:1])
+    # Paint times are read back from the widgets' own histograms
+    metrics.enable()
+    bar = waveform.WaveformBar()
+    bar.resize(280, 36)
+    bar.set_peaks(analysis["peaks"])
+    bar.show()
+    app.processEvents()
+    length_ms = analysis["duration_ms"]
+    first_paint = bar.paint_histogram.snapshot()
+
+    # One position tick a second for the whole track, as the UI timer delivers them
+    paints_before = bar.paint_histogram.count
+    started = time.perf_counter()
+    for position in range(0, length_ms, 1000):
+        bar.set_progress(position, length_ms)
+        app.processEvents()
+    tick_seconds = time.perf_counter() - started
+    ticks = length_ms // 1000
+    paints = bar.paint_histogram.count - paints_before
+    print(f"waveform bar, 280 px: first paint {first_paint['max']:.2f} ms; "
+          f"{ticks} ticks -> {paints} repaints, {tick_seconds * 1000 / ticks:.3f} ms per tick")
+
+    position = {"ms": 0}
+    view = waveform.SpectrumView(lambda: position["ms"])
+    view.resize(280, 48)
+    view.set_frames(analysis["spectrum"])
+    view.show()
+    app.processEvents()
+    for frame in range(len(analysis["spectrum"])):
+        position["ms"] = frame * 1000 // waveform.SPECTRUM_FPS
+        view.next_frame()
+    snapshot = view.paint_histogram.snapshot()
+    print(f"spectrum, 280 px: {snapshot['count']} frames painted, p50 {snapshot['p50']:.3f} ms, "
+          f"max {snapshot['max']:.3f} ms (budget {waveform.FRAME_BUDGET_MS} ms), {view.fps} fps")
+
+    # Make every paint overrun the budget and let the timer run
+    fast_paint = view.paintEvent
+
+    def slow_paint(event):
+        time.sleep(0.005)
+        fast_paint(event)
+
+    view.paintEvent = slow_paint
+    clock_started = time.monotonic()
+    position_at = lambda: int((time.monotonic() - clock_started) * 1000)
+    view.position_ms = position_at
+    view.start()
+    spin(1.5)
+    print(f"spectrum with 5 ms paints: backed off to {view.fps} fps after {view.slowdowns.value} slowdowns")
+    view.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Frame-decode CPU and memory of the weather animation, comparing the old
+# "new QMovie on every refresh" approach with the decoded-frame cache, and
+# checks that the weather widget's cached frames come out at its GIF size.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/weather_animation.py [--refreshes 40]
+import os
+import sys
+import glob
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PyQt5.QtGui import QMovie
+from PyQt5.QtWidgets import QApplication, QLabel
+
+from animation_cache import AnimationCache, AnimationPlayer, animation_cache
+from weather import GIF_SIZE, WeatherWidget
+from bench_util import spin
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class MovieApproach:
+    name = "QMovie per refresh"
+
+    def __init__(self, label):
+        self.label = label
+        self.frames = 0
+        self.movies = []
+
+    def display(self, path):
+        movie = QMovie(path)
+        movie.frameChanged.connect(self.count_frame)
+        self.label.setMovie(movie)
+        movie.start()
+        self.movies.append(movie)
+
+    def count_frame(self, _):
+        self.frames += 1
+
+    def decoded_frames(self):
+        return self.frames
+
+
+class CachedApproach:
+    name = "decoded-frame cache"
+
+    def __init__(self, label):
+        self.cache = AnimationCache()
+        self.player = AnimationPlayer(label)
+        self.label = label
+
+    def display(self, path):
+        self.player.play(self.cache.get(path, GIF_SIZE))
+
+    def decoded_frames(self):
+        return sum(len(animation.frames) for animation in self.cache.entries.values())
+
+    def hide(self):
+        self.player.pause()
+
+
+def run(approach_cls, paths, refreshes, interval, hidden_for):
+    label = QLabel()
+    label.show()
+    approach = approach_cls(label)
+    rss_before = rss_kb()
+
+    cpu = time.process_time()
+    for i in range(refreshes):
+        # Mostly the same condition, like real 10 minute refreshes
+        approach.display(paths[(i // 5) % len(paths)])
+        spin(interval)
+    visible_cpu = time.process_time() - cpu
+    frames_visible = approach.decoded_frames()
+
+    label.hide()
+    if hasattr(approach, "hide"):
+        approach.hide()
+    cpu = time.process_time()
+    spin(hidden_for)
+    hidden_cpu = time.process_time() - cpu
+
+    return {
+        "name": approach.name,
+        "visible_cpu": visible_cpu,
+        "hidden_cpu": hidden_cpu,
+        "frames_visible": frames_visible,
+        "frames_hidden": approach.decoded_frames() - frames_visible,
+        "rss_delta": rss_kb() - rss_before,
+    }
+
+
+def check_widget_frames(paths):
+    widget = WeatherWidget(hosted=True, cities=[])
+    animation_cache.clear()
+    for path in paths:
+        widget.display_weather_gif(path)
+    target = widget.weather_gif_label.minimumSize()
+    for animation in animation_cache.entries.values():
+        for frame in animation.frames:
+            # Scaled keeping the aspect ratio, so one side matches and neither overflows
+            assert frame.width() <= target.width() and frame.height() <= target.height(), animation.key
+            assert target.width() in (frame.width(), frame.height()) or target.height() in (frame.width(), frame.height()), animation.key
+    frames = sum(len(animation.frames) for animation in animation_cache.entries.values())
+    print(f"widget cache: {len(animation_cache.entries)} GIFs, {frames} frames, all scaled to "
+          f"{target.width()}x{target.height()}, {animation_cache.total_cost // 1024} KiB")
+    widget.exit_widget()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--refreshes", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between refreshes")
+    parser.add_argument("--hidden", type=float, default=2.0, help="seconds spent hidden")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    paths = sorted(glob.glob(os.path.join(ROOT, "images", "weather", "*", "*.gif")))
+
+    results = [
+        run(MovieApproach, paths, args.refreshes, args.interval, args.hidden),
+        run(CachedApproach, paths, args.refreshes, args.interval, args.hidden),
+    ]
+    check_widget_frames(paths)
+    print(f"{'approach':<22}{'visible CPU s':>14}{'hidden CPU s':>14}"
+          f"{'decodes':>10}{'hidden decodes':>16}{'RSS +KB':>10}")
+    for r in results:
+        print(f"{r['name']:<22}{r['visible_cpu']:>14.3f}{r['hidden_cpu']:>14.3f}"
+              f"{r['frames_visible']:>10}{r['frames_hidden']:>16}{r['rss_delta']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Runs WeatherWidget against a deliberately slow local HTTP server and
+# measures the longest gap between event loop iterations while fetches
+# are in flight. A blocking fetch would show up as a gap of roughly the
+# server delay; the worker-thread fetcher keeps it near the probe interval.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/weather_event_loop.py [--delay 1.5]
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from weather_stub import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=1.0, help="server response delay in seconds")
+    parser.add_argument("--ticks", type=int, default=5, help="refresh ticks fired while requests are in flight")
+    args = parser.parse_args()
+
+    server, env = start_stub_server(args.delay)
+    os.environ.update(env)
+    # Keep the user's response cache out of the measurement
+    os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="widgets-bench-")
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    import weather
+    import weather_providers
+
+    # Every tick goes to the server instead of being answered from the cache
+    weather_providers.WEATHER_TTL = 0
+    app = QApplication(sys.argv[:1])
+    widget = weather.create_weather(hosted=True)
+
+    updates = []
+    widget.fetcher.weather_ready.connect(lambda w, t: updates.append((w, t)))
+
+    max_gap = 0.0
+    last = time.perf_counter()
+
+    def probe():
+        nonlocal last, max_gap
+        now = time.perf_counter()
+        max_gap = max(max_gap, now - last)
+        last = now
+
+    probe_timer = QTimer()
+    probe_timer.timeout.connect(probe)
+    probe_timer.start(10)
+
+    # Fire refreshes faster than the server answers; only the newest may land
+    tick_interval = int(args.delay * 1000 / 3)
+    for i in range(args.ticks):
+        QTimer.singleShot(int(args.delay * 1000) + 50 + i * tick_interval, widget.get_weather)
+
+    run_for = int((args.delay * 2 + args.ticks * tick_interval / 1000 + 1) * 1000)
+    started = time.perf_counter()
+    QTimer.singleShot(run_for, app.quit)
+    app.exec_()
+
+    print(f"server delay:        {args.delay * 1000:.0f} ms")
+    print(f"run time:            {(time.perf_counter() - started) * 1000:.0f} ms")
+    print(f"max event loop gap:  {max_gap * 1000:.1f} ms")
+    print(f"requests served:     {server.RequestHandlerClass.served}")
+    print(f"updates delivered:   {len(updates)} (ticks fired: {args.ticks})")
+    print(f"widget shows:        {widget.weather_desc.text()} {widget.temperature.text()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
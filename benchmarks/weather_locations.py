@@ -0,0 +1,94 @@
+# Refreshes dozens of cities against the local stub and compares request
+# counts and wall time: the very first multi-location cycle (one id lookup
+# per city, kept for good, then group requests of up to 20 ids), later
+# cycles, a restart with the weather cache gone (ids still known, so groups
+# only) and one request per city in sequence (N widgets' worth). Then checks
+# that one widget renders every city.
+#
+#   QT_QPA_PLATFORM=offscreen python benchmarks/weather_locations.py [--cities 48] [--delay 0.1]
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from weather_stub import start_stub_server
+
+
+def timed_cycle(server, fn):
+    before = dict(server.RequestHandlerClass.counts)
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    after = server.RequestHandlerClass.counts
+    requests = {kind: after.get(kind, 0) - before.get(kind, 0) for kind in after if after.get(kind, 0) != before.get(kind, 0)}
+    return result, seconds, requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cities", type=int, default=48)
+    parser.add_argument("--delay", type=float, default=0.1, help="server response delay in seconds")
+    args = parser.parse_args()
+
+    server, env = start_stub_server(args.delay)
+    os.environ.update(env)
+    os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="widgets-bench-")
+    # Measure batching, not the shared request budget
+    os.environ["WEATHER_CALLS_PER_MINUTE"] = "100000"
+    os.environ["WEATHER_CALLS_PER_DAY"] = "100000"
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import weather
+    import weather_providers
+
+    # Every cycle goes to the server instead of being answered from the cache
+    weather_providers.WEATHER_TTL = 0
+    provider = weather_providers.get_provider()
+    cities = [f"City{i:03d}" for i in range(args.cities)]
+
+    def sequential():
+        return {city: provider.current(city) for city in cities}
+
+    def restart():
+        # A new process whose weather cache was cleared; city_ids.json survives
+        shutil.rmtree(weather_providers.http_cache.directory)
+        weather_providers.http_cache.directory = None
+        return weather_providers.OpenWeatherProvider().current_many(cities)
+
+    print(f"{'refresh':<28} {'seconds':>8}  requests")
+    for name, fn in [
+        ("batched, first run", lambda: provider.current_many(cities)),
+        ("batched, later cycles", lambda: provider.current_many(cities)),
+        ("batched, restart", restart),
+        ("sequential, one per city", sequential),
+    ]:
+        result, seconds, requests = timed_cycle(server, fn)
+        failed = sum(1 for value in result.values() if isinstance(value, Exception))
+        summary = ", ".join(f"{count} {kind}" for kind, count in sorted(requests.items()))
+        print(f"{name:<28} {seconds:>8.2f}  {summary}" + (f"  ({failed} failed)" if failed else ""))
+
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    widget = weather.create_weather(hosted=True, cities=cities)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        loop = QEventLoop()
+        QTimer.singleShot(50, loop.quit)
+        loop.exec_()
+        rows = widget.locations_list.count() if widget.locations_list else 0
+        filled = sum(1 for row in range(rows) if widget.locations_list.item(row).text() != cities[row])
+        if rows and filled == len(cities):
+            break
+    print(f"widget rows filled:          {filled}/{len(cities)}")
+    widget.exit_widget()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
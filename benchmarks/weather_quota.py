@@ -0,0 +1,100 @@
+# Exercises the shared OpenWeather budget against the local stub:
+#   - several processes refreshing as fast as they can, which together must
+#     stay within the per-minute budget;
+#   - threads asking for the same URL at once, which must share one request;
+#   - the refresh interval once most of the daily budget is gone.
+#
+#   python benchmarks/weather_quota.py [--processes 4] [--per-minute 30] [--seconds 3]
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from weather_stub import start_stub_server
+
+
+def hammer(seconds):
+    # Child process: refresh distinct cities in a loop, counting what got through
+    import weather_providers
+    weather_providers.WEATHER_TTL = 0
+    provider = weather_providers.get_provider()
+    granted = denied = 0
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        try:
+            provider.current(f"City{os.getpid()}-{i}")
+            granted += 1
+        except Exception:
+            denied += 1
+            time.sleep(0.01)
+        i += 1
+    print(granted, denied)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--per-minute", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        hammer(args.seconds)
+        return
+
+    server, env = start_stub_server(0.01)
+    env = dict(os.environ, **env)
+    env["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="widgets-bench-")
+    env["WEATHER_CALLS_PER_MINUTE"] = str(args.per_minute)
+    os.environ.update(env)
+
+    children = [subprocess.Popen([sys.executable, __file__, "--child", "--seconds", str(args.seconds)],
+                                 env=env, stdout=subprocess.PIPE, text=True)
+                for _ in range(args.processes)]
+    granted = denied = 0
+    for child in children:
+        out, _ = child.communicate()
+        g, d = map(int, out.split())
+        granted += g
+        denied += d
+    counts = server.RequestHandlerClass.counts
+    print(f"{args.processes} processes for {args.seconds:.0f} s, budget {args.per_minute}/min")
+    print(f"  requests served:   {counts.get('weather', 0)}")
+    print(f"  calls granted:     {granted}, refused: {denied}")
+
+    import quota
+    import weather
+    import weather_providers
+    from storage import atomic_write_json
+    provider = weather_providers.get_provider()
+    before = counts.get("weather", 0)
+    threads = [threading.Thread(target=provider.current, args=("SameCity",)) for _ in range(8)]
+    provider.budget().per_minute += 100
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"8 threads, one URL:  {counts.get('weather', 0) - before} request(s)")
+
+    budget = provider.budget()
+    hours_left = quota.seconds_until_utc_midnight() / 3600
+    for left in (500, 100, 20, 0):
+        # Pretend the rest of the day's calls went elsewhere
+        state = budget._load(time.time())
+        state["day"] = budget.per_day - left
+        atomic_write_json(budget._path(), state)
+        interval = budget.refresh_interval(weather.REFRESH_INTERVAL_MS)
+        print(f"{left:>3} of {budget.per_day} calls left, {hours_left:.1f} h to reset: refresh every {interval / 60000:.1f} min")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Benchmarks the weather providers without the real APIs:
+#   - refresh throughput for a set of cities against the local stub (one
+#     request per city, the batched path) and replayed from a recording;
+#   - timeout handling, with the stub failing or hanging a share of requests
+#     and a short client timeout: how long a cycle takes and what it returns;
+#   - parsing cost per reading: JSON decode, field extraction, reading the
+#     disk cache and a replay lookup.
+#
+#   python benchmarks/weather_refresh.py [--cities 24] [--delay 0.05] [--error-rate 0.1] [--timeout-rate 0.1]
+import io
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from weather_stub import start_stub_server, city_body
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cities", type=int, default=24)
+    parser.add_argument("--delay", type=float, default=0.05, help="server response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--timeout-rate", type=float, default=0.1)
+    parser.add_argument("--read-timeout", type=float, default=0.5, help="client read timeout in seconds")
+    args = parser.parse_args()
+
+    server, env = start_stub_server(args.delay)
+    os.environ.update(env)
+    os.environ["WIDGETS_DATA_DIR"] = tempfile.mkdtemp(prefix="widgets-bench-")
+    # Measure the providers, not the shared request budget
+    os.environ["WEATHER_CALLS_PER_MINUTE"] = "100000"
+    os.environ["WEATHER_CALLS_PER_DAY"] = "100000"
+    sys.path.insert(0, ROOT)
+    import weather_providers
+    from weather_providers import OpenWeatherProvider, RecordReplayProvider
+
+    # Every cycle goes to the server instead of being answered from the cache
+    weather_providers.WEATHER_TTL = 0
+    cities = [f"City{i:03d}" for i in range(args.cities)]
+    tape = os.path.join(os.environ["WIDGETS_DATA_DIR"], "weather-tape.json")
+    live = OpenWeatherProvider()
+    recorder = RecordReplayProvider(tape, live)
+    recorder.user_city()
+
+    print(f"refresh of {len(cities)} cities, {args.delay * 1000:.0f} ms server delay")
+    print(f"  {'provider':<30} {'seconds':>8} {'cities/s':>9}")
+
+    def row(name, fn):
+        started = time.perf_counter()
+        results = fn()
+        seconds = time.perf_counter() - started
+        failed = sum(1 for value in results.values() if isinstance(value, Exception))
+        print(f"  {name:<30} {seconds:>8.3f} {len(cities) / seconds:>9.0f}" + (f"  ({failed} failed)" if failed else ""))
+        return results
+
+    recorded = row("recording, one per city", lambda: {city: recorder.current(city) for city in cities})
+    row("openweather, batched", lambda: live.current_many(cities))
+    replay = RecordReplayProvider(tape)
+    replayed = row("replay", lambda: replay.current_many(cities))
+    row("replay, recorded latency", lambda: RecordReplayProvider(tape, realtime=True).current_many(cities))
+    print(f"  replay matches the recording: {replayed == recorded}")
+    server.shutdown()
+
+    # A fresh stub that fails some requests and hangs others, and fresh cities
+    # so nothing can be served stale from the cache
+    server, env = start_stub_server(args.delay, args.error_rate, args.timeout_rate, hang=5.0, seed=1)
+    os.environ.update(env)
+    weather_providers._config = None
+    weather_providers.REQUEST_TIMEOUT = (1.0, args.read_timeout)
+    flaky = OpenWeatherProvider()
+    flaky_cities = [f"Flaky{i:03d}" for i in range(args.cities)]
+    print(f"\nflaky server: {args.error_rate:.0%} errors, {args.timeout_rate:.0%} hangs, "
+          f"{args.read_timeout * 1000:.0f} ms read timeout")
+    for name in ("first cycle", "second cycle (stale fallback)"):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = flaky.current_many(flaky_cities)
+        seconds = time.perf_counter() - started
+        failed = sum(1 for value in results.values() if isinstance(value, Exception))
+        print(f"  {name:<30} {seconds:>6.2f} s, {len(results) - failed} readings, {failed} failed")
+    counts = server.RequestHandlerClass.counts
+    print(f"  server saw {counts.get('weather', 0)} answered, {counts.get('find', 0)} id lookups, {counts.get('group', 0)} group, "
+          f"{counts.get('error', 0)} errors, {counts.get('timeout', 0)} hangs")
+    server.shutdown()
+
+    body = city_body("London")
+    payload = json.dumps(body)
+    cache_entry = {"stored_at": 0, "expires": 0, "etag": None, "last_modified": None, "body": body}
+    cache_payload = json.dumps(cache_entry)
+    print("\nparsing, per reading")
+    print(f"  json.loads of a response        {per_call_us(lambda: json.loads(payload), 20000):>7.2f} us")
+    print(f"  OpenWeatherProvider.parse       {per_call_us(lambda: OpenWeatherProvider.parse(body), 100000):>7.2f} us")
+    print(f"  cache entry decode + parse      {per_call_us(lambda: OpenWeatherProvider.parse(json.loads(cache_payload)['body']), 20000):>7.2f} us")
+    print(f"  cached_current (disk)           {per_call_us(lambda: live.cached_current(cities[0]), 2000):>7.2f} us")
+    print(f"  replay lookup                   {per_call_us(lambda: replay.current(cities[0]), 100000):>7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
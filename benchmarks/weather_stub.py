@@ -0,0 +1,120 @@
+# Minimal OpenWeather/ipinfo stand-in used by the benchmarks. Answers
+# /geo, /weather?q=<city>, /find?q=<city> and /group?id=<id>,<id>,... and
+# counts each kind.
+# A share of requests can be made to fail with a 503 or to hang past any
+# sensible client timeout. Also runs on its own for trying the widget offline:
+#
+#   python benchmarks/weather_stub.py --port 8088 --latency 0.2 --error-rate 0.1
+#   GEO_API_URL=http://127.0.0.1:8088/geo WEATHER_API_URL=http://127.0.0.1:8088/weather python weather.py
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+CONDITIONS = ("Clear", "Clouds", "Rain", "Snow", "Mist")
+
+
+def city_body(name):
+    # Stable made-up weather per city, with an id like OpenWeather's
+    city_id = zlib.crc32(name.encode("utf-8")) % 10000000
+    return {
+        "id": city_id,
+        "name": name,
+        "weather": [{"main": CONDITIONS[city_id % len(CONDITIONS)]}],
+        "main": {"temp": round(city_id % 400 / 10 - 10, 1)},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    error_rate = 0.0
+    timeout_rate = 0.0
+    # How long a "timed out" request hangs before answering anyway
+    hang = 30.0
+    served = 0
+    counts = None
+    cities = None
+    rng = None
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            roll = self.rng.random()
+        if roll < self.timeout_rate:
+            self._count("timeout")
+            time.sleep(self.hang)
+        time.sleep(self.delay)
+        if self.timeout_rate <= roll < self.timeout_rate + self.error_rate:
+            self._count("error")
+            self.send_error(503, "stub error")
+            return
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path.startswith("/geo"):
+            kind, body = "geo", {"city": "Stubville"}
+        elif url.path.startswith("/group"):
+            ids = [int(city_id) for city_id in query.get("id", [""])[0].split(",") if city_id]
+            bodies = [city_body(self.cities[city_id]) for city_id in ids if city_id in self.cities]
+            kind, body = "group", {"cnt": len(bodies), "list": bodies}
+        elif url.path.startswith("/find"):
+            found = city_body(query.get("q", ["Stubville"])[0])
+            with self.lock:
+                self.cities[found["id"]] = found["name"]
+            kind, body = "find", {"count": 1, "list": [found]}
+        else:
+            body = city_body(query.get("q", ["Stubville"])[0])
+            with self.lock:
+                self.cities[body["id"]] = body["name"]
+            kind = "weather"
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        with self.lock:
+            type(self).served += 1
+        self._count(kind)
+
+    def _count(self, kind):
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(delay=0.0, error_rate=0.0, timeout_rate=0.0, hang=30.0, port=0, seed=0):
+    # Returns the server and the env vars that point the weather widget at it
+    handler = type("Handler", (StubHandler,), {
+        "delay": delay, "error_rate": error_rate, "timeout_rate": timeout_rate, "hang": hang,
+        "served": 0, "counts": {}, "cities": {}, "rng": random.Random(seed),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    env = {"GEO_API_URL": base + "/geo", "WEATHER_API_URL": base + "/weather", "WEATHER_GROUP_API_URL": base + "/group",
+           "WEATHER_FIND_API_URL": base + "/find"}
+    return server, env
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of requests that hang")
+    parser.add_argument("--hang", type=float, default=30.0, help="seconds a hanging request takes")
+    args = parser.parse_args()
+    server, env = start_stub_server(args.latency, args.error_rate, args.timeout_rate, args.hang, args.port)
+    for name, value in env.items():
+        print(f"{name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,27 +1,36 @@
+import coldstart
 import sys
-from PyQt5.QtCore import QTimer, Qt, QDateTime
+import os
+from PyQt5.QtCore import Qt, QDateTime, QPoint
+from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import (
-    QApplication, QLabel, QWidget, QVBoxLayout, 
+    QApplication, QLabel, QVBoxLayout, 
     QSystemTrayIcon, QMenu, QPushButton, 
     QGraphicsOpacityEffect, QHBoxLayout
 )
-from PyQt5.QtGui import QIcon, QFont, QFontDatabase
-
-class DraggableWindow(QWidget):
-    def __init__(self):
-        super().__init__()
+from resources import get_icon, get_font
+from scheduler import Scheduler
+from power import PowerManager
+from panel import TranslucentPanel
+from drag import WindowDragger
+import metrics
+from ipc import CommandServer, send_command, quit_on_terminate
+
+class DraggableWindow(TranslucentPanel):
+    metrics_name = "clock"
+
+    def __init__(self, hosted=False, show_seconds=False):
+        super().__init__(QColor(0, 0, 0, 120), radius=15)
+        self.hosted = hosted
+        self.show_seconds = show_seconds
+        self.last_text = None
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnBottomHint)
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        self.setStyleSheet("background-color: rgba(0, 0, 0, 120); border-radius: 15px;")
-
-        font_id = QFontDatabase.addApplicationFont("fonts/minecraft.ttf")
-        font_family = QFontDatabase.applicationFontFamilies(font_id)[0] if font_id != -1 else "Arial"
 
         main_layout = QVBoxLayout(self)
         main_layout.setAlignment(Qt.AlignCenter)
 
         self.date_time_label = QLabel("", self)
-        self.date_time_font = QFont(font_family, 36)
+        self.date_time_font = get_font(36)
         self.date_time_label.setFont(self.date_time_font)
         self.date_time_label.setStyleSheet("color: white; text-align: center;")
         self.date_time_label.setAlignment(Qt.AlignCenter)
@@ -39,12 +48,19 @@ class DraggableWindow(QWidget):
         self.opacity_effect.setOpacity(0.01)
         self.close_button.setGraphicsEffect(self.opacity_effect)
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_date_time)
-        self.timer.start(1000)
+        # Wake only when the display can change: exactly on each second or minute boundary
+        self.timer = Scheduler.instance().add_job("clock", self.tick_period(), align=True, parent=self)
+        self.timer.triggered.connect(self.update_date_time)
+        self.update_date_time()
+
+        # Ticks only run while the clock is on screen, see resume_updates
+        self.power = PowerManager(self)
+        self.power.watch(self.timer.triggered)
+        self.power.suspended.connect(self.timer.stop)
+        self.power.resumed.connect(self.resume_updates)
 
         self.tray_icon = QSystemTrayIcon(self)
-        self.tray_icon.setIcon(QIcon("images/clock_icon.png"))
+        self.tray_icon.setIcon(get_icon("images/clock_icon.png"))
         self.tray_icon.setToolTip("Clock Widget")
 
         tray_menu = QMenu()
@@ -71,13 +87,25 @@ class DraggableWindow(QWidget):
         """)
         show_action = tray_menu.addAction("Show")
         show_action.triggered.connect(self.show)
+        seconds_action = tray_menu.addAction("Show Seconds")
+        seconds_action.setCheckable(True)
+        seconds_action.setChecked(self.show_seconds)
+        seconds_action.toggled.connect(self.set_show_seconds)
+        stats_action = tray_menu.addAction("Stats")
+        stats_action.triggered.connect(self.show_stats)
         exit_action = tray_menu.addAction("Exit")
-        exit_action.triggered.connect(QApplication.quit)
+        exit_action.triggered.connect(self.exit_widget)
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.activated.connect(self.on_tray_icon_left_click)
 
         self.tray_icon.show()
-        self.old_pos = None
+        self.dragger = WindowDragger(self, "clock")
+
+        # Single-instance lock and control channel, see ipc.py
+        self.control = CommandServer("clock", {"show": self.show, "hide": self.hide, "status": self.status}, self)
+        if not self.control.listen():
+            self.hand_over("clock")
+        coldstart.after_first_paint(self)
 
     def hide_to_tray(self):
         self.hide()
@@ -88,31 +116,48 @@ class DraggableWindow(QWidget):
             3000,
         )
 
+    def resume_updates(self):
+        self.update_date_time()
+        self.timer.start()
+
+    def tick_period(self):
+        return 1000 if self.show_seconds else 60000
+
+    def set_show_seconds(self, show_seconds):
+        self.show_seconds = show_seconds
+        self.timer.set_period(self.tick_period())
+        self.update_date_time()
+
     def update_date_time(self):
         current_time = QDateTime.currentDateTime()
-        hour = current_time.toString("hh")
-        minute = current_time.toString("mm")
-        am_pm = current_time.toString("AP")
-
-        day_name = current_time.toString("ddd")
-        day_month = current_time.toString("ddMM")
-        year = current_time.toString("yy")
-        self.date_time_label.setText(f"{hour}:{minute}\n{am_pm}\n{day_name} {day_month} {year}")
+        # "hh" is kept apart from "AP" so the hour stays in 24-hour form
+        time_text = current_time.toString("hh:mm:ss" if self.show_seconds else "hh:mm")
+        date_text = current_time.toString("AP\nddd ddMM yy")
+        text = f"{time_text}\n{date_text}"
+        if text != self.last_text:
+            self.last_text = text
+            self.date_time_label.setText(text)
 
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.old_pos = event.globalPos() - self.frameGeometry().topLeft()
-            event.accept()
+        self.dragger.press(event)
 
     def mouseMoveEvent(self, event):
-        if event.buttons() == Qt.LeftButton and self.old_pos is not None:
-            new_pos = event.globalPos() - self.old_pos
-            self.move(new_pos)
-            event.accept()
+        self.dragger.move(event)
 
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.old_pos = None
+        self.dragger.release(event)
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "hosted": self.hosted,
+            "visible": self.isVisible(),
+            "show_seconds": self.show_seconds,
+            "wakeups_per_minute": self.power.wakeups_per_minute(),
+        }
+
+    def show_stats(self):
+        metrics.show_stats(self, {"clock", "loop"})
 
     def enterEvent(self, event):
         self.opacity_effect.setOpacity(1)
@@ -124,12 +169,20 @@ class DraggableWindow(QWidget):
         if reason == QSystemTrayIcon.Trigger:
             self.show()
 
-def run_clock():
-    app = QApplication(sys.argv)
-    window = DraggableWindow()
+def create_clock(hosted=False):
+    window = DraggableWindow(hosted)
     window.resize(320, 240)
-    window.move(1440, 0)
+    window.dragger.restore(QPoint(1440, 0))
     window.show()
+    return window
+
+def run_clock():
+    app = QApplication(sys.argv)
+    # Already running, here or inside the launcher: bring that one up instead
+    if send_command("clock", "show") is not None:
+        return
+    quit_on_terminate(app)
+    window = create_clock()
     app.exec_()
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import builtins
+import threading
+
+# WIDGETS_PROFILE_IMPORTS=1 prints what each entry point imported before its first
+# paint, and every import deferred past it, to stderr
+PROFILE = bool(os.getenv("WIDGETS_PROFILE_IMPORTS"))
+
+_started = time.perf_counter()
+_imports = []
+_painted = False
+_state = threading.local()
+_original_import = builtins.__import__
+
+
+def _profiled_import(name, *args, **kwargs):
+    # Only the outermost import of a module not yet loaded is timed, so
+    # each entry is the full cost of one import statement
+    depth = getattr(_state, "depth", 0)
+    if depth or name in sys.modules:
+        return _original_import(name, *args, **kwargs)
+    _state.depth = 1
+    started = time.perf_counter()
+    try:
+        return _original_import(name, *args, **kwargs)
+    finally:
+        _state.depth = 0
+        elapsed = time.perf_counter() - started
+        _imports.append((started - _started, name, elapsed))
+        if _painted:
+            print(f"[coldstart] deferred import {name}: {elapsed * 1000:.1f} ms "
+                  f"at +{(started - _started) * 1000:.0f} ms", file=sys.stderr)
+
+
+if PROFILE:
+    builtins.__import__ = _profiled_import
+
+# Imported after the hook so Qt's own import cost shows up in the profile
+from PyQt5.QtCore import QObject, QEvent, QTimer
+
+
+def report(label, limit=15):
+    print(f"[coldstart] {label} first paint at +{(time.perf_counter() - _started) * 1000:.0f} ms, "
+          f"{len(_imports)} imports before it", file=sys.stderr)
+    for offset, name, elapsed in sorted(_imports, key=lambda item: -item[2])[:limit]:
+        print(f"[coldstart]   {elapsed * 1000:8.1f} ms  {name}", file=sys.stderr)
+
+
+class _FirstPaintWatcher(QObject):
+    def __init__(self, widget, callback):
+        super().__init__(widget)
+        self.callback = callback
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            global _painted
+            if PROFILE and not _painted:
+                report(type(obj).__name__)
+            _painted = True
+            if self.callback is not None:
+                # Let the paint finish first, then do the deferred work
+                QTimer.singleShot(0, self.callback)
+            self.deleteLater()
+        return False
+
+
+def after_first_paint(widget, callback=None):
+    # Run callback once the widget has painted for the first time, so startup
+    # work that is not needed for the first frame does not delay it
+    _FirstPaintWatcher(widget, callback)
@@ -0,0 +1,88 @@
+from PyQt5.QtCore import Qt, QObject, QTimer, QPoint, QRect
+from PyQt5.QtGui import QGuiApplication
+from settings import Settings
+
+# Windows closer than this to a screen edge, in pixels, stick to it
+SNAP_DISTANCE = 16
+
+
+def screen_for(point):
+    return QGuiApplication.screenAt(point) or QGuiApplication.primaryScreen()
+
+
+def snap_to_edges(rect, area, distance=SNAP_DISTANCE):
+    x, y = rect.x(), rect.y()
+    if abs(rect.left() - area.left()) <= distance:
+        x = area.left()
+    elif abs(rect.right() - area.right()) <= distance:
+        x = area.right() - rect.width() + 1
+    if abs(rect.top() - area.top()) <= distance:
+        y = area.top()
+    elif abs(rect.bottom() - area.bottom()) <= distance:
+        y = area.bottom() - rect.height() + 1
+    return QPoint(x, y)
+
+
+class WindowDragger(QObject):
+    # Mouse moves can arrive several hundred times a second. Each one only
+    # records the target; the window is moved at most once per display frame,
+    # and only the resting position goes to the settings.
+    def __init__(self, widget, key):
+        super().__init__(widget)
+        self.widget = widget
+        self.key = key
+        self.offset = None
+        self.pending = None
+        self.moves = 0
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self.apply_pending)
+
+    def restore(self, default):
+        # Fall back to the default if the saved spot is no longer on any screen
+        saved = Settings.instance().get(self.key + ".position")
+        pos = QPoint(saved[0], saved[1]) if saved else None
+        if pos is None or QGuiApplication.screenAt(QRect(pos, self.widget.size()).center()) is None:
+            pos = default
+        self.widget.move(pos)
+
+    def frame_interval(self):
+        rate = screen_for(self.widget.frameGeometry().center()).refreshRate()
+        return max(1, int(1000 / rate)) if rate > 0 else 16
+
+    def press(self, event):
+        if event.button() == Qt.LeftButton:
+            self.offset = event.globalPos() - self.widget.frameGeometry().topLeft()
+            event.accept()
+
+    def move(self, event):
+        if event.buttons() == Qt.LeftButton and self.offset is not None:
+            self.pending = event.globalPos() - self.offset
+            if not self.frame_timer.isActive():
+                self.frame_timer.start(self.frame_interval())
+            event.accept()
+
+    def release(self, event):
+        if event.button() == Qt.LeftButton and self.offset is not None:
+            self.frame_timer.stop()
+            self.pending = event.globalPos() - self.offset
+            self.apply_pending()
+            self.offset = None
+            pos = self.widget.pos()
+            Settings.instance().set(self.key + ".position", [pos.x(), pos.y()])
+
+    def apply_pending(self):
+        if self.pending is None:
+            return
+        rect = QRect(self.pending, self.widget.frameGeometry().size())
+        area = screen_for(rect.center()).availableGeometry()
+        self.pending = None
+        pos = snap_to_edges(rect, area)
+        if pos != self.widget.pos():
+            self.widget.move(pos)
+            self.moves += 1
+
+    def flush(self):
+        Settings.instance().flush()
@@ -0,0 +1,116 @@
+import os
+import re
+import time
+import hashlib
+
+import metrics
+from quota import QuotaExceeded
+from storage import data_dir, FileLock, read_json, atomic_write_json
+
+
+def freshness_lifetime(response, default_ttl):
+    # Honour the server's Cache-Control/Age when it sends them, else use our TTL
+    cache_control = response.headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match is None:
+        return default_ttl
+    try:
+        age = int(response.headers.get("Age", 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
+
+
+class HttpCache:
+    # JSON responses kept on disk, one file per URL, shared by all widget processes
+    def __init__(self, name="http"):
+        self.name = name
+        self.directory = None
+        self.fresh_hits = metrics.counter(f"{name}.fresh_hits")
+        self.revalidated = metrics.counter(f"{name}.revalidated")
+        self.stale_fallbacks = metrics.counter(f"{name}.stale_fallbacks")
+        self.deduplicated = metrics.counter(f"{name}.deduplicated")
+
+    def _path(self, url):
+        if self.directory is None:
+            self.directory = data_dir("cache", self.name)
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".json")
+
+    def load(self, url):
+        return read_json(self._path(url))
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry is not None and time.time() < entry["expires"]
+
+    def store(self, url, body, response, ttl):
+        lifetime = freshness_lifetime(response, ttl)
+        if lifetime is None:
+            return
+        now = time.time()
+        entry = {
+            "stored_at": now,
+            "expires": now + lifetime,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body": body,
+        }
+        path = self._path(url)
+        with FileLock(path + ".lock"):
+            # Another process may have stored a newer copy while we were fetching
+            current = read_json(path)
+            if current is not None and current["stored_at"] > now:
+                return
+            atomic_write_json(path, entry)
+
+    def get(self, session, url, ttl, timeout, budget=None):
+        entry = self.load(url)
+        if self.is_fresh(entry):
+            self.fresh_hits.inc()
+            return entry["body"]
+
+        # One request per URL at a time across every thread and process. Whoever
+        # waited finds the answer the first one stored and does not ask again.
+        with FileLock(self._path(url) + ".fetch"):
+            entry = self.load(url)
+            if self.is_fresh(entry):
+                self.deduplicated.inc()
+                return entry["body"]
+            if budget is not None and not budget.try_acquire():
+                if entry is None:
+                    raise QuotaExceeded(f"{budget.name} request budget used up")
+                self.stale_fallbacks.inc()
+                return entry["body"]
+            return self._fetch(session, url, ttl, timeout, entry)
+
+    def _fetch(self, session, url, ttl, timeout, entry):
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and entry is not None:
+                self.revalidated.inc()
+                body = entry["body"]
+            else:
+                response.raise_for_status()
+                body = response.json()
+        except Exception as e:
+            if entry is None:
+                raise
+            # Serve the stale copy rather than blanking the widget
+            self.stale_fallbacks.inc()
+            print("Using cached response after error:", e)
+            return entry["body"]
+
+        self.store(url, body, response, ttl)
+        return body
@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import signal
+import socket
+import hashlib
+from PyQt5.QtCore import QObject, QSocketNotifier, QTimer, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from storage import data_dir
+
+# How long a client waits for a running instance to connect and answer
+IPC_TIMEOUT_MS = 500
+
+# Requests and replies are single JSON lines; anything longer is not ours
+MAX_MESSAGE_BYTES = 64 * 1024
+
+
+def server_name(name):
+    # One socket per widget and data directory, so a test run with its own
+    # WIDGETS_DATA_DIR never talks to the user's real widgets
+    digest = hashlib.sha1(data_dir().encode("utf-8")).hexdigest()[:10]
+    return f"desktop-widgets-{digest}-{name}"
+
+
+def send_command(name, command, timeout_ms=IPC_TIMEOUT_MS):
+    # Returns the reply dict, or None if no instance of name is running
+    socket = QLocalSocket()
+    socket.connectToServer(server_name(name))
+    if not socket.waitForConnected(timeout_ms):
+        return None
+    socket.write(json.dumps({"command": command}).encode("utf-8") + b"\n")
+    socket.waitForBytesWritten(timeout_ms)
+    data = b""
+    while b"\n" not in data and len(data) < MAX_MESSAGE_BYTES:
+        if not socket.waitForReadyRead(timeout_ms):
+            break
+        data += bytes(socket.readAll())
+    socket.disconnectFromServer()
+    return parse_reply(data)
+
+
+def parse_reply(data):
+    try:
+        return json.loads(data.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+class CommandRequest(QObject):
+    # send_command without blocking the event loop: finished carries the reply
+    # dict, or None if no instance answered within timeout_ms. Deletes itself.
+    finished = pyqtSignal(object)
+
+    def __init__(self, name, command, timeout_ms=IPC_TIMEOUT_MS, parent=None):
+        super().__init__(parent)
+        self.command = command
+        self.data = b""
+        self.done = False
+        self.socket = QLocalSocket(self)
+        self.socket.connected.connect(self._write)
+        self.socket.readyRead.connect(self._read)
+        self.socket.disconnected.connect(self._closed)
+        self.socket.error.connect(self._closed)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(lambda: self._finish(None))
+        self.timer.start(timeout_ms)
+        # A missing server fails inside connectToServer, so connect from the
+        # event loop, once the caller has hooked up finished
+        QTimer.singleShot(0, lambda: self.socket.connectToServer(server_name(name)))
+
+    def _write(self):
+        self.socket.write(json.dumps({"command": self.command}).encode("utf-8") + b"\n")
+
+    def _read(self):
+        self.data += bytes(self.socket.readAll())
+        if b"\n" in self.data or len(self.data) >= MAX_MESSAGE_BYTES:
+            self._finish(parse_reply(self.data))
+
+    def _closed(self, *_):
+        # The server hangs up right after its reply, possibly before readyRead
+        if self.socket.isOpen():
+            self.data += bytes(self.socket.readAll())
+        self._finish(parse_reply(self.data) if self.data else None)
+
+    def _finish(self, reply):
+        if self.done:
+            return
+        self.done = True
+        self.timer.stop()
+        self.socket.blockSignals(True)
+        self.socket.abort()
+        self.finished.emit(reply)
+        self.deleteLater()
+
+
+class CommandServer(QObject):
+    # Holds the single-instance lock for one widget: while it listens, a second
+    # launch reaches this process instead. handlers maps command -> callable.
+    def __init__(self, name, handlers, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.handlers = {"ping": lambda: os.getpid()}
+        self.handlers.update(handlers)
+        self.buffers = {}
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self._accept)
+
+    def listen(self):
+        # Ask before binding: on Unix QLocalServer unlinks a live socket file
+        # and binds over it, stealing the running instance's name
+        if send_command(self.name, "ping") is not None:
+            print(f"{self.name} is already running in another process")
+            return False
+        # Nobody answered, so any socket file was left behind by a crashed instance
+        full_name = server_name(self.name)
+        QLocalServer.removeServer(full_name)
+        return self.server.listen(full_name)
+
+    def close(self):
+        self.server.close()
+
+    def handle(self, command):
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"unknown command {command!r}"}
+        try:
+            return {"ok": True, "result": handler()}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def _accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b""
+            socket.readyRead.connect(lambda socket=socket: self._read(socket))
+            socket.disconnected.connect(lambda socket=socket: self._drop(socket))
+
+    def _drop(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def _read(self, socket):
+        if socket not in self.buffers:
+            return
+        buffer = self.buffers[socket] = self.buffers[socket] + bytes(socket.readAll())
+        if b"\n" not in buffer:
+            if len(buffer) > MAX_MESSAGE_BYTES:
+                socket.abort()
+            return
+        # One request per connection; ignore anything after the first line
+        del self.buffers[socket]
+        line = buffer.split(b"\n", 1)[0]
+        try:
+            command = json.loads(line.decode("utf-8"))["command"]
+            reply = self.handle(command)
+        except (ValueError, KeyError, TypeError):
+            reply = {"ok": False, "error": "malformed request"}
+        socket.write(json.dumps(reply).encode("utf-8") + b"\n")
+        socket.flush()
+        socket.disconnectFromServer()
+
+
+def quit_on_terminate(app):
+    # SIGTERM (the launcher stopping its widgets, or dying on Linux) quits the
+    # event loop as the tray's Exit does, so aboutToQuit work such as the
+    # settings flush still runs. Python only runs the handler once the event
+    # loop hands back control, so the signal also wakes Qt through a socket.
+    if os.name == "nt":
+        return
+    receiver, sender = socket.socketpair()
+    receiver.setblocking(False)
+    sender.setblocking(False)
+    signal.set_wakeup_fd(sender.fileno())
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    notifier = QSocketNotifier(receiver.fileno(), QSocketNotifier.Read, app)
+    notifier.activated.connect(lambda *_: receiver.recv(64))
+    # Kept alive with the application
+    app.terminate_wakeup = (receiver, sender, notifier)
+
+
+if __name__ == "__main__":
+    # python ipc.py <widget> <command>, e.g. python ipc.py weather status
+    if len(sys.argv) != 3:
+        print("usage: python ipc.py <launcher|weather|clock|mplayer> <command>")
+        sys.exit(2)
+    reply = send_command(sys.argv[1], sys.argv[2])
+    if reply is None:
+        print(f"{sys.argv[1]} is not running")
+        sys.exit(1)
+    print(json.dumps(reply, indent=2))
+    sys.exit(0 if reply.get("ok") else 1)
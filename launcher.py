@@ -1,21 +1,44 @@
+import coldstart
 import sys
 import os
-import subprocess
+import importlib
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget,
     QSystemTrayIcon, QMenu, QAction, QLabel
 )
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QIcon, QFont, QPalette, QColor
+from PyQt5.QtGui import QFont, QPalette, QColor
+from resources import get_icon
+from ipc import CommandServer, CommandRequest, send_command
+from supervisor import Supervisor
+
+# name -> (button text, script, module, factory)
+WIDGETS = {
+    "weather": ("Weather Widget", "weather.py", "weather", "create_weather"),
+    "clock": ("Time & Date Widget", "clock.py", "clock", "create_clock"),
+    "mplayer": ("Music Player Widget", "mplayer.py", "mplayer", "create_mplayer"),
+}
 
 class WidgetLauncher(QMainWindow):
-    def __init__(self):
+    def __init__(self, isolated=False):
         super().__init__()
+        # isolated: one interpreter per widget, otherwise widgets share this process
+        self.isolated = isolated
+        self.hosted_widgets = {}
+        self.supervisor = Supervisor(self)
+        self.supervisor.changed.connect(self.refresh_usage)
+        QApplication.instance().aboutToQuit.connect(self.supervisor.shutdown)
         self.setWindowTitle("Desktop Widget Launcher")
-        self.setWindowIcon(QIcon("images/icon.png"))
+        self.setWindowIcon(get_icon("images/icon.png"))
         self.setGeometry(100, 100, 400, 300)
         self.initUI()
         self.create_tray_icon()
+        self.control = CommandServer("launcher", {"show": self.show, "hide": self.hide, "status": self.status}, self)
+        if not self.control.listen():
+            # Another launcher started after run_launcher's check: show it and step aside
+            send_command("launcher", "show")
+            sys.exit(0)
+        coldstart.after_first_paint(self)
 
     def initUI(self):
         palette = QPalette()
@@ -32,21 +55,34 @@ class WidgetLauncher(QMainWindow):
         title.setStyleSheet("color: white;")
         layout.addWidget(title)
 
-        self.weather_button = self.create_button("Weather Widget", "weather.py")
-        self.time_button = self.create_button("Time & Date Widget", "clock.py")
-        self.music_button = self.create_button("Music Player Widget", "mplayer.py")
+        self.weather_button = self.create_button("weather")
+        self.time_button = self.create_button("clock")
+        self.music_button = self.create_button("mplayer")
+        self.buttons = {"weather": self.weather_button, "clock": self.time_button, "mplayer": self.music_button}
 
-        layout.addWidget(self.weather_button)
-        layout.addWidget(self.time_button)
-        layout.addWidget(self.music_button)
+        # Memory and CPU per widget process, filled in while the window is open
+        self.usage_labels = {}
+        for name, button in self.buttons.items():
+            label = QLabel("")
+            label.setFont(QFont("Arial", 9))
+            label.setStyleSheet("color: #aaa;")
+            label.setAlignment(Qt.AlignCenter)
+            self.usage_labels[name] = label
+            layout.addWidget(button)
+            layout.addWidget(label)
+        self.launcher_usage = QLabel("")
+        self.launcher_usage.setFont(QFont("Arial", 9))
+        self.launcher_usage.setStyleSheet("color: #aaa;")
+        self.launcher_usage.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.launcher_usage)
 
         central_widget = QWidget()
         central_widget.setLayout(layout)
         self.setCentralWidget(central_widget)
         self.setStyleSheet("background-color: #2d2d2d;")
 
-    def create_button(self, text, script_name):
-        button = QPushButton(text)
+    def create_button(self, name):
+        button = QPushButton(WIDGETS[name][0])
         button.setFont(QFont("Arial", 12))
         button.setFixedHeight(40)
         button.setStyleSheet(
@@ -60,18 +96,104 @@ class WidgetLauncher(QMainWindow):
             "background-color: #666;"
             "}"
         )
-        button.clicked.connect(lambda: self.launch_widget(script_name))
+        button.clicked.connect(lambda: self.launch_widget(name))
         return button
 
-    def launch_widget(self, script_name):
+    def launch_widget(self, name):
+        # Widgets hold a single-instance lock; if one is already up anywhere, just show it
+        if name not in self.hosted_widgets and send_command(name, "show") is not None:
+            return
+        if self.isolated:
+            self.spawn_widget(name)
+        else:
+            self.host_widget(name)
+
+    def host_widget(self, name):
+        window = self.hosted_widgets.get(name)
+        if window is not None:
+            window.show()
+            window.activateWindow()
+            return
+        _, _, module_name, factory = WIDGETS[name]
+        module = importlib.import_module(module_name)
+        window = getattr(module, factory)(hosted=True)
+        window.destroyed.connect(lambda: self.hosted_widgets.pop(name, None))
+        self.hosted_widgets[name] = window
+
+    def spawn_widget(self, name):
+        script_name = WIDGETS[name][1]
         script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script_name)
         if os.path.exists(script_path):
-            subprocess.Popen([sys.executable, script_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.supervisor.start(name, [sys.executable, script_path])
         else:
             print(f"Error: {script_name} not found")
 
+    def send(self, name, command):
+        # Hosted widgets answer on this thread, so call them directly rather than
+        # blocking on a socket only our own event loop could serve
+        window = self.hosted_widgets.get(name)
+        if window is not None:
+            return window.control.handle(command)
+        return send_command(name, command)
+
+    def send_all(self, command):
+        for name in WIDGETS:
+            self.send(name, command)
+
+    def status(self):
+        status = {name: self.send(name, "status") for name in WIDGETS}
+        status["processes"] = self.supervisor.stats()
+        return status
+
+    def refresh_usage(self):
+        if not self.isVisible():
+            return
+        for name, label in self.usage_labels.items():
+            usage = self.supervisor.usage(name)
+            if usage is None:
+                text = "in the launcher" if name in self.hosted_widgets else ""
+            elif usage["running"]:
+                text = f"pid {usage['pid']}  {format_usage(usage)}".strip()
+            elif usage["restart_pending"]:
+                text = f"exited with status {usage['last_exit']}, restarting..."
+            else:
+                text = "stopped"
+            if usage is not None and usage["restarts"]:
+                text += f"  ({usage['restarts']} restarts)"
+            label.setText(text)
+        usage = format_usage(self.supervisor.self_usage.snapshot())
+        self.launcher_usage.setText(f"Launcher: {usage}" if usage else "")
+
+    def refresh_status(self):
+        # Ask every widget at once and fill in tooltips as replies arrive, so
+        # showing the launcher never waits on a slow or missing widget
+        for name, button in self.buttons.items():
+            window = self.hosted_widgets.get(name)
+            if window is not None:
+                self.show_status(button, window.control.handle("status"))
+            else:
+                request = CommandRequest(name, "status", parent=self)
+                request.finished.connect(lambda reply, button=button: self.show_status(button, reply))
+
+    def show_status(self, button, reply):
+        if reply is not None and reply.get("ok"):
+            where = "in the launcher" if reply["result"]["hosted"] else f"as pid {reply['result']['pid']}"
+            button.setToolTip(f"Running {where}")
+        else:
+            button.setToolTip("Not running")
+
+    def showEvent(self, event):
+        self.refresh_status()
+        self.supervisor.watch(True)
+        self.refresh_usage()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.supervisor.watch(False)
+        super().hideEvent(event)
+
     def create_tray_icon(self):
-        self.tray_icon = QSystemTrayIcon(QIcon("images/icon.png"), self)
+        self.tray_icon = QSystemTrayIcon(get_icon("images/icon.png"), self)
         self.tray_icon.setToolTip("Widget Launcher")
 
         tray_menu = QMenu()
@@ -79,6 +201,22 @@ class WidgetLauncher(QMainWindow):
         restore_action.triggered.connect(self.show)
         tray_menu.addAction(restore_action)
 
+        play_action = QAction("Play/Pause Music", self)
+        play_action.triggered.connect(lambda: self.send("mplayer", "play_pause"))
+        tray_menu.addAction(play_action)
+
+        refresh_action = QAction("Refresh Weather", self)
+        refresh_action.triggered.connect(lambda: self.send("weather", "refresh"))
+        tray_menu.addAction(refresh_action)
+
+        show_widgets_action = QAction("Show Widgets", self)
+        show_widgets_action.triggered.connect(lambda: self.send_all("show"))
+        tray_menu.addAction(show_widgets_action)
+
+        hide_widgets_action = QAction("Hide Widgets", self)
+        hide_widgets_action.triggered.connect(lambda: self.send_all("hide"))
+        tray_menu.addAction(hide_widgets_action)
+
         exit_action = QAction("Exit", self)
         exit_action.triggered.connect(self.exit_application)
         tray_menu.addAction(exit_action)
@@ -105,8 +243,26 @@ class WidgetLauncher(QMainWindow):
         self.tray_icon.hide()
         QApplication.quit()
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    launcher = WidgetLauncher()
+def format_usage(usage):
+    # Nothing sampled yet, or no /proc on this platform
+    if usage["rss_mb"] is None:
+        return ""
+    cpu = f"{usage['cpu_percent']:.1f}% CPU" if usage["cpu_percent"] is not None else "CPU ..."
+    return f"{usage['rss_mb']:.0f} MB  {cpu}"
+
+def create_launcher(isolated=False):
+    launcher = WidgetLauncher(isolated)
     launcher.show()
+    return launcher
+
+def run_launcher():
+    app = QApplication(sys.argv)
+    # Hosted widgets hide or close themselves without ending the launcher
+    app.setQuitOnLastWindowClosed(False)
+    if send_command("launcher", "show") is not None:
+        return
+    launcher = create_launcher(isolated="--isolated" in sys.argv)
     sys.exit(app.exec_())
+
+if __name__ == "__main__":
+    run_launcher()
@@ -0,0 +1,315 @@
+import os
+import time
+import bisect
+import contextlib
+import threading
+from PyQt5.QtCore import Qt, QObject, QTimer, QCoreApplication
+from storage import data_dir, atomic_write_json
+
+# Collection is off unless WIDGETS_METRICS=1, or until enable() is called.
+# Recording checks this one flag first, so instrumented code costs a call
+# and a comparison while it is off.
+enabled = os.getenv("WIDGETS_METRICS", "") not in ("", "0")
+
+# Also write a JSON snapshot every this many seconds while enabled
+DUMP_INTERVAL_S = float(os.getenv("WIDGETS_METRICS_DUMP_S", "0") or 0)
+
+# How often the event-loop lag probe checks in, in milliseconds
+LAG_PROBE_MS = 250
+
+# Histogram bucket upper bounds in milliseconds; anything slower goes in the last, open bucket
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+counters = {}
+histograms = {}
+sources = {}
+_lock = threading.Lock()
+_started = False
+_probe = None
+_dump_job = None
+
+
+class Counter:
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount=1):
+        if enabled:
+            with _lock:
+                self.value += amount
+
+    def reset(self):
+        self.value = 0
+
+
+class Histogram:
+    # Latencies in milliseconds, bucketed so memory stays fixed however long the widget runs
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, ms):
+        if not enabled:
+            return
+        with _lock:
+            self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+            self.count += 1
+            self.total += ms
+            self.min = ms if self.min is None else min(self.min, ms)
+            self.max = ms if self.max is None else max(self.max, ms)
+
+    def time(self):
+        return _Timing(self) if enabled else _NOT_TIMING
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket the percentile falls in, capped by the largest sample
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min(BUCKETS_MS[index], self.max) if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+_NOT_TIMING = contextlib.nullcontext()
+
+
+class _Timing:
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe((time.perf_counter() - self.started) * 1000)
+
+
+def counter(name):
+    with _lock:
+        if name not in counters:
+            counters[name] = Counter(name)
+        return counters[name]
+
+
+def histogram(name):
+    with _lock:
+        if name not in histograms:
+            histograms[name] = Histogram(name)
+        return histograms[name]
+
+
+def add_source(name, stats):
+    # stats() is called for each snapshot, e.g. Scheduler.stats
+    sources[name] = stats
+
+
+def remove_source(name, stats=None):
+    # With stats given, only if it is still the registered one
+    if stats is None or sources.get(name) == stats:
+        sources.pop(name, None)
+
+
+class LagProbe(QObject):
+    # A timer that should fire every LAG_PROBE_MS; how late it actually fires is
+    # how long the event loop was busy with something else
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lag = histogram("loop.lag_ms")
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(LAG_PROBE_MS)
+        self.timer.timeout.connect(self._check)
+        self.expected = None
+
+    def start(self):
+        self.expected = time.monotonic() + LAG_PROBE_MS / 1000
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def _check(self):
+        now = time.monotonic()
+        self.lag.observe(max(0.0, now - self.expected) * 1000)
+        self.expected = now + LAG_PROBE_MS / 1000
+
+
+def start():
+    # Called by every widget; only the first call per process does anything
+    global _started
+    if _started or QCoreApplication.instance() is None:
+        return
+    _started = True
+    if enabled:
+        _start_collectors()
+
+
+def enable():
+    global enabled
+    if not enabled:
+        enabled = True
+        if _started:
+            _start_collectors()
+
+
+def disable():
+    global enabled
+    enabled = False
+    if _probe is not None:
+        _probe.stop()
+    if _dump_job is not None:
+        _dump_job.stop()
+
+
+def _start_collectors():
+    global _probe, _dump_job
+    app = QCoreApplication.instance()
+    if _probe is None:
+        _probe = LagProbe(app)
+    _probe.start()
+    if DUMP_INTERVAL_S > 0:
+        if _dump_job is None:
+            from scheduler import Scheduler
+            interval_ms = int(DUMP_INTERVAL_S * 1000)
+            _dump_job = Scheduler.instance().add_job(
+                "metrics.dump", interval_ms, tolerance_ms=interval_ms // 4, parent=app)
+            _dump_job.triggered.connect(dump)
+        _dump_job.start()
+
+
+def snapshot():
+    with _lock:
+        data = {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "enabled": enabled,
+            "counters": {name: c.value for name, c in sorted(counters.items())},
+            "histograms": {name: h.snapshot() for name, h in sorted(histograms.items()) if h.count},
+        }
+    for name, stats in sources.items():
+        try:
+            data[name] = stats()
+        except Exception as e:
+            data[name] = {"error": str(e)}
+    return data
+
+
+def dump_path():
+    return os.path.join(data_dir("metrics"), f"{os.getpid()}.json")
+
+
+def dump(path=None):
+    path = path or dump_path()
+    atomic_write_json(path, snapshot())
+    return path
+
+
+def reset():
+    with _lock:
+        for c in counters.values():
+            c.reset()
+        for h in histograms.values():
+            h.reset()
+
+
+def _format_ms(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def format_report(prefixes=None):
+    # Plain-text summary for the Stats window; prefixes limit it to one widget's metrics
+    data = snapshot()
+
+    def wanted(name):
+        return prefixes is None or name.split(".")[0] in prefixes
+
+    lines = []
+    if not data["enabled"]:
+        lines.append("Collection is off (set WIDGETS_METRICS=1 or press Start).")
+        lines.append("")
+    lines.append(f"{'histogram':<32}{'count':>7}{'mean':>9}{'p95':>9}{'max':>9}  ms")
+    for name, h in data["histograms"].items():
+        if wanted(name):
+            lines.append(f"{name:<32}{h['count']:>7}{_format_ms(h['mean']):>9}"
+                         f"{_format_ms(h['p95']):>9}{_format_ms(h['max']):>9}")
+    lines.append("")
+    for name, value in data["counters"].items():
+        if wanted(name):
+            lines.append(f"{name:<32}{value:>7}")
+    for name, rates in data.items():
+        if name.endswith(".wakeups") and wanted(name) and "active" in rates:
+            lines.append("")
+            lines.append(f"{name}: {rates['active']:.1f}/min shown, {rates['suspended']:.1f}/min hidden or locked")
+    scheduler = data.get("scheduler")
+    if scheduler and "wakeups" in scheduler:
+        lines.append("")
+        lines.append(f"scheduler: {scheduler['wakeups']} wakeups, {scheduler['runs']} runs, "
+                     f"{scheduler['coalesced']} coalesced")
+    return "\n".join(lines)
+
+
+def show_stats(parent, prefixes=None):
+    from PyQt5.QtGui import QFontDatabase
+    from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton
+
+    dialog = QDialog(parent, Qt.Window)
+    dialog.setAttribute(Qt.WA_DeleteOnClose)
+    dialog.setWindowTitle("Widget Stats")
+    dialog.resize(560, 420)
+    layout = QVBoxLayout(dialog)
+    text = QPlainTextEdit(dialog)
+    text.setReadOnly(True)
+    text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+    layout.addWidget(text)
+
+    buttons = QHBoxLayout()
+    layout.addLayout(buttons)
+    start_button = QPushButton("Start", dialog)
+    refresh_button = QPushButton("Refresh", dialog)
+    save_button = QPushButton("Save JSON", dialog)
+    for button in (start_button, refresh_button, save_button):
+        buttons.addWidget(button)
+
+    def refresh():
+        start_button.setVisible(not enabled)
+        text.setPlainText(format_report(prefixes))
+
+    def start_collecting():
+        enable()
+        refresh()
+
+    def save():
+        refresh()
+        text.appendPlainText(f"\nSaved to {dump()}")
+
+    start_button.clicked.connect(start_collecting)
+    refresh_button.clicked.connect(refresh)
+    save_button.clicked.connect(save)
+    refresh()
+    dialog.show()
+    return dialog
@@ -1,47 +1,132 @@
+import coldstart
 import sys
-import vlc
 import os
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QFileDialog, QMenu, QSystemTrayIcon, QHBoxLayout, QProgressBar, QGraphicsOpacityEffect
-from PyQt5.QtCore import Qt, QTime, QTimer, QPoint, QSize, QPropertyAnimation
-from PyQt5.QtGui import QMouseEvent, QFont, QIcon, QFontDatabase, QPixmap
+import time
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QFileDialog, QMenu, QSystemTrayIcon, QHBoxLayout, QGraphicsOpacityEffect, QLineEdit, QListWidget, QListWidgetItem, QToolTip
+from PyQt5.QtCore import Qt, QTime, QTimer, QPoint, QSize, QPropertyAnimation, QAbstractAnimation, QObject, pyqtSignal
+from PyQt5.QtGui import QMouseEvent, QPixmap, QColor
+from resources import get_icon, get_font
+from power import PowerManager
+from scheduler import Scheduler
+from panel import TranslucentPanel
+from drag import WindowDragger
+from settings import Settings
+from waveform import WaveformLoader, WaveformBar, SpectrumView
+import metrics
+from ipc import CommandServer, send_command, quit_on_terminate
+
+# How far a time label wakeup may be pushed back to also catch the playhead's next step
+PROGRESS_COALESCE_MS = 120
+# Shortest gap between progress redraws, about a frame, so even a very short
+# track's playhead moves at most a pixel or two per redraw
+PROGRESS_MIN_INTERVAL_MS = 16
+# Reported times this far from the interpolated position re-anchor it, e.g. after a stall
+RESYNC_MS = 250
+# Interval at which a drag on the progress bar is passed on to the player
+SEEK_INTERVAL_MS = 50
+# After a seek, how long the player's reported time is ignored while it catches up
+SEEK_SETTLE_S = 0.5
+# Volume in percent, and how far one wheel notch moves it
+DEFAULT_VOLUME = 80
+VOLUME_STEP = 5
+
+class VlcEvents(QObject):
+    # libVLC invokes callbacks on its own thread; re-emitting them as Qt signals
+    # queues them onto the GUI thread, where calling back into the player is safe
+    length_changed = pyqtSignal(int)
+    end_reached = pyqtSignal()
+    playing = pyqtSignal()
+    paused = pyqtSignal()
+    stopped = pyqtSignal()
+
+    def __init__(self, player, parent=None):
+        super().__init__(parent)
+        import vlc
+        self.event_manager = player.event_manager()
+        self.handlers = {
+            vlc.EventType.MediaPlayerLengthChanged: lambda event: self.length_changed.emit(event.u.new_length),
+            vlc.EventType.MediaPlayerEndReached: lambda event: self.end_reached.emit(),
+            vlc.EventType.MediaPlayerPlaying: lambda event: self.playing.emit(),
+            vlc.EventType.MediaPlayerPaused: lambda event: self.paused.emit(),
+            vlc.EventType.MediaPlayerStopped: lambda event: self.stopped.emit(),
+        }
+        for event_type, handler in self.handlers.items():
+            self.event_manager.event_attach(event_type, handler)
+
+    def detach(self):
+        for event_type in self.handlers:
+            self.event_manager.event_detach(event_type)
+
+class MediaParser(QObject):
+    # Reads duration and tags with libVLC's preparser, which never opens an
+    # audio output. The parsed-changed callback arrives on a libVLC thread and
+    # is queued back here before the media is touched again.
+    parsed = pyqtSignal(str, object)
+    _changed = pyqtSignal(str)
+
+    PARSE_TIMEOUT_MS = 5000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pending = {}
+        self._changed.connect(self._finish)
+
+    def parse(self, path, media):
+        import vlc
+        self.cancel(path)
+        media.event_manager().event_attach(vlc.EventType.MediaParsedChanged, lambda event: self._changed.emit(path))
+        self.pending[path] = media
+        if media.parse_with_options(vlc.MediaParseFlag.local, self.PARSE_TIMEOUT_MS) != 0:
+            self._finish(path)
+
+    def cancel(self, path):
+        import vlc
+        media = self.pending.pop(path, None)
+        if media is not None:
+            media.event_manager().event_detach(vlc.EventType.MediaParsedChanged)
+
+    def cancel_all(self):
+        for path in list(self.pending):
+            self.cancel(path)
+
+    def _finish(self, path):
+        import vlc
+        media = self.pending.get(path)
+        if media is None:
+            return
+        self.cancel(path)
+        info = None
+        if media.get_parsed_status() == vlc.MediaParsedStatus.done and media.get_duration() > 0:
+            info = {
+                "title": media.get_meta(vlc.Meta.Title),
+                "artist": media.get_meta(vlc.Meta.Artist),
+                "album": media.get_meta(vlc.Meta.Album),
+                "duration_ms": media.get_duration(),
+            }
+        self.parsed.emit(path, info)
+
+class TransparentMusicPlayer(TranslucentPanel):
+    metrics_name = "mplayer"
 
-class TransparentMusicPlayer(QWidget):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, hosted=False, player=None):
+        super().__init__(QColor(0, 0, 0, 180), radius=10)
+        self.hosted = hosted
 
         # Window settings
         self.setWindowFlags(Qt.WindowStaysOnBottomHint | Qt.FramelessWindowHint | Qt.Tool)
-        self.setAttribute(Qt.WA_TranslucentBackground)
         self.setWindowOpacity(0.9)
         self.setGeometry(100, 100, 300, 200)
 
         # Custom font
-        font_id = QFontDatabase.addApplicationFont("fonts/minecraft.ttf")
-        if font_id != -1 and QFontDatabase.applicationFontFamilies(font_id):
-            font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
-            self.custom_font = QFont(font_family, 24)
-        else:
-            self.custom_font = QFont("Arial", 24)
+        self.custom_font = get_font(24)
 
         # Layout
         main_layout = QVBoxLayout()
         self.setLayout(main_layout)
 
-        self.setStyleSheet(""" 
-            QWidget {
-                background-color: rgba(0, 0, 0, 180);
-                color: white;
-                border-radius: 10px;
-            }
-            QLabel {
-                color: white;
-                font-size: 14px;
-            }
-        """)
-
         # Minimize to tray button
         self.minimize_to_tray_button = QPushButton(self)
-        self.minimize_to_tray_button.setIcon(QIcon("images/close_icon.png"))
+        self.minimize_to_tray_button.setIcon(get_icon("images/close_icon.png"))
         self.minimize_to_tray_button.setIconSize(QSize(24, 24))
         self.minimize_to_tray_button.setStyleSheet("background-color: transparent; border: none;")
         self.minimize_to_tray_button.clicked.connect(self.hide_to_tray)
@@ -49,12 +134,33 @@ class TransparentMusicPlayer(QWidget):
         button_layout = QHBoxLayout()
         main_layout.addLayout(button_layout)
 
-        # VLC player 
-        self.player = vlc.MediaPlayer()
+        # VLC player, or any object with the same interface. libVLC is only
+        # loaded when the first track is opened, see ensure_player.
+        self.player = player
+        self.vlc_events = None
+        self.current_path = None
+        self.media_parser = MediaParser(self)
+        self.media_parser.parsed.connect(self.on_media_parsed)
+        self.is_playing = False
+        self.current_ms = 0
+        self.length_ms = 0
+        # current_ms is the position at position_at on the monotonic clock; while
+        # playing the position in between is interpolated, see playback_position_ms
+        self.position_at = time.monotonic()
+        self.seek_settle_until = 0.0
+        self.pending_seek_ms = None
+        self.seek_timer = QTimer(self)
+        self.seek_timer.setSingleShot(True)
+        self.seek_timer.setTimerType(Qt.PreciseTimer)
+        self.seek_timer.setInterval(SEEK_INTERVAL_MS)
+        self.seek_timer.timeout.connect(self.apply_seek)
+        self.waveform_loader = WaveformLoader(self)
+        self.waveform_loader.ready.connect(self.on_waveform_ready)
         
         # Music name label
         self.music_name_label = QLabel("No Music Loaded")
         self.music_name_label.setFont(self.custom_font)
+        self.music_name_label.setStyleSheet("color: white; font-size: 14px;")
         self.music_name_label.setAlignment(Qt.AlignCenter)
         main_layout.addWidget(self.music_name_label)
         
@@ -72,55 +178,53 @@ class TransparentMusicPlayer(QWidget):
         # Time on Music
         self.duration_label = QLabel("00:00 / 00:00")
         self.duration_label.setFont(self.custom_font)
+        self.duration_label.setStyleSheet("color: white; font-size: 14px;")
         self.duration_label.setAlignment(Qt.AlignCenter)
         main_layout.addWidget(self.duration_label)
 
-        # Progress bar
-        self.progress_bar = QProgressBar(self)
-        self.progress_bar.setTextVisible(False)
-        self.progress_bar.setVisible(False)
-        self.progress_bar.setStyleSheet("""
-            QProgressBar {
-                background-color: #333;
-                border: 1px solid #555;
-                height: 8px;
-                border-radius: 5px;
-            }
-            QProgressBar::chunk {
-                background-color: #777;
-                border-radius: 5px;
-            }
-        """)
-        main_layout.addWidget(self.progress_bar)
+        # Waveform progress bar, a flat bar until the track has been analysed
+        self.seek_bar = WaveformBar(self)
+        self.seek_bar.setVisible(False)
+        self.seek_bar.seek_requested.connect(self.seek)
+        main_layout.addWidget(self.seek_bar)
+
+        # Spectrum computed along with the waveform when the track is opened,
+        # not from the audio as it plays; toggled from the tray menu
+        self.spectrum = SpectrumView(self.playback_position_ms, self)
+        self.spectrum.setVisible(False)
+        main_layout.addWidget(self.spectrum)
 
         # Play button
         self.play_button = QPushButton(self)
-        self.play_button.setIcon(QIcon("images/play_icon.jpeg"))
+        self.play_button.setIcon(get_icon("images/play_icon.jpeg"))
         self.play_button.setIconSize(QSize(48, 48))
         self.play_button.setStyleSheet("background-color: transparent; border: none;")
         self.play_button.clicked.connect(self.toggle_play_pause)
 
         # Stop button
         self.stop_button = QPushButton(self)
-        self.stop_button.setIcon(QIcon("images/stop_icon.png"))
+        self.stop_button.setIcon(get_icon("images/stop_icon.png"))
         self.stop_button.setIconSize(QSize(48, 48))
         self.stop_button.setStyleSheet("background-color: transparent; border: none;")
         self.stop_button.clicked.connect(self.stop_music)
 
         # Load button
         load_button = QPushButton(self)
-        load_button.setIcon(QIcon("images/load_icon.png"))
+        load_button.setIcon(get_icon("images/load_icon.png"))
         load_button.setIconSize(QSize(48, 48))
         load_button.setStyleSheet("background-color: transparent; border: none;")
         load_button.clicked.connect(self.load_music)
 
         # Loop button
         self.loop_button = QPushButton(self)
-        self.loop_button.setIcon(QIcon("images/loop_icon.png"))
+        self.loop_button.setIcon(get_icon("images/loop_icon.png"))
         self.loop_button.setIconSize(QSize(24, 24))
         self.loop_button.setStyleSheet("background-color: transparent; border: none;")
         self.loop_button.clicked.connect(self.toggle_loop)
-        self.is_loop_enabled = False
+        self.settings = Settings.instance()
+        self.is_loop_enabled = bool(self.settings.get("mplayer.loop", False))
+        self.update_loop_icon()
+        self.volume = self.settings.get("mplayer.volume", DEFAULT_VOLUME)
 
         # Layout for buttons
         control_button_layout = QHBoxLayout()
@@ -132,14 +236,42 @@ class TransparentMusicPlayer(QWidget):
         button_layout.addWidget(self.loop_button, alignment=Qt.AlignRight)
         button_layout.addWidget(self.minimize_to_tray_button, alignment=Qt.AlignRight)
 
-
-        # Timer
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_position)
+        # Library panel, hidden until toggled from the tray menu. The index
+        # itself is opened after the first paint, see ensure_library.
+        self.library = None
+        self.library_scanner = None
+
+        self.library_panel = QWidget(self)
+        library_layout = QVBoxLayout(self.library_panel)
+        library_layout.setContentsMargins(0, 0, 0, 0)
+        self.library_search = QLineEdit(self.library_panel)
+        self.library_search.setPlaceholderText("Search library")
+        self.library_search.textChanged.connect(self.refresh_library)
+        self.library_list = QListWidget(self.library_panel)
+        self.library_list.itemActivated.connect(self.on_library_item_activated)
+        library_layout.addWidget(self.library_search)
+        library_layout.addWidget(self.library_list)
+        self.library_panel.setStyleSheet("background-color: rgba(0, 0, 0, 180); color: white; border-radius: 10px;")
+        self.library_panel.setVisible(False)
+        main_layout.addWidget(self.library_panel)
+
+        # Progress redraws, only while playing and visible: one per change of the
+        # time label or step of the playhead, see next_progress_delay_ms.
+        self.timer = Scheduler.instance().add_job(
+            "mplayer.position", 1000, tolerance_ms=PROGRESS_COALESCE_MS, idle_tolerance_ms=1000, parent=self)
+        self.timer.triggered.connect(self.on_progress_tick)
+        self.resyncs = metrics.counter("mplayer.position_resyncs")
         self.total_duration = QTime(0, 0, 0)
 
+        # UI timer and blinking only run while the player is on screen
+        self.power = PowerManager(self)
+        self.power.watch(self.timer.triggered)
+        self.power.watch(self.blink_animation.valueChanged)
+        self.power.suspended.connect(self.suspend_updates)
+        self.power.resumed.connect(self.resume_updates)
+
         # Tray icon
-        self.tray_icon = QSystemTrayIcon(QIcon("images/music.png"), self)
+        self.tray_icon = QSystemTrayIcon(get_icon("images/music.png"), self)
         self.tray_icon.setToolTip("Music Player")
 
         # Tray menu
@@ -167,89 +299,390 @@ class TransparentMusicPlayer(QWidget):
         """)
         show_action = tray_menu.addAction("Show")
         show_action.triggered.connect(self.show)
+        library_action = tray_menu.addAction("Library")
+        library_action.triggered.connect(self.toggle_library)
+        add_folder_action = tray_menu.addAction("Add Music Folder...")
+        add_folder_action.triggered.connect(self.add_library_folder)
+        spectrum_action = tray_menu.addAction("Precomputed Spectrum")
+        spectrum_action.setCheckable(True)
+        spectrum_action.toggled.connect(self.toggle_spectrum)
+        stats_action = tray_menu.addAction("Stats")
+        stats_action.triggered.connect(self.show_stats)
         exit_action = tray_menu.addAction("Exit")
-        exit_action.triggered.connect(QApplication.quit)
+        exit_action.triggered.connect(self.exit_widget)
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.activated.connect(self.on_tray_icon_activated)
         self.tray_icon.show()
-        self.old_pos = None
+        self.dragger = WindowDragger(self, "mplayer")
+        self.control = CommandServer("mplayer", {
+            "show": self.show,
+            "hide": self.hide,
+            "play_pause": self.toggle_play_pause,
+            "status": self.status,
+        }, self)
+        if not self.control.listen():
+            self.hand_over("mplayer")
+
+        # Reopen the last track and pick up files added or changed since the
+        # last run, once the window is up
+        coldstart.after_first_paint(self, self.restore_session)
+
+    def ensure_player(self):
+        if self.player is None:
+            import vlc
+            self.player = vlc.MediaPlayer()
+            self.player.audio_set_volume(self.volume)
+        if self.vlc_events is None:
+            self.vlc_events = VlcEvents(self.player, self)
+            self.vlc_events.length_changed.connect(self.on_length_changed)
+            self.vlc_events.end_reached.connect(self.on_end_reached)
+            self.vlc_events.playing.connect(self.on_playing)
+            self.vlc_events.paused.connect(self.on_stopped_or_paused)
+            self.vlc_events.stopped.connect(self.on_stopped_or_paused)
+        return self.player
+
+    def ensure_library(self):
+        if self.library is None:
+            from music_library import LibraryIndex, LibraryScanner
+            self.library = LibraryIndex()
+            self.library_scanner = LibraryScanner(self.library.path, self)
+            self.library_scanner.progress.connect(self.on_library_progress)
+            self.library_scanner.finished.connect(self.on_library_scanned)
+        return self.library
+
+    def restore_session(self):
+        path = self.settings.get("mplayer.last_track")
+        if path and self.current_path is None and os.path.isfile(path):
+            self.open_track(path)
+        self.rescan_library()
+
+    def rescan_library(self):
+        library = self.ensure_library()
+        self.library_scanner.scan(library.folders())
 
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.old_pos = event.globalPos()
+        self.dragger.press(event)
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() // 120
+        if not steps:
+            return
+        self.set_volume(self.volume + steps * VOLUME_STEP)
+        QToolTip.showText(event.globalPos(), f"Volume {self.volume}%", self)
+        event.accept()
+
+    def set_volume(self, volume):
+        self.volume = max(0, min(100, volume))
+        if self.player is not None:
+            self.player.audio_set_volume(self.volume)
+        # Every notch of a scroll lands here; the settings write happens once it stops
+        self.settings.set("mplayer.volume", self.volume)
 
     def mouseMoveEvent(self, event):
-        if self.old_pos:
-            delta = event.globalPos() - self.old_pos
-            self.move(self.pos() + delta)
-            self.old_pos = event.globalPos()
+        self.dragger.move(event)
+
+    def mouseReleaseEvent(self, event):
+        self.dragger.release(event)
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "hosted": self.hosted,
+            "visible": self.isVisible(),
+            "track": self.music_name_label.text() if self.player is not None else None,
+            "playing": self.is_playing,
+            "position_ms": self.playback_position_ms(),
+            "length_ms": self.length_ms,
+            "loop": self.is_loop_enabled,
+            "wakeups_per_minute": self.power.wakeups_per_minute(),
+            "volume": self.volume,
+        }
+
+    def show_stats(self):
+        metrics.show_stats(self, {"mplayer", "loop"})
 
     def load_music(self):
         file_dialog = QFileDialog()
         file_path, _ = file_dialog.getOpenFileName(self, "Open Music File", "", "Audio Files (*.mp3 *.wav *.ogg)")
         if file_path:
-            self.player.set_mrl(file_path)
-            self.music_name_label.setText(os.path.splitext(os.path.basename(file_path))[0])
-            self.play_button.setIcon(QIcon("images/play_icon.jpeg"))
-            self.duration_label.setText("00:00 / 00:00")
-            self.progress_bar.setValue(0)
-            self.progress_bar.setVisible(True)
-            self.total_duration = QTime(0, 0, 0)
-
-            self.player.play()
-            QTimer.singleShot(100, self.player.pause)
+            self.open_track(file_path)
+
+    def open_track(self, file_path):
+        player = self.ensure_player()
+        file_path = os.path.abspath(file_path)
+        media = player.get_instance().media_new(file_path)
+        player.set_media(media)
+        self.current_path = file_path
+        self.settings.set("mplayer.last_track", file_path)
+        self.music_name_label.setText(os.path.splitext(os.path.basename(file_path))[0])
+        self.play_button.setIcon(get_icon("images/play_icon.jpeg"))
+        self.duration_label.setText("00:00 / 00:00")
+        self.total_duration = QTime(0, 0, 0)
+        self.current_ms = 0
+        self.length_ms = 0
+        self.pending_seek_ms = None
+        self.seek_bar.set_peaks(None)
+        self.seek_bar.set_progress(0, 0)
+        self.seek_bar.setVisible(True)
+        self.spectrum.set_frames(None)
+        self.waveform_loader.load(file_path)
+
+        # Duration and tags come from the cache when the file is unchanged since
+        # it was last parsed or scanned, otherwise from parsing it in the background
+        try:
+            stat = os.stat(file_path)
+            info = self.ensure_library().media_info(file_path, stat.st_mtime, stat.st_size)
+        except OSError:
+            info = None
+        if info is not None:
+            self.show_media_info(info)
+        else:
+            self.media_parser.parse(file_path, media)
+
+    def on_media_parsed(self, path, info):
+        if info is None:
+            return
+        try:
+            stat = os.stat(path)
+            self.ensure_library().remember_media_info(path, stat.st_mtime, stat.st_size, info)
+        except OSError:
+            pass
+        if path == self.current_path:
+            self.show_media_info(info)
+
+    def on_waveform_ready(self, path, analysis):
+        if analysis is None or path != self.current_path:
+            return
+        self.seek_bar.set_peaks(analysis["peaks"])
+        self.spectrum.set_frames(analysis["spectrum"])
+
+    def show_media_info(self, info):
+        if info.get("title"):
+            text = f"{info['artist']} - {info['title']}" if info.get("artist") else info["title"]
+            self.music_name_label.setText(text)
+        # The player's own LengthChanged wins once playback has started
+        if not self.length_ms and info.get("duration_ms"):
+            self.length_ms = info["duration_ms"]
+            self.update_timer()
 
     def toggle_play_pause(self):
+        if self.player is None:
+            return
         if self.player.is_playing():
             self.player.pause()
-            self.play_button.setIcon(QIcon("images/play_icon.jpeg"))
-            self.blink_animation.start()  # Start blinking
+            self.play_button.setIcon(get_icon("images/play_icon.jpeg"))
+            self.start_blinking()
         else:
             self.player.play()
-            self.play_button.setIcon(QIcon("images/pause_icon.png"))
+            self.play_button.setIcon(get_icon("images/pause_icon.png"))
             self.blink_animation.stop()  # Stop blinking
             self.opacity_effect.setOpacity(1.0)
-            self.timer.start(1000)
 
     def stop_music(self):
-        self.player.stop()
-        self.play_button.setIcon(QIcon("images/play_icon.jpeg"))
+        if self.player is not None:
+            self.player.stop()
+        self.is_playing = False
+        self.current_ms = 0
+        self.length_ms = 0
+        self.play_button.setIcon(get_icon("images/play_icon.jpeg"))
         self.music_name_label.setText("No Music Loaded")
         self.duration_label.setText("00:00 / 00:00")
-        self.progress_bar.setValue(0)
-        self.progress_bar.setVisible(False)
+        self.seek_bar.set_progress(0, 0)
+        self.seek_bar.setVisible(False)
         self.timer.stop()
+        self.spectrum.stop()
         self.blink_animation.stop()
         self.opacity_effect.setOpacity(1.0)
 
     def toggle_loop(self):
         self.is_loop_enabled = not self.is_loop_enabled
+        self.settings.set("mplayer.loop", self.is_loop_enabled)
+        self.update_loop_icon()
+
+    def update_loop_icon(self):
         icon_path = "images/loop_icon_active.png" if self.is_loop_enabled else "images/loop_icon.png"
-        self.loop_button.setIcon(QIcon(icon_path))
+        self.loop_button.setIcon(get_icon(icon_path))
+
+    def toggle_spectrum(self, visible):
+        self.spectrum.setVisible(visible)
+        self.adjustSize()
+        self.update_timer()
+
+    def toggle_library(self):
+        visible = not self.library_panel.isVisible()
+        if visible:
+            self.refresh_library()
+            self.show()
+        self.library_panel.setVisible(visible)
+        self.adjustSize()
+
+    def add_library_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Music Folder")
+        if folder:
+            self.ensure_library().add_folder(folder)
+            self.rescan_library()
+
+    def refresh_library(self):
+        self.library_list.clear()
+        for path, title, artist, album, duration_ms in self.ensure_library().search(self.library_search.text()):
+            text = f"{title} - {artist}" if artist else title
+            if duration_ms:
+                text += f" ({duration_ms // 60000:02d}:{duration_ms // 1000 % 60:02d})"
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, path)
+            self.library_list.addItem(item)
+
+    def on_library_item_activated(self, item):
+        self.open_track(item.data(Qt.UserRole))
+
+    def on_library_progress(self, done, total):
+        self.library_search.setPlaceholderText(f"Scanning library... {done}/{total}")
+
+    def on_library_scanned(self, stats):
+        self.library_search.setPlaceholderText("Search library")
+        if self.library_panel.isVisible():
+            self.refresh_library()
+
+    def playback_position_ms(self):
+        # The last sampled time, advanced by the clock while playing
+        if not self.is_playing:
+            return self.current_ms
+        position = self.current_ms + int((time.monotonic() - self.position_at) * 1000)
+        return min(position, self.length_ms) if self.length_ms else position
+
+    def sync_position(self, exact=False):
+        # Sample libVLC's time instead of waking for every TimeChanged event.
+        # While playing, only samples ahead of the clock or far behind it move
+        # the anchor, so the playhead never steps back over libVLC's jitter.
+        if self.player is None or time.monotonic() < self.seek_settle_until:
+            return
+        time_ms = self.player.get_time()
+        if time_ms is None or time_ms < 0:
+            return
+        predicted = self.playback_position_ms()
+        if exact or time_ms > predicted or predicted - time_ms > RESYNC_MS:
+            if not exact and abs(time_ms - predicted) > RESYNC_MS:
+                self.resyncs.inc()
+            self.current_ms = time_ms
+            self.position_at = time.monotonic()
+
+    def seek(self, fraction, final):
+        if self.player is None or not self.length_ms:
+            return
+        self.current_ms = int(fraction * self.length_ms)
+        self.position_at = time.monotonic()
+        self.seek_settle_until = self.position_at + SEEK_SETTLE_S
+        self.pending_seek_ms = self.current_ms
+        # A drag sends at most one seek per SEEK_INTERVAL_MS; the release goes straight through
+        if final:
+            self.seek_timer.stop()
+            self.apply_seek()
+        elif not self.seek_timer.isActive():
+            self.seek_timer.start()
+        self.update_timer()
+
+    def apply_seek(self):
+        if self.pending_seek_ms is not None and self.player is not None:
+            self.player.set_time(self.pending_seek_ms)
+        self.pending_seek_ms = None
+
+    def on_length_changed(self, length_ms):
+        self.length_ms = length_ms
+        self.update_timer()
+
+    def on_playing(self):
+        self.is_playing = True
+        self.position_at = time.monotonic()
+        self.sync_position(exact=True)
+        self.update_timer()
+
+    def on_stopped_or_paused(self):
+        self.current_ms = self.playback_position_ms()
+        self.is_playing = False
+        self.sync_position(exact=True)
+        self.update_timer()
+
+    def on_end_reached(self):
+        if self.is_loop_enabled:
+            # An ended libVLC player has to be stopped before it will play again
+            self.player.stop()
+            self.player.play()
+            return
+        self.is_playing = False
+        self.current_ms = self.length_ms
+        self.update_timer()
+        self.play_button.setIcon(get_icon("images/play_icon.jpeg"))
+
+    def start_blinking(self):
+        self.blink_animation.start()
+        if not self.power.is_active():
+            self.blink_animation.pause()
+
+    def suspend_updates(self):
+        self.timer.stop()
+        self.spectrum.stop()
+        if self.blink_animation.state() == QAbstractAnimation.Running:
+            self.blink_animation.pause()
+
+    def resume_updates(self):
+        if self.blink_animation.state() == QAbstractAnimation.Paused:
+            self.blink_animation.resume()
+        self.update_timer()
+
+    def update_timer(self):
+        if self.is_playing and self.power.is_active():
+            self.timer.start(self.next_progress_delay_ms(self.update_position()))
+            if self.spectrum.isVisible():
+                self.spectrum.start()
+            else:
+                self.spectrum.stop()
+        else:
+            self.timer.stop()
+            self.spectrum.stop()
+            self.update_position()
+
+    def on_progress_tick(self):
+        self.sync_position()
+        self.timer.start(self.next_progress_delay_ms(self.update_position()))
+
+    def next_progress_delay_ms(self, position_ms):
+        # Wake for the next mm:ss change or the playhead's next pixel, whichever
+        # comes first, so a short track's playhead glides a pixel at a time and
+        # a long one's still redraws once a second. A label change is pushed back
+        # to meet a pixel step due shortly after it, so one wakeup serves both.
+        delay = 1000 - position_ms % 1000
+        pixel_ms = self.seek_bar.ms_until_next_pixel(position_ms, self.length_ms)
+        if pixel_ms is not None and pixel_ms <= delay + PROGRESS_COALESCE_MS:
+            delay = pixel_ms
+        return max(PROGRESS_MIN_INTERVAL_MS, delay)
 
     def update_position(self):
-        current_time_sec = int(self.player.get_time() / 1000)
-        total_time_sec = int(self.player.get_length() / 1000)
+        position_ms = self.playback_position_ms()
+        current_time_sec = position_ms // 1000
+        total_time_sec = self.length_ms // 1000
 
         current_time = QTime(0, (current_time_sec // 60) % 60, current_time_sec % 60)
         total_time = QTime(0, (total_time_sec // 60) % 60, total_time_sec % 60)
 
-        self.duration_label.setText(f"{current_time.toString('mm:ss')} / {total_time.toString('mm:ss')}")
-
-        if total_time_sec > 0:
-            progress_value = (current_time_sec / total_time_sec) * 100
-            self.progress_bar.setValue(int(progress_value))
-
-        # Looping logic
-        if self.is_loop_enabled:
-            state = self.player.get_state()
-            if state == vlc.State.Ended:
-                self.player.stop()
-                self.player.set_time(0)  # Reset to start
-                self.player.play()
-        elif self.player.get_state() == vlc.State.Ended:
-            self.timer.stop()
-
+        text = f"{current_time.toString('mm:ss')} / {total_time.toString('mm:ss')}"
+        if text != self.duration_label.text():
+            self.duration_label.setText(text)
+
+        self.seek_bar.set_progress(position_ms, self.length_ms)
+        return position_ms
+
+    def teardown(self):
+        self.media_parser.cancel_all()
+        self.waveform_loader.stop()
+        self.spectrum.stop()
+        self.seek_timer.stop()
+        if self.vlc_events is not None:
+            self.vlc_events.detach()
+        if self.library is not None:
+            self.library.close()
+        if self.player is not None:
+            self.player.stop()
+        self.blink_animation.stop()
 
     def on_tray_icon_activated(self, reason):
         if reason == QSystemTrayIcon.Trigger:
@@ -265,11 +698,18 @@ class TransparentMusicPlayer(QWidget):
             3000,
         )
 
+def create_mplayer(hosted=False):
+    player = TransparentMusicPlayer(hosted)
+    player.show()
+    player.dragger.restore(QPoint(1440, 0))
+    return player
+
 def run_mplayer():
     app = QApplication(sys.argv)
-    player = TransparentMusicPlayer()
-    player.show()
-    player.move(1440, 0)
+    if send_command("mplayer", "show") is not None:
+        return
+    quit_on_terminate(app)
+    player = create_mplayer()
     app.exec_()
 
 if __name__ == '__main__':
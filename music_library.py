@@ -0,0 +1,247 @@
+import os
+import time
+import wave
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from storage import data_dir
+
+try:
+    import mutagen
+except ImportError:
+    mutagen = None
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    duration_ms INTEGER,
+    mtime REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS tracks_folder ON tracks(folder);
+CREATE TABLE IF NOT EXISTS media_info (
+    path TEXT PRIMARY KEY,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    duration_ms INTEGER,
+    mtime REAL,
+    size INTEGER
+);
+"""
+
+# Rows written per transaction while scanning
+BATCH_SIZE = 500
+
+
+def default_index_path():
+    return os.path.join(data_dir("library"), "library.sqlite3")
+
+
+def open_index(path):
+    connection = sqlite3.connect(path)
+    # WAL lets the widget search while a scan is writing
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def iter_audio_files(folder):
+    pending = [folder]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                        yield entry.path, entry.stat()
+                except OSError:
+                    continue
+
+
+def probe_track(path):
+    info = {
+        "title": os.path.splitext(os.path.basename(path))[0],
+        "artist": None,
+        "album": None,
+        "duration_ms": None,
+    }
+    if mutagen is not None:
+        try:
+            audio = mutagen.File(path, easy=True)
+        except Exception:
+            audio = None
+        if audio is not None:
+            if getattr(audio.info, "length", None):
+                info["duration_ms"] = int(audio.info.length * 1000)
+            tags = audio.tags or {}
+            for key in ("title", "artist", "album"):
+                values = tags.get(key)
+                if values:
+                    info[key] = values[0]
+    if info["duration_ms"] is None and path.lower().endswith(".wav"):
+        try:
+            with wave.open(path) as wav:
+                info["duration_ms"] = wav.getnframes() * 1000 // wav.getframerate()
+        except (wave.Error, OSError, EOFError, ZeroDivisionError):
+            pass
+    return info
+
+
+def scan_folders(index_path, folders, workers=None, progress=None):
+    # Only files whose mtime or size changed since the last scan are probed
+    started = time.perf_counter()
+    connection = open_index(index_path)
+    folders = [os.path.abspath(folder) for folder in folders]
+    placeholders = ",".join("?" * len(folders))
+    known = {
+        path: (mtime, size)
+        for path, mtime, size in connection.execute(
+            f"SELECT path, mtime, size FROM tracks WHERE folder IN ({placeholders})", folders)
+    }
+
+    seen = set()
+    changed = []
+    for folder in folders:
+        for path, stat in iter_audio_files(folder):
+            seen.add(path)
+            if known.get(path) != (stat.st_mtime, stat.st_size):
+                changed.append((path, folder, stat))
+    removed = [path for path in known if path not in seen]
+
+    rows = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 1) + 2)) as pool:
+        probed = pool.map(probe_track, [path for path, _, _ in changed])
+        for (path, folder, stat), info in zip(changed, probed):
+            rows.append((path, folder, info["title"], info["artist"], info["album"],
+                         info["duration_ms"], stat.st_mtime, stat.st_size))
+            if len(rows) >= BATCH_SIZE:
+                done += write_tracks(connection, rows)
+                rows = []
+                if progress is not None:
+                    progress(done, len(changed))
+    done += write_tracks(connection, rows)
+
+    with connection:
+        connection.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path in removed])
+    connection.close()
+    if progress is not None:
+        progress(done, len(changed))
+    return {
+        "files": len(seen),
+        "probed": len(changed),
+        "removed": len(removed),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def write_tracks(connection, rows):
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO tracks (path, folder, title, artist, album, duration_ms, mtime, size)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+class LibraryIndex:
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        self.connection = open_index(self.path)
+
+    def add_folder(self, folder):
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO folders (path) VALUES (?)", (os.path.abspath(folder),))
+
+    def folders(self):
+        return [row[0] for row in self.connection.execute("SELECT path FROM folders ORDER BY path")]
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def search(self, text="", limit=200):
+        query = "SELECT path, title, artist, album, duration_ms FROM tracks"
+        params = []
+        if text:
+            pattern = f"%{text}%"
+            query += " WHERE title LIKE ? OR artist LIKE ? OR album LIKE ? OR path LIKE ?"
+            params = [pattern] * 4
+        query += " ORDER BY artist, album, title LIMIT ?"
+        params.append(limit)
+        return self.connection.execute(query, params).fetchall()
+
+    def media_info(self, path, mtime, size):
+        # Scanned tracks and earlier parses both count, as long as the file is unchanged
+        for table in ("tracks", "media_info"):
+            row = self.connection.execute(
+                f"SELECT title, artist, album, duration_ms FROM {table} WHERE path = ? AND mtime = ? AND size = ?",
+                (path, mtime, size)).fetchone()
+            if row is not None and row[3]:
+                return dict(zip(("title", "artist", "album", "duration_ms"), row))
+        return None
+
+    def remember_media_info(self, path, mtime, size, info):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO media_info (path, title, artist, album, duration_ms, mtime, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, info["title"], info["artist"], info["album"], info["duration_ms"], mtime, size))
+
+    def close(self):
+        self.connection.close()
+
+
+class LibraryScanner(QObject):
+    # Runs scan_folders on a background thread and reports through signals
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+
+    def __init__(self, index_path, parent=None):
+        super().__init__(parent)
+        self.index_path = index_path
+        self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def scan(self, folders):
+        if self.is_running() or not folders:
+            return False
+        self.thread = threading.Thread(target=self._run, args=(list(folders),), name="library-scan", daemon=True)
+        self.thread.start()
+        return True
+
+    def _run(self, folders):
+        try:
+            stats = scan_folders(self.index_path, folders, progress=self._report)
+        except Exception as e:
+            print("Library scan failed:", e)
+            stats = None
+        try:
+            self.finished.emit(stats)
+        except RuntimeError:
+            pass
+
+    def _report(self, done, total):
+        try:
+            self.progress.emit(done, total)
+        except RuntimeError:
+            pass
@@ -0,0 +1,89 @@
+import sys
+from PyQt5.QtCore import Qt, QRectF, QEvent, QTimer
+from PyQt5.QtGui import QColor, QPainter, QPainterPath, QPixmap
+from PyQt5.QtWidgets import QApplication, QWidget, QLabel
+import metrics
+from ipc import send_command
+
+
+class TranslucentPanel(QWidget):
+    # Base for the frameless widgets: draws the rounded translucent background
+    # itself instead of through a cascading stylesheet, so children stay plain
+    # widgets that Qt does not have to polish or round-clip on every repaint.
+    # Subclasses name themselves in metrics_name, the prefix of their metrics,
+    # and set up hosted, dragger, control, timer and tray_icon for exit_widget.
+    metrics_name = "panel"
+
+    def __init__(self, background=QColor(0, 0, 0, 120), radius=15, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.panel_color = QColor(background)
+        self.panel_radius = radius
+        # The background is rendered once per size into a pixmap shown by a
+        # label under every other child; Qt blits it without calling back into
+        # Python, and only for the region that actually needs repainting
+        self.background_label = QLabel(self)
+        self.background_label.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.background_label.lower()
+        self.paint_histogram = metrics.histogram(f"{self.metrics_name}.paint_ms")
+        metrics.start()
+
+    def set_panel_style(self, background=None, radius=None):
+        if background is not None:
+            self.panel_color = QColor(background)
+        if radius is not None:
+            self.panel_radius = radius
+        self._render_background()
+
+    def hand_over(self, name):
+        # Another instance took the single-instance lock after run_*'s check:
+        # show that one and step aside, as a second launch does
+        send_command(name, "show")
+        if self.hosted:
+            QTimer.singleShot(0, self.exit_widget)
+        else:
+            sys.exit(0)
+
+    def exit_widget(self):
+        # Hosted widgets share the launcher's QApplication, so only tear down this window
+        if self.hosted:
+            self.dragger.flush()
+            self.control.close()
+            self.timer.stop()
+            self.teardown()
+            self.tray_icon.hide()
+            self.close()
+            self.deleteLater()
+        else:
+            QApplication.quit()
+
+    def teardown(self):
+        # Stops whatever else the widget runs (threads, players, animations)
+        # when it leaves a launcher that keeps running
+        pass
+
+    def event(self, event):
+        # The window repaints itself and every dirty child while handling UpdateRequest
+        if event.type() == QEvent.UpdateRequest:
+            with self.paint_histogram.time():
+                return super().event(event)
+        return super().event(event)
+
+    def resizeEvent(self, event):
+        # Geometry only changes here; moving the window repaints nothing
+        self._render_background()
+        super().resizeEvent(event)
+
+    def _render_background(self):
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(self.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(self.rect()), self.panel_radius, self.panel_radius)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillPath(path, self.panel_color)
+        painter.end()
+        self.background_label.setGeometry(self.rect())
+        self.background_label.setPixmap(pixmap)
@@ -0,0 +1,193 @@
+import sys
+import time
+
+from PyQt5.QtCore import QObject, QEvent, QCoreApplication, QAbstractNativeEventFilter, pyqtSignal, pyqtSlot
+
+import metrics
+
+
+class ScreenLockMonitor(QObject):
+    # Process-wide: reports when the session is locked (screensaver on Linux,
+    # session lock notifications on Windows). Stays unlocked where unsupported.
+    locked_changed = pyqtSignal(bool)
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(QCoreApplication.instance())
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.locked = False
+        self._native_filter = None
+        self._session_window = None
+        if sys.platform == "win32":
+            self._watch_windows_session()
+        elif sys.platform.startswith("linux"):
+            self._watch_dbus_screensaver()
+
+    def set_locked(self, locked):
+        if locked != self.locked:
+            self.locked = locked
+            self.locked_changed.emit(locked)
+
+    @pyqtSlot(bool)
+    def _on_screensaver_active(self, active):
+        self.set_locked(active)
+
+    def _watch_dbus_screensaver(self):
+        try:
+            from PyQt5.QtDBus import QDBusConnection
+        except ImportError:
+            return
+        bus = QDBusConnection.sessionBus()
+        if not bus.isConnected():
+            return
+        for service in ("org.freedesktop.ScreenSaver", "org.gnome.ScreenSaver"):
+            path = "/" + service.replace(".", "/")
+            bus.connect(service, path, service, "ActiveChanged", self._on_screensaver_active)
+
+    def _watch_windows_session(self):
+        import ctypes
+        from PyQt5.QtWidgets import QWidget
+
+        # Session notifications are delivered to a window, so keep a hidden one around
+        self._session_window = QWidget()
+        hwnd = int(self._session_window.winId())
+        try:
+            ctypes.windll.wtsapi32.WTSRegisterSessionNotification(hwnd, 0)
+        except (AttributeError, OSError):
+            return
+        self._native_filter = _WindowsSessionFilter(self)
+        QCoreApplication.instance().installNativeEventFilter(self._native_filter)
+
+
+class _WindowsSessionFilter(QAbstractNativeEventFilter):
+    WM_WTSSESSION_CHANGE = 0x02B1
+    WTS_SESSION_LOCK = 0x7
+    WTS_SESSION_UNLOCK = 0x8
+
+    def __init__(self, monitor):
+        super().__init__()
+        self.monitor = monitor
+
+    def nativeEventFilter(self, event_type, message):
+        if bytes(event_type) == b"windows_generic_MSG":
+            import ctypes.wintypes
+            msg = ctypes.wintypes.MSG.from_address(int(message))
+            if msg.message == self.WM_WTSSESSION_CHANGE:
+                if msg.wParam == self.WTS_SESSION_LOCK:
+                    self.monitor.set_locked(True)
+                elif msg.wParam == self.WTS_SESSION_UNLOCK:
+                    self.monitor.set_locked(False)
+        return False, 0
+
+
+class PowerManager(QObject):
+    # Tracks whether a widget is worth updating (visible and the session unlocked)
+    # and tells it to suspend or resume its periodic work. Also counts the
+    # widget's wakeups separately for the active and suspended states.
+    suspended = pyqtSignal()
+    resumed = pyqtSignal()
+
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.widget = widget
+        self.screen_lock = ScreenLockMonitor.instance()
+        self.screen_lock.locked_changed.connect(self.update_state)
+        self.active = False
+        self.wakeups = {True: 0, False: 0}
+        self.seconds = {True: 0.0, False: 0.0}
+        self.state_since = time.monotonic()
+        widget.installEventFilter(self)
+        # Reported in the widget's Stats window and status reply
+        name = getattr(widget, "metrics_name", "widget") + ".wakeups"
+        stats = self.wakeups_per_minute
+        metrics.add_source(name, stats)
+        self.destroyed.connect(lambda *_: metrics.remove_source(name, stats))
+
+    def is_active(self):
+        return self.active
+
+    def watch(self, signal):
+        # Every emission of a periodic signal counts as one wakeup
+        signal.connect(self.count_wakeup)
+
+    def count_wakeup(self, *args):
+        self.wakeups[self.active] += 1
+
+    def eventFilter(self, obj, event):
+        if obj is self.widget and event.type() in (QEvent.Show, QEvent.Hide):
+            self.update_state()
+        return False
+
+    def update_state(self, *args):
+        active = self.widget.isVisible() and not self.screen_lock.locked
+        if active == self.active:
+            return
+        now = time.monotonic()
+        self.seconds[self.active] += now - self.state_since
+        self.state_since = now
+        self.active = active
+        if active:
+            self.resumed.emit()
+        else:
+            self.suspended.emit()
+
+    def wakeups_per_minute(self):
+        seconds = dict(self.seconds)
+        seconds[self.active] += time.monotonic() - self.state_since
+        return {
+            "active": self.wakeups[True] * 60 / seconds[True] if seconds[True] else 0.0,
+            "suspended": self.wakeups[False] * 60 / seconds[False] if seconds[False] else 0.0,
+        }
+
+
+def host_idle_seconds():
+    # Seconds since the last keyboard/mouse input anywhere on the desktop, or
+    # None where the platform gives no way to ask
+    if sys.platform == "win32":
+        import ctypes
+        import ctypes.wintypes
+
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", ctypes.wintypes.UINT), ("dwTime", ctypes.wintypes.DWORD)]
+
+        info = LASTINPUTINFO(ctypes.sizeof(LASTINPUTINFO), 0)
+        if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+            return None
+        return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000
+    if sys.platform.startswith("linux"):
+        monitor = _mutter_idle_monitor()
+        if monitor is None:
+            return None
+        reply = monitor.call("GetIdletime")
+        arguments = reply.arguments()
+        return arguments[0] / 1000 if arguments else None
+    return None
+
+
+_idle_monitor = None
+_idle_monitor_checked = False
+
+def _mutter_idle_monitor():
+    # Building a QDBusInterface introspects the service with a blocking round
+    # trip, so do it once per process; a desktop without Mutter is remembered too
+    global _idle_monitor, _idle_monitor_checked
+    if not _idle_monitor_checked:
+        _idle_monitor_checked = True
+        try:
+            from PyQt5.QtDBus import QDBusConnection, QDBusInterface
+        except ImportError:
+            return None
+        bus = QDBusConnection.sessionBus()
+        if not bus.isConnected():
+            return None
+        monitor = QDBusInterface("org.gnome.Mutter.IdleMonitor", "/org/gnome/Mutter/IdleMonitor/Core",
+                                 "org.gnome.Mutter.IdleMonitor", bus)
+        if monitor.isValid():
+            _idle_monitor = monitor
+    return _idle_monitor
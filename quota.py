@@ -0,0 +1,71 @@
+import os
+import time
+import datetime
+
+import metrics
+from storage import data_dir, FileLock, read_json, atomic_write_json
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def seconds_until_utc_midnight(now=None):
+    now = datetime.datetime.fromtimestamp(now or time.time(), datetime.timezone.utc)
+    tomorrow = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+class ApiBudget:
+    # Calls per minute (sliding) and per UTC day for one API, counted in a file
+    # every widget process on the machine updates under the same lock
+    def __init__(self, name, per_minute, per_day):
+        self.name = name
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.path = None
+        self.denied = metrics.counter(f"{name}.quota_denied")
+        self.granted = metrics.counter(f"{name}.quota_granted")
+
+    def _path(self):
+        if self.path is None:
+            self.path = os.path.join(data_dir("quota"), self.name + ".json")
+        return self.path
+
+    def _load(self, now):
+        state = read_json(self._path(), None) or {}
+        today = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).date().isoformat()
+        minute = [t for t in state.get("minute", []) if now - t < 60]
+        day = state.get("day", 0) if state.get("date") == today else 0
+        return {"date": today, "day": day, "minute": minute}
+
+    def try_acquire(self, calls=1):
+        # Records the calls and returns True if both budgets still have room
+        path = self._path()
+        now = time.time()
+        with FileLock(path + ".lock"):
+            state = self._load(now)
+            if len(state["minute"]) + calls > self.per_minute or state["day"] + calls > self.per_day:
+                self.denied.inc()
+                return False
+            state["minute"].extend([now] * calls)
+            state["day"] += calls
+            atomic_write_json(path, state)
+        self.granted.inc(calls)
+        return True
+
+    def acquire(self, calls=1):
+        if not self.try_acquire(calls):
+            raise QuotaExceeded(f"{self.name} request budget used up")
+
+    def remaining(self):
+        state = self._load(time.time())
+        return {"minute": self.per_minute - len(state["minute"]), "day": self.per_day - state["day"]}
+
+    def refresh_interval(self, base_ms, calls_per_refresh=1):
+        # Stretch the refresh so what is left of today's budget lasts until it resets
+        seconds_left = seconds_until_utc_midnight()
+        refreshes_left = self.remaining()["day"] // max(1, calls_per_refresh)
+        if refreshes_left <= 0:
+            return max(base_ms, int(seconds_left * 1000))
+        return max(base_ms, int(seconds_left / refreshes_left * 1000))
@@ -0,0 +1,118 @@
+import os
+import sys
+import subprocess
+from xml.sax.saxutils import escape
+
+from PyQt5.QtCore import QFile
+from PyQt5.QtGui import QIcon, QPixmap, QFont, QFontDatabase
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Optional compiled bundle built by `python resources.py`. Importing it registers
+# every image (and font) with Qt in one go, so ":/images/..." paths never touch disk.
+BUNDLE_MODULE = "widget_resources_rc"
+BUNDLED_DIRS = ("images", "fonts")
+
+try:
+    import widget_resources_rc
+    BUNDLED = True
+except ImportError:
+    BUNDLED = False
+
+DEFAULT_FONT = "fonts/minecraft.ttf"
+FALLBACK_FONT_FAMILY = "Arial"
+
+_paths = {}
+_icons = {}
+_pixmaps = {}
+_font_families = {}
+_fonts = {}
+# Font files that failed to load, so their widgets fell back to FALLBACK_FONT_FAMILY
+fallback_fonts = set()
+
+
+def resource_path(name):
+    # "images/foo.png" -> ":/images/foo.png" when bundled, else an absolute path
+    # next to this file, so widgets work from any working directory
+    path = _paths.get(name)
+    if path is None:
+        name = name.replace("\\", "/")
+        if BUNDLED and QFile.exists(":/" + name):
+            path = ":/" + name
+        else:
+            path = os.path.join(ROOT, *name.split("/"))
+        _paths[name] = path
+    return path
+
+
+def resource_exists(name):
+    return QFile.exists(resource_path(name))
+
+
+def get_icon(name):
+    icon = _icons.get(name)
+    if icon is None:
+        icon = _icons[name] = QIcon(resource_path(name))
+    return icon
+
+
+def get_pixmap(name):
+    pixmap = _pixmaps.get(name)
+    if pixmap is None:
+        pixmap = _pixmaps[name] = QPixmap(resource_path(name))
+    return pixmap
+
+
+def get_font_family(name=DEFAULT_FONT):
+    # Each font file is registered with Qt once per process
+    family = _font_families.get(name)
+    if family is None:
+        font_id = QFontDatabase.addApplicationFont(resource_path(name))
+        families = QFontDatabase.applicationFontFamilies(font_id) if font_id != -1 else []
+        if families:
+            family = families[0]
+        else:
+            family = FALLBACK_FONT_FAMILY
+            fallback_fonts.add(name)
+        _font_families[name] = family
+    return family
+
+
+def get_font(size=None, name=DEFAULT_FONT):
+    # Shared instance: setFont() copies it, so callers must not modify it in place
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        family = get_font_family(name)
+        font = _fonts[key] = QFont(family, size) if size else QFont(family)
+    return font
+
+
+def font_fallback_used(name=DEFAULT_FONT):
+    return name in fallback_fonts
+
+
+def build_bundle():
+    files = []
+    for directory in BUNDLED_DIRS:
+        for root, _, names in os.walk(os.path.join(ROOT, directory)):
+            for file_name in sorted(names):
+                path = os.path.relpath(os.path.join(root, file_name), ROOT)
+                files.append(path.replace(os.sep, "/"))
+
+    qrc_path = os.path.join(ROOT, BUNDLE_MODULE.replace("_rc", "") + ".qrc")
+    with open(qrc_path, "w", encoding="utf-8") as qrc:
+        qrc.write('<!DOCTYPE RCC><RCC version="1.0">\n<qresource prefix="/">\n')
+        for path in sorted(files):
+            qrc.write(f"    <file>{escape(path)}</file>\n")
+        qrc.write("</qresource>\n</RCC>\n")
+    try:
+        output = os.path.join(ROOT, BUNDLE_MODULE + ".py")
+        subprocess.check_call([sys.executable, "-m", "PyQt5.pyrcc_main", "-o", output, qrc_path])
+    finally:
+        os.remove(qrc_path)
+    print(f"Bundled {len(files)} files into {BUNDLE_MODULE}.py")
+
+
+if __name__ == "__main__":
+    build_bundle()
@@ -0,0 +1,183 @@
+import math
+import time
+
+from PyQt5.QtCore import Qt, QObject, QTimer, QCoreApplication, pyqtSignal
+
+import metrics
+from power import host_idle_seconds
+
+# Jobs due within this many seconds of a wakeup run in it rather than re-arming for a sliver
+EPSILON = 0.001
+# The host counts as idle after this long without user input; checked at most this often
+IDLE_AFTER_S = 120
+IDLE_CHECK_S = 30
+# Wall-clock grids, coarsest first, that jobs with slack are pulled onto so their
+# deadlines coincide with each other and with aligned jobs such as the clock
+SNAP_GRIDS_S = (60, 1)
+
+
+class ScheduledJob(QObject):
+    # A periodic job owned by a widget; connect to triggered to do the work
+    triggered = pyqtSignal()
+
+    def __init__(self, scheduler, name, period_ms, tolerance_ms=0, align=False, idle_tolerance_ms=None, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.name = name
+        self.period_ms = period_ms
+        self.tolerance_ms = tolerance_ms
+        # Aligned jobs fire on wall-clock multiples of the period, e.g. each minute
+        self.align = align
+        # Extra slack the job accepts while nobody is using the machine
+        self.idle_tolerance_ms = idle_tolerance_ms
+        self.deadline = None
+        self.runs = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+        self.lateness_histogram = metrics.histogram(f"{name}.lateness_ms")
+        self.run_histogram = metrics.histogram(f"{name}.run_ms")
+
+    def start(self, delay_ms=None):
+        now = time.monotonic()
+        if delay_ms is not None:
+            self.deadline = now + delay_ms / 1000
+        else:
+            self.deadline = self._next_deadline(now)
+        self.scheduler.reschedule()
+
+    def stop(self):
+        if self.deadline is not None:
+            self.deadline = None
+            self.scheduler.reschedule()
+
+    def is_active(self):
+        return self.deadline is not None
+
+    def set_period(self, period_ms):
+        self.period_ms = period_ms
+        if self.deadline is not None:
+            self.start()
+
+    def slack(self, idle):
+        tolerance = self.tolerance_ms
+        if idle and self.idle_tolerance_ms is not None:
+            tolerance = max(tolerance, self.idle_tolerance_ms)
+        return tolerance / 1000
+
+    def _next_deadline(self, now, previous=None):
+        period = self.period_ms / 1000
+        if self.align:
+            wall = time.time()
+            return now + (period - wall % period)
+        if previous is not None and previous + period > now:
+            # Keep the original phase unless we fell more than a period behind
+            return self._snap(previous + period)
+        return self._snap(now + period)
+
+    def _snap(self, earliest):
+        # Use the first grid boundary the tolerance reaches. Failing that, take the
+        # whole tolerance, which walks the job's phase onto the grid over a few periods.
+        tolerance = self.tolerance_ms / 1000
+        if tolerance <= 0:
+            return earliest
+        offset = time.time() - time.monotonic()
+        for grid in SNAP_GRIDS_S:
+            boundary = math.ceil((earliest + offset - EPSILON) / grid) * grid - offset
+            if boundary <= earliest + tolerance:
+                return boundary
+        return earliest + tolerance
+
+    def _run(self, now):
+        lateness = max(0.0, now - self.deadline)
+        self.runs += 1
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        self.lateness_histogram.observe(lateness * 1000)
+        self.deadline = self._next_deadline(now, self.deadline)
+        with self.run_histogram.time():
+            self.triggered.emit()
+
+    def stats(self):
+        return {
+            "period_ms": self.period_ms,
+            "tolerance_ms": self.tolerance_ms,
+            "active": self.is_active(),
+            "runs": self.runs,
+            "mean_lateness_ms": self.total_lateness * 1000 / self.runs if self.runs else 0.0,
+            "max_lateness_ms": self.max_lateness * 1000,
+        }
+
+
+class Scheduler(QObject):
+    # One timer for every periodic job in the process. A wakeup never goes past
+    # the latest moment the most urgent job tolerates, lands on the last deadline
+    # before that, and runs every job due by then, so jobs whose windows overlap
+    # share a single wakeup.
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(QCoreApplication.instance())
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.jobs = []
+        self.wakeups = 0
+        self.idle = False
+        self.idle_checked = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._wake)
+        metrics.add_source("scheduler", self.stats)
+
+    def add_job(self, name, period_ms, tolerance_ms=0, align=False, idle_tolerance_ms=None, parent=None):
+        job = ScheduledJob(self, name, period_ms, tolerance_ms, align, idle_tolerance_ms, parent)
+        job.destroyed.connect(lambda *_: self._forget(job))
+        self.jobs.append(job)
+        return job
+
+    def _forget(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+            self.reschedule()
+
+    def _check_idle(self, now):
+        if self.idle_checked is None or now - self.idle_checked >= IDLE_CHECK_S:
+            self.idle_checked = now
+            idle_seconds = host_idle_seconds()
+            self.idle = idle_seconds is not None and idle_seconds >= IDLE_AFTER_S
+        return self.idle
+
+    def reschedule(self):
+        active = [job for job in self.jobs if job.deadline is not None]
+        if not active:
+            self.timer.stop()
+            return
+        now = time.monotonic()
+        idle = self._check_idle(now)
+        latest = min(job.deadline + job.slack(idle) for job in active)
+        wake_at = max(job.deadline for job in active if job.deadline <= latest)
+        self.timer.start(max(0, math.ceil((wake_at - now) * 1000)))
+
+    def _wake(self):
+        self.wakeups += 1
+        now = time.monotonic()
+        for job in list(self.jobs):
+            if job.deadline is not None and job.deadline <= now + EPSILON:
+                job._run(now)
+        self.reschedule()
+
+    def stats(self):
+        runs = sum(job.runs for job in self.jobs)
+        return {
+            "jobs": sum(1 for job in self.jobs if job.is_active()),
+            "registered": len(self.jobs),
+            "wakeups": self.wakeups,
+            "runs": runs,
+            "coalesced": max(0, runs - self.wakeups),
+            "idle": self.idle,
+            "per_job": {job.name: job.stats() for job in self.jobs},
+        }
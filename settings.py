@@ -0,0 +1,103 @@
+import os
+from PyQt5.QtCore import QObject, QTimer, QCoreApplication
+
+import metrics
+from storage import data_dir, FileLock, read_json, atomic_write_json
+
+# How long after the last change the settings file is written, so a burst of
+# changes (a drag, a volume scroll) costs one write
+SAVE_DELAY_MS = 1000
+
+
+def settings_path():
+    return os.path.join(data_dir(), "settings.json")
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class Settings(QObject):
+    # Widget state shared by every widget process through one JSON file, e.g.
+    # "clock.position" or "mplayer.volume". Reads come from memory. Changes are
+    # collected and written once they settle, under a lock and merged with
+    # whatever other processes wrote in the meantime, so each process only
+    # ever overwrites the keys it changed itself.
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(parent=QCoreApplication.instance())
+        return cls._instance
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.path = path or settings_path()
+        self.values = {}
+        # Keys changed here and not yet written
+        self.dirty = {}
+        # (mtime, size, inode) of the file as it was last read
+        self.stamp = None
+        self.writes = metrics.counter("settings.writes")
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(SAVE_DELAY_MS)
+        self.timer.timeout.connect(self.flush)
+        # A write still waiting on the debounce must not be lost on quit
+        QCoreApplication.instance().aboutToQuit.connect(self.flush)
+        metrics.add_source("settings", self.stats)
+        self.reload()
+
+    def reload(self):
+        # Only parse the file if someone has replaced it since it was last read
+        stamp = _file_stamp(self.path)
+        if stamp == self.stamp:
+            return False
+        values = read_json(self.path, {}) if stamp is not None else {}
+        self.values = values if isinstance(values, dict) else {}
+        self.values.update(self.dirty)
+        self.stamp = stamp
+        return True
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        # Values go through JSON, so compare them the way they will be read back
+        if isinstance(value, tuple):
+            value = list(value)
+        if key in self.values and self.values[key] == value:
+            return
+        self.values[key] = value
+        self.dirty[key] = value
+        self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        if not self.dirty:
+            return
+        try:
+            with FileLock(self.path + ".lock"):
+                # Always re-read here: a stamp can repeat within the file system's
+                # timestamp granularity, and the file is small
+                values = read_json(self.path, {})
+                if not isinstance(values, dict):
+                    values = {}
+                values.update(self.dirty)
+                atomic_write_json(self.path, values)
+                self.stamp = _file_stamp(self.path)
+        except OSError as e:
+            # Keep the changes and try again with the next one
+            print("Error saving settings:", e)
+            return
+        self.values = values
+        self.dirty = {}
+        self.writes.inc()
+
+    def stats(self):
+        return {"keys": len(self.values), "pending": len(self.dirty), "writes": self.writes.value}
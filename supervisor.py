@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import signal
+import subprocess
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+import metrics
+from scheduler import Scheduler
+from storage import data_dir
+
+# Restart delays after a crash: BACKOFF_BASE_S, doubling per crash up to BACKOFF_MAX_S
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 60.0
+# A child that stays up this long has its crash count forgiven
+STABLE_AFTER_S = 60.0
+# How often children are checked for exits and their usage sampled
+SUPERVISE_INTERVAL_MS = 2000
+# How long children get to exit on SIGTERM before they are killed
+SHUTDOWN_TIMEOUT_S = 3.0
+# A child's log is moved aside to <name>.log.1 when it starts past this size
+LOG_MAX_BYTES = 1024 * 1024
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_proc_usage(pid):
+    # (resident bytes, CPU seconds used so far) from /proc, or None where
+    # there is no /proc or the process is gone
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        with open(f"/proc/{pid}/statm", "rb") as f:
+            statm = f.read().split()
+    except OSError:
+        return None
+    # The command name may contain spaces, so count fields from its closing parenthesis
+    fields = stat[stat.rindex(b")") + 2:].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    return int(statm[1]) * _PAGE_SIZE, cpu_seconds
+
+
+def die_with_parent_hook():
+    # A preexec_fn under which Linux sends the child SIGTERM if the launcher
+    # dies without reaping it, so widgets are never left orphaned, or None
+    # elsewhere. ctypes is imported and prctl resolved here, in the parent:
+    # importing or loading a library between fork and exec in a threaded
+    # process can deadlock, so the child only makes the call.
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        prctl = ctypes.CDLL(None).prctl
+    except (OSError, AttributeError):
+        return None
+    PR_SET_PDEATHSIG = 1
+    sigterm = int(signal.SIGTERM)
+
+    def die_with_parent():
+        prctl(PR_SET_PDEATHSIG, sigterm)
+    return die_with_parent
+
+
+class UsageSampler:
+    # Turns successive CPU-time readings of one pid into a CPU percentage
+    def __init__(self, pid):
+        self.pid = pid
+        self.last = None
+        self.rss_bytes = None
+        self.cpu_percent = None
+
+    def sample(self):
+        usage = read_proc_usage(self.pid)
+        if usage is None:
+            return False
+        now = time.monotonic()
+        self.rss_bytes, cpu_seconds = usage
+        if self.last is not None and now > self.last[0]:
+            self.cpu_percent = (cpu_seconds - self.last[1]) / (now - self.last[0]) * 100
+        self.last = (now, cpu_seconds)
+        return True
+
+    def snapshot(self):
+        return {
+            "pid": self.pid,
+            "rss_mb": round(self.rss_bytes / 2 ** 20, 1) if self.rss_bytes is not None else None,
+            "cpu_percent": round(self.cpu_percent, 1) if self.cpu_percent is not None else None,
+        }
+
+
+class SupervisedProcess:
+    def __init__(self, name, argv):
+        self.name = name
+        self.argv = argv
+        self.process = None
+        self.sampler = None
+        self.started_at = None
+        self.crashes = 0
+        self.restarts = 0
+        self.last_exit = None
+        self.restart_timer = None
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def snapshot(self):
+        snapshot = self.sampler.snapshot() if self.is_running() else {"pid": None, "rss_mb": None, "cpu_percent": None}
+        snapshot.update({
+            "running": self.is_running(),
+            "restarts": self.restarts,
+            "last_exit": self.last_exit,
+            "uptime_s": round(time.monotonic() - self.started_at) if self.is_running() else None,
+            "restart_pending": self.restart_timer is not None and self.restart_timer.isActive(),
+        })
+        return snapshot
+
+
+class Supervisor(QObject):
+    # Starts widget processes, restarts the ones that crash with exponential
+    # backoff, samples their memory and CPU, and takes them down with the
+    # launcher. A child that exits with status 0 (its own Exit, or a second
+    # instance handing over to the first) is not restarted.
+    changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.children = {}
+        # Someone is showing the numbers, so keep sampling even without children
+        self.watching = False
+        self.self_usage = UsageSampler(os.getpid())
+        self.preexec = die_with_parent_hook()
+        self.crashes = metrics.counter("supervisor.crashes")
+        self.timer = Scheduler.instance().add_job(
+            "supervisor.poll", SUPERVISE_INTERVAL_MS, tolerance_ms=SUPERVISE_INTERVAL_MS // 4,
+            idle_tolerance_ms=10000, parent=self)
+        self.timer.triggered.connect(self.poll)
+        metrics.add_source("supervisor", self.stats)
+
+    def watch(self, watching):
+        self.watching = watching
+        if watching:
+            self.self_usage.sample()
+        self._update_timer()
+
+    def _update_timer(self):
+        # No wakeups at all while there is nothing to supervise or show
+        if self.children or self.watching:
+            if not self.timer.is_active():
+                self.timer.start()
+        else:
+            self.timer.stop()
+
+    def log_path(self, name):
+        return os.path.join(data_dir("logs"), name + ".log")
+
+    def start(self, name, argv):
+        child = self.children.get(name)
+        if child is not None and child.is_running():
+            return child
+        if child is None:
+            child = self.children[name] = SupervisedProcess(name, argv)
+        self._spawn(child)
+        return child
+
+    def rotate_log(self, name):
+        # Keeps one previous log, so a crash-looping child uses at most twice LOG_MAX_BYTES
+        path = self.log_path(name)
+        try:
+            if os.path.getsize(path) > LOG_MAX_BYTES:
+                os.replace(path, path + ".1")
+        except OSError:
+            pass
+
+    def _spawn(self, child):
+        # Output goes to a per-widget log rather than nowhere, so crashes leave a trace
+        self.rotate_log(child.name)
+        with open(self.log_path(child.name), "ab") as log:
+            child.process = subprocess.Popen(
+                child.argv, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                preexec_fn=self.preexec)
+        child.started_at = time.monotonic()
+        # First sampled on the next poll, once the interpreter has actually started
+        child.sampler = UsageSampler(child.process.pid)
+        self._update_timer()
+        self.changed.emit()
+
+    def poll(self):
+        for child in list(self.children.values()):
+            if child.process is None:
+                continue
+            code = child.process.poll()
+            if code is None:
+                child.sampler.sample()
+                if child.crashes and time.monotonic() - child.started_at >= STABLE_AFTER_S:
+                    child.crashes = 0
+            else:
+                self._exited(child, code)
+        self.self_usage.sample()
+        self._update_timer()
+        self.changed.emit()
+
+    def _exited(self, child, code):
+        # poll() has already reaped it
+        child.process = None
+        child.last_exit = code
+        if code == 0:
+            del self.children[child.name]
+            return
+        self.crashes.inc()
+        child.crashes += 1
+        delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** (child.crashes - 1))
+        print(f"{child.name} exited with status {code}, restarting in {delay:.0f} s (see {self.log_path(child.name)})")
+        if child.restart_timer is None:
+            child.restart_timer = QTimer(self)
+            child.restart_timer.setSingleShot(True)
+            child.restart_timer.timeout.connect(lambda child=child: self._restart(child))
+        child.restart_timer.start(int(delay * 1000))
+
+    def _restart(self, child):
+        if self.children.get(child.name) is not child or child.is_running():
+            return
+        child.restarts += 1
+        self._spawn(child)
+
+    def shutdown(self, timeout_s=SHUTDOWN_TIMEOUT_S):
+        # SIGTERM every child, which widgets handle as a normal quit (see
+        # ipc.quit_on_terminate), give them a moment, then kill and reap the rest
+        self.timer.stop()
+        running = []
+        for child in self.children.values():
+            if child.restart_timer is not None:
+                child.restart_timer.stop()
+            if child.is_running():
+                child.process.terminate()
+                running.append(child)
+        deadline = time.monotonic() + timeout_s
+        for child in running:
+            try:
+                child.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                child.process.kill()
+                child.process.wait()
+        self.children.clear()
+
+    def usage(self, name):
+        child = self.children.get(name)
+        return child.snapshot() if child is not None else None
+
+    def stats(self):
+        return {
+            "launcher": self.self_usage.snapshot(),
+            "children": {name: child.snapshot() for name, child in self.children.items()},
+        }
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QCoreApplication, QTimer, QEventLoop
+
+
+@pytest.fixture(scope="session")
+def app():
+    return QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    # Every test gets its own caches, quota counts and settings file
+    monkeypatch.setenv("WIDGETS_DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def spin(app):
+    def spin(seconds):
+        loop = QEventLoop()
+        QTimer.singleShot(int(seconds * 1000), loop.quit)
+        loop.exec_()
+    return spin
@@ -0,0 +1,114 @@
+import time
+import threading
+
+import pytest
+
+from http_cache import HttpCache, freshness_lifetime
+from quota import ApiBudget, QuotaExceeded
+
+URL = "http://weather.test/data?q=London"
+
+
+class FakeResponse:
+    def __init__(self, body=None, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    # Answers every request with the next response, and remembers the headers sent
+    def __init__(self, *responses, delay=0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            self.requests.append(dict(headers or {}))
+            response = self.responses.pop(0)
+        time.sleep(self.delay)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_freshness_lifetime():
+    assert freshness_lifetime(FakeResponse(), 600) == 600
+    assert freshness_lifetime(FakeResponse(headers={"Cache-Control": "max-age=100", "Age": "30"}), 600) == 70
+    assert freshness_lifetime(FakeResponse(headers={"Cache-Control": "max-age=10", "Age": "30"}), 600) == 0
+    assert freshness_lifetime(FakeResponse(headers={"Cache-Control": "no-cache"}), 600) == 0
+    assert freshness_lifetime(FakeResponse(headers={"Cache-Control": "No-Store"}), 600) is None
+
+
+def test_fresh_entry_is_served_without_a_request():
+    cache = HttpCache("test")
+    session = FakeSession(FakeResponse({"temp": 20}))
+    assert cache.get(session, URL, ttl=600, timeout=5) == {"temp": 20}
+    assert cache.get(session, URL, ttl=600, timeout=5) == {"temp": 20}
+    assert len(session.requests) == 1
+
+
+def test_expired_entry_is_revalidated():
+    cache = HttpCache("test")
+    session = FakeSession(FakeResponse({"temp": 20}, headers={"ETag": '"v1"'}),
+                          FakeResponse(status_code=304))
+    cache.get(session, URL, ttl=0, timeout=5)
+    assert cache.get(session, URL, ttl=0, timeout=5) == {"temp": 20}
+    assert session.requests[1] == {"If-None-Match": '"v1"'}
+
+
+def test_no_store_is_not_cached():
+    cache = HttpCache("test")
+    session = FakeSession(FakeResponse({"temp": 20}, headers={"Cache-Control": "no-store"}),
+                          FakeResponse({"temp": 21}))
+    cache.get(session, URL, ttl=600, timeout=5)
+    assert cache.get(session, URL, ttl=600, timeout=5) == {"temp": 21}
+
+
+def test_error_falls_back_to_the_stale_copy():
+    cache = HttpCache("test")
+    session = FakeSession(FakeResponse({"temp": 20}), FakeResponse(status_code=503), OSError("timed out"))
+    cache.get(session, URL, ttl=0, timeout=5)
+    assert cache.get(session, URL, ttl=0, timeout=5) == {"temp": 20}
+    assert cache.get(session, URL, ttl=0, timeout=5) == {"temp": 20}
+
+
+def test_error_without_a_copy_is_raised():
+    session = FakeSession(FakeResponse(status_code=503))
+    with pytest.raises(OSError):
+        HttpCache("test").get(session, URL, ttl=600, timeout=5)
+
+
+def test_used_up_budget_serves_stale_or_raises():
+    cache = HttpCache("test")
+    budget = ApiBudget("test", per_minute=1, per_day=100)
+    session = FakeSession(FakeResponse({"temp": 20}))
+    cache.get(session, URL, ttl=0, timeout=5, budget=budget)
+    assert cache.get(session, URL, ttl=0, timeout=5, budget=budget) == {"temp": 20}
+    with pytest.raises(QuotaExceeded):
+        cache.get(session, URL + "&units=metric", ttl=0, timeout=5, budget=budget)
+    assert len(session.requests) == 1
+
+
+def test_concurrent_misses_fetch_once():
+    # Whoever waits on the fetch lock finds the first fetch's answer
+    cache = HttpCache("test")
+    session = FakeSession(FakeResponse({"temp": 20}), FakeResponse({"temp": 21}), delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(session, URL, ttl=600, timeout=5)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [{"temp": 20}] * 4
+    assert len(session.requests) == 1
@@ -0,0 +1,73 @@
+import datetime
+
+import pytest
+
+import quota
+from quota import ApiBudget, QuotaExceeded, seconds_until_utc_midnight
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc).timestamp()
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(utc(2024, 5, 1, 12, 0, 0))
+    monkeypatch.setattr(quota, "time", clock)
+    return clock
+
+
+def test_seconds_until_utc_midnight():
+    assert seconds_until_utc_midnight(utc(2024, 5, 1, 23, 0, 0)) == 3600
+    assert seconds_until_utc_midnight(utc(2024, 5, 1, 0, 0, 0)) == 86400
+
+
+def test_per_minute_budget_slides(clock):
+    budget = ApiBudget("test", per_minute=2, per_day=100)
+    assert budget.try_acquire()
+    clock.now += 30
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    # The first call leaves the window a minute after it was made
+    clock.now += 31
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+def test_per_day_budget_resets_at_utc_midnight(clock):
+    clock.now = utc(2024, 5, 1, 23, 59, 0)
+    budget = ApiBudget("test", per_minute=100, per_day=3)
+    assert budget.try_acquire(calls=3)
+    clock.now += 50
+    assert not budget.try_acquire()
+    assert budget.remaining() == {"minute": 97, "day": 0}
+    clock.now += 20
+    assert budget.try_acquire()
+
+
+def test_budget_is_shared_through_the_file(clock):
+    # A second process sees the same counts
+    assert ApiBudget("test", per_minute=2, per_day=100).try_acquire(calls=2)
+    with pytest.raises(QuotaExceeded):
+        ApiBudget("test", per_minute=2, per_day=100).acquire()
+
+
+def test_refresh_interval_stretches_to_last_the_day(clock):
+    budget = ApiBudget("test", per_minute=100, per_day=1000)
+    # Plenty left: the widget's own interval stands
+    assert budget.refresh_interval(600000) == 600000
+    # 12 hours and 10 refreshes of two calls left: one every 72 minutes
+    budget.try_acquire(calls=80)
+    budget = ApiBudget("test", per_minute=100, per_day=100)
+    assert budget.refresh_interval(600000, calls_per_refresh=2) == 4320000
+    # Nothing left: wait for the reset
+    budget.try_acquire(calls=20)
+    assert budget.refresh_interval(600000) == 43200000
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+from PyQt5 import sip
+
+import scheduler
+from scheduler import Scheduler, IDLE_AFTER_S
+
+
+@pytest.fixture
+def sched(app, monkeypatch):
+    monkeypatch.setattr(scheduler, "host_idle_seconds", lambda: None)
+    sched = Scheduler(app)
+    yield sched
+    # Jobs tell the scheduler when they go, so they have to go first
+    for job in list(sched.jobs):
+        sip.delete(job)
+    sched.deleteLater()
+
+
+def test_overlapping_windows_share_a_wakeup(sched, spin):
+    # b may run up to 100 ms late, which reaches a's deadline
+    a = sched.add_job("test.a", 10000)
+    b = sched.add_job("test.b", 10000, tolerance_ms=100)
+    b.start(50)
+    a.start(100)
+    spin(0.3)
+    assert (a.runs, b.runs) == (1, 1)
+    assert sched.wakeups == 1
+    assert b.max_lateness >= 0.04
+
+
+def test_separate_windows_wake_separately(sched, spin):
+    a = sched.add_job("test.a", 10000)
+    b = sched.add_job("test.b", 10000)
+    b.start(50)
+    a.start(100)
+    spin(0.3)
+    assert (a.runs, b.runs) == (1, 1)
+    assert sched.wakeups == 2
+
+
+def test_idle_tolerance_only_applies_while_idle(sched, spin, monkeypatch):
+    monkeypatch.setattr(scheduler, "host_idle_seconds", lambda: IDLE_AFTER_S)
+    a = sched.add_job("test.a", 10000)
+    b = sched.add_job("test.b", 10000, idle_tolerance_ms=100)
+    b.start(50)
+    a.start(100)
+    spin(0.3)
+    assert sched.idle
+    assert sched.wakeups == 1
+
+
+def test_stopped_job_does_not_run(sched, spin):
+    a = sched.add_job("test.a", 10000)
+    a.start(50)
+    a.stop()
+    spin(0.15)
+    assert a.runs == 0
+    assert not sched.timer.isActive()
+
+
+def test_tolerance_snaps_deadline_onto_wall_clock_second(sched):
+    job = sched.add_job("test.snap", 1000, tolerance_ms=1000)
+    before = time.monotonic()
+    job.start()
+    assert before + 1 <= job.deadline <= time.monotonic() + 2
+    wall = job.deadline + time.time() - time.monotonic()
+    assert abs(wall - round(wall)) < 0.005
+
+
+def test_without_tolerance_deadline_keeps_its_phase(sched):
+    job = sched.add_job("test.phase", 1000)
+    previous = time.monotonic() - 0.25
+    assert job._next_deadline(previous + 0.5, previous) == pytest.approx(previous + 1)
+    # More than a period behind: restart from now instead of firing a burst
+    now = previous + 5
+    assert job._next_deadline(now, previous) == pytest.approx(now + 1)
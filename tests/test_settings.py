@@ -0,0 +1,64 @@
+import pytest
+
+import settings
+from settings import Settings
+from storage import read_json, atomic_write_json
+
+
+@pytest.fixture
+def store(app, data_dir, monkeypatch):
+    monkeypatch.setattr(settings, "SAVE_DELAY_MS", 50)
+    store = Settings(path=str(data_dir / "settings.json"))
+    # metrics counters only count while enabled, so count the writes here
+    store.file_writes = []
+    def write(path, values):
+        store.file_writes.append(dict(values))
+        atomic_write_json(path, values)
+    monkeypatch.setattr(settings, "atomic_write_json", write)
+    yield store
+    store.timer.stop()
+    store.deleteLater()
+
+
+def test_burst_of_changes_is_one_write(store, spin):
+    for x in range(20):
+        store.set("clock.position", (x, 10))
+    assert store.file_writes == []
+    assert store.get("clock.position") == [19, 10]
+    spin(0.2)
+    assert store.file_writes == [{"clock.position": [19, 10]}]
+    assert read_json(store.path) == {"clock.position": [19, 10]}
+
+
+def test_each_change_restarts_the_delay(store, spin):
+    store.set("mplayer.volume", 10)
+    spin(0.03)
+    store.set("mplayer.volume", 20)
+    spin(0.03)
+    assert store.file_writes == []
+    spin(0.1)
+    assert read_json(store.path) == {"mplayer.volume": 20}
+
+
+def test_unchanged_value_does_not_write(store):
+    store.set("mplayer.volume", 50)
+    store.flush()
+    store.set("mplayer.volume", 50)
+    assert not store.timer.isActive()
+    store.flush()
+    assert len(store.file_writes) == 1
+
+
+def test_flush_keeps_keys_other_processes_wrote(store):
+    store.set("clock.position", [1, 2])
+    atomic_write_json(store.path, {"weather.position": [3, 4], "clock.position": [0, 0]})
+    store.flush()
+    assert read_json(store.path) == {"weather.position": [3, 4], "clock.position": [1, 2]}
+    assert store.get("weather.position") == [3, 4]
+
+
+def test_reload_picks_up_outside_changes_only_once(store):
+    atomic_write_json(store.path, {"clock.seconds": True})
+    assert store.reload()
+    assert store.get("clock.seconds") is True
+    assert not store.reload()
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+import pytest
+
+import supervisor
+from supervisor import Supervisor, SupervisedProcess, BACKOFF_MAX_S, LOG_MAX_BYTES, STABLE_AFTER_S
+
+
+@pytest.fixture
+def sup(app):
+    sup = Supervisor()
+    yield sup
+    for child in sup.children.values():
+        if child.restart_timer is not None:
+            child.restart_timer.stop()
+    sup.shutdown(timeout_s=1)
+    sup.timer.stop()
+
+
+def crashed(sup, code=3):
+    # What poll() does once it has reaped a crashed child
+    child = sup.children.setdefault("test", SupervisedProcess("test", [sys.executable, "-c", "pass"]))
+    sup._exited(child, code)
+    return child
+
+
+def test_backoff_doubles_up_to_the_cap(sup):
+    delays = [crashed(sup).restart_timer.interval() for _ in range(9)]
+    assert delays == [1000, 2000, 4000, 8000, 16000, 32000, 60000, 60000, 60000]
+    assert delays[-1] == BACKOFF_MAX_S * 1000
+    assert sup.children["test"].restart_timer.isActive()
+
+
+def test_clean_exit_is_not_restarted(sup):
+    crashed(sup, code=0)
+    assert "test" not in sup.children
+
+
+def test_stable_child_is_forgiven(sup):
+    child = sup.start("test", [sys.executable, "-c", "import time; time.sleep(30)"])
+    child.crashes = 2
+    child.started_at = time.monotonic() - STABLE_AFTER_S + 5
+    sup.poll()
+    assert child.crashes == 2
+    child.started_at = time.monotonic() - STABLE_AFTER_S
+    sup.poll()
+    assert child.crashes == 0
+    # The next crash starts over from the shortest delay
+    child.process.kill()
+    child.process.wait()
+    sup.poll()
+    assert child.restart_timer.interval() == 1000
+
+
+def test_crashing_child_is_restarted_after_the_delay(sup, spin, monkeypatch):
+    monkeypatch.setattr(supervisor, "BACKOFF_BASE_S", 0.05)
+    child = sup.start("test", [sys.executable, "-c", "import sys; sys.exit(3)"])
+    child.process.wait()
+    sup.poll()
+    assert child.last_exit == 3
+    assert not child.is_running()
+    spin(0.2)
+    assert child.restarts == 1
+
+
+def test_log_is_rotated_past_the_limit(sup):
+    path = sup.log_path("test")
+    with open(path, "wb") as f:
+        f.write(b"x" * (LOG_MAX_BYTES + 1))
+    sup.rotate_log("test")
+    assert not os.path.exists(path)
+    assert os.path.getsize(path + ".1") == LOG_MAX_BYTES + 1
+    with open(path, "wb") as f:
+        f.write(b"x" * 10)
+    sup.rotate_log("test")
+    assert os.path.getsize(path) == 10
@@ -0,0 +1,474 @@
+import os
+import time
+import wave
+import queue
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+import importlib.util
+
+from PyQt5.QtCore import Qt, QObject, QRect, QRectF, QLineF, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QPainter, QPixmap, QPen
+from PyQt5.QtWidgets import QWidget
+
+import metrics
+from storage import data_dir
+
+# NumPy is only imported once a track is analysed, so it never delays the first paint
+
+# Peak columns kept per track, whatever its length; the bar folds them to its width
+PEAK_COLUMNS = 2048
+# Loudest sample kept per this much audio while decoding, folded to PEAK_COLUMNS at the end
+PEAK_BLOCK_MS = 10
+# Spectrum frames per second of audio, bands per frame and the FFT behind them
+SPECTRUM_FPS = 20
+SPECTRUM_BANDS = 24
+FFT_SIZE = 2048
+# Frames transformed at once
+FFT_BLOCK = 256
+# Samples decoded and analysed at a time, which bounds the analysis memory for long tracks
+DECODE_CHUNK = 1 << 16
+# Rate other formats are decoded at through ffmpeg
+DECODE_RATE = 22050
+# Bump when the analysis changes so cached files are recomputed
+CACHE_VERSION = 2
+
+# Paint time one frame of the visualizer may take before it slows itself down
+FRAME_BUDGET_MS = 2.0
+# Slowest the spectrum backs off to, in frames per second
+MIN_SPECTRUM_FPS = 5
+# Cheap frames in a row before the spectrum speeds up again
+RECOVER_FRAMES = 40
+
+_available = None
+
+
+def available():
+    global _available
+    if _available is None:
+        _available = importlib.util.find_spec("numpy") is not None
+    return _available
+
+
+def decode_pcm(path):
+    # The sample rate and an iterator over mono float samples, DECODE_CHUNK at a
+    # time, or None when the file cannot be decoded here: WAV is read directly,
+    # anything else needs ffmpeg on the PATH
+    if path.lower().endswith(".wav"):
+        try:
+            wav = wave.open(path)
+        except (wave.Error, OSError, EOFError):
+            return None
+        if wav.getsampwidth() not in (1, 2, 4):
+            wav.close()
+            return None
+        return wav.getframerate(), _wav_chunks(wav)
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    try:
+        process = subprocess.Popen([ffmpeg, "-v", "quiet", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(DECODE_RATE), "-"],
+                                   stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+    except OSError:
+        return None
+    return DECODE_RATE, _ffmpeg_chunks(process)
+
+
+def _wav_chunks(wav):
+    import numpy
+    channels, width = wav.getnchannels(), wav.getsampwidth()
+    dtype = {1: numpy.uint8, 2: numpy.int16, 4: numpy.int32}[width]
+    with wav:
+        while True:
+            data = wav.readframes(DECODE_CHUNK)
+            if not data:
+                return
+            samples = numpy.frombuffer(data, dtype).astype(numpy.float32)
+            if width == 1:
+                samples -= 128
+            yield samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+
+
+def _ffmpeg_chunks(process):
+    import numpy
+    try:
+        while True:
+            data = process.stdout.read(DECODE_CHUNK * 2)
+            if not data:
+                break
+            yield numpy.frombuffer(data[:len(data) // 2 * 2], numpy.int16).astype(numpy.float32)
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, "ffmpeg")
+    finally:
+        # Also reached when the consumer gives up early
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def band_matrix(rate):
+    # Averages FFT bins into log-spaced bands from 60 Hz up to 16 kHz (or Nyquist)
+    import numpy
+    freqs = numpy.fft.rfftfreq(FFT_SIZE, 1 / rate)
+    edges = numpy.geomspace(60, min(16000, rate / 2), SPECTRUM_BANDS + 1)
+    bands = numpy.searchsorted(edges, freqs, side="right") - 1
+    matrix = numpy.zeros((len(freqs), SPECTRUM_BANDS), numpy.float32)
+    inside = (bands >= 0) & (bands < SPECTRUM_BANDS)
+    matrix[numpy.nonzero(inside)[0], bands[inside]] = 1
+    return matrix / numpy.maximum(matrix.sum(axis=0), 1)
+
+
+class TrackAnalysis:
+    # Peaks and spectrum of a track fed to it chunk by chunk. Only the current
+    # chunk, one FFT window of earlier samples, the per-block peaks and the
+    # spectrum levels are held, never the whole track's PCM.
+    def __init__(self, rate):
+        import numpy
+        self.rate = rate
+        self.hop = rate / SPECTRUM_FPS
+        self.block = max(1, rate * PEAK_BLOCK_MS // 1000)
+        self.window = numpy.hanning(FFT_SIZE).astype(numpy.float32)
+        self.matrix = band_matrix(rate)
+        self.length = 0
+        self.block_peaks = []
+        # Samples of an unfinished peak block
+        self.partial = numpy.zeros(0, numpy.float32)
+        # Samples from the start of the next spectrum frame on, and where they start in the track
+        self.pending = numpy.zeros(0, numpy.float32)
+        self.pending_at = 0
+        self.frames = 0
+        self.levels = []
+
+    def feed(self, samples):
+        import numpy
+        self.length += len(samples)
+        rectified = numpy.concatenate([self.partial, numpy.abs(samples)])
+        whole = len(rectified) // self.block * self.block
+        if whole:
+            self.block_peaks.append(rectified[:whole].reshape(-1, self.block).max(axis=1))
+        self.partial = rectified[whole:]
+        self.pending = numpy.concatenate([self.pending, samples])
+        self._transform(final=False)
+
+    def _transform(self, final):
+        # Run the FFT for every frame whose window has been decoded; at the end
+        # of the track the last windows are padded with silence
+        import numpy
+        starts = (numpy.arange(self.frames, int(self.length // self.hop)) * self.hop).astype(numpy.int64)
+        if final:
+            padded = numpy.concatenate([self.pending, numpy.zeros(FFT_SIZE, numpy.float32)])
+        else:
+            starts = starts[starts + FFT_SIZE <= self.pending_at + len(self.pending)]
+            padded = self.pending
+        offsets = numpy.arange(FFT_SIZE)
+        for block in range(0, len(starts), FFT_BLOCK):
+            rows = starts[block:block + FFT_BLOCK] - self.pending_at
+            power = numpy.abs(numpy.fft.rfft(padded[rows[:, None] + offsets] * self.window, axis=1)) ** 2
+            self.levels.append(10 * numpy.log10(power.astype(numpy.float32) @ self.matrix + 1e-9))
+        self.frames += len(starts)
+        done = min(len(self.pending), int(self.frames * self.hop) - self.pending_at)
+        self.pending = self.pending[done:]
+        self.pending_at += done
+
+    def finish(self):
+        import numpy
+        self._transform(final=True)
+        blocks = self.block_peaks + ([self.partial.max(keepdims=True)] if len(self.partial) else [])
+        peaks = numpy.zeros(PEAK_COLUMNS, numpy.float32)
+        if blocks:
+            blocks = numpy.concatenate(blocks)
+            # Loudest block per column; short tracks repeat blocks across columns
+            peaks = numpy.maximum.reduceat(blocks, numpy.arange(PEAK_COLUMNS) * len(blocks) // PEAK_COLUMNS)
+        top = peaks.max()
+        peaks = (peaks / top * 255).astype(numpy.uint8) if top > 0 else peaks.astype(numpy.uint8)
+        if self.levels:
+            # One row of SPECTRUM_BANDS levels (0-255, the top 60 dB) per frame
+            levels = numpy.concatenate(self.levels)
+            floor = levels.max() - 60
+            spectrum = (numpy.clip((levels - floor) / 60, 0, 1) * 255).astype(numpy.uint8)
+        else:
+            spectrum = numpy.zeros((0, SPECTRUM_BANDS), numpy.uint8)
+        return {"peaks": peaks, "spectrum": spectrum, "duration_ms": int(self.length * 1000 / self.rate)}
+
+
+def cache_path(path, mtime, size):
+    key = hashlib.sha1(f"{path}|{mtime}|{size}|{CACHE_VERSION}".encode("utf-8")).hexdigest()
+    return os.path.join(data_dir("waveforms"), key + ".npz")
+
+
+def analyze(path):
+    decoded = decode_pcm(path)
+    if decoded is None:
+        return None
+    rate, chunks = decoded
+    analysis = TrackAnalysis(rate)
+    try:
+        for samples in chunks:
+            analysis.feed(samples)
+    except (wave.Error, OSError, EOFError, subprocess.CalledProcessError):
+        return None
+    return analysis.finish()
+
+
+def load_analysis(path):
+    # Returns (analysis or None, whether it came from the cache). The cache is
+    # keyed on path, mtime and size, so an edited file is analysed again.
+    import numpy
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, False
+    cached = cache_path(path, stat.st_mtime, stat.st_size)
+    try:
+        with numpy.load(cached) as data:
+            return {"peaks": data["peaks"], "spectrum": data["spectrum"], "duration_ms": int(data["duration_ms"])}, True
+    except (OSError, ValueError, KeyError):
+        pass
+    analysis = analyze(path)
+    if analysis is not None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached), prefix=".tmp-", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                numpy.savez(f, **analysis)
+            os.replace(tmp_path, cached)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return analysis, False
+
+
+# Decodes and analyses tracks on a worker thread and reports back through a signal
+class WaveformLoader(QObject):
+    ready = pyqtSignal(str, object)
+    _finished = pyqtSignal(str, int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self.jobs = queue.Queue()
+        self.thread = None
+        self._finished.connect(self._deliver)
+        self.latency = metrics.histogram("mplayer.waveform_ms")
+        self.cache_hits = metrics.counter("mplayer.waveform_cache_hits")
+
+    def load(self, path):
+        # Only the newest track matters; older requests are dropped unprocessed
+        if not available():
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="waveform", daemon=True)
+            self.thread.start()
+        self.generation += 1
+        self.jobs.put((self.generation, path))
+
+    def stop(self):
+        if self.thread is not None:
+            self.jobs.put(None)
+
+    def _run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                return
+            generation, path = item
+            if generation != self.generation:
+                continue
+            try:
+                with self.latency.time():
+                    analysis, cached = load_analysis(path)
+            except Exception as e:
+                print("Error analysing track:", e)
+                analysis, cached = None, False
+            if cached:
+                self.cache_hits.inc()
+            try:
+                self._finished.emit(path, generation, analysis)
+            except RuntimeError:
+                return
+
+    def _deliver(self, path, generation, analysis):
+        if generation == self.generation:
+            self.ready.emit(path, analysis)
+
+
+class WaveformBar(QWidget):
+    # Progress bar drawn as the track's waveform, or as a flat bar until the
+    # peaks arrive. Both halves are pre-rendered once per size, so moving the
+    # playhead only blits the columns it crossed. Clicking or dragging asks
+    # for a seek to that fraction of the track; final is set on release.
+    seek_requested = pyqtSignal(float, bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedHeight(36)
+        self.setCursor(Qt.PointingHandCursor)
+        self.peaks = None
+        self.fraction = 0.0
+        self.played_x = 0
+        self.seeking = False
+        self.played_color = QColor(220, 220, 220)
+        self.unplayed_color = QColor(110, 110, 110)
+        self.pixmaps = None
+        self.paint_histogram = metrics.histogram("mplayer.waveform_paint_ms")
+
+    def set_peaks(self, peaks):
+        self.peaks = peaks
+        self.pixmaps = None
+        self.update()
+
+    def set_progress(self, current_ms, length_ms):
+        self.fraction = min(1.0, current_ms / length_ms) if length_ms > 0 else 0.0
+        x = int(self.width() * self.fraction)
+        if x != self.played_x:
+            # Repaint only the columns between the old and new playhead
+            self.update(QRect(min(x, self.played_x), 0, abs(x - self.played_x) + 1, self.height()))
+            self.played_x = x
+
+    def ms_until_next_pixel(self, current_ms, length_ms):
+        # How long until set_progress would move the playhead, or None if never
+        if length_ms <= 0 or self.width() <= 0 or self.played_x >= self.width():
+            return None
+        next_ms = -(-(self.played_x + 1) * length_ms // self.width())
+        return max(1, next_ms - current_ms)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.seeking = True
+            self._seek_to(event.x(), False)
+
+    def mouseMoveEvent(self, event):
+        if self.seeking:
+            self._seek_to(event.x(), False)
+
+    def mouseReleaseEvent(self, event):
+        if self.seeking:
+            self.seeking = False
+            self._seek_to(event.x(), True)
+
+    def _seek_to(self, x, final):
+        if self.width() > 0:
+            self.seek_requested.emit(min(1.0, max(0.0, x / self.width())), final)
+
+    def resizeEvent(self, event):
+        self.pixmaps = None
+        self.played_x = int(self.width() * self.fraction)
+        super().resizeEvent(event)
+
+    def column_heights(self, width):
+        # Fold the stored peaks to one value per pixel column, keeping the loudest
+        import numpy
+        starts = (numpy.arange(width) * len(self.peaks) // width).astype(numpy.int64)
+        return numpy.maximum.reduceat(self.peaks, starts) / 255.0
+
+    def _render(self, color):
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        middle = self.height() / 2
+        if self.peaks is None or not len(self.peaks) or self.width() <= 0:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(color)
+            painter.drawRoundedRect(QRectF(0, middle - 3, self.width(), 6), 3, 3)
+        else:
+            import numpy
+            painter.setPen(QPen(color, 1))
+            # At least a hairline, so silence still reads as part of the bar
+            heights = numpy.maximum(self.column_heights(self.width()) * (middle - 1), 0.5)
+            painter.drawLines([QLineF(x + 0.5, middle - h, x + 0.5, middle + h) for x, h in enumerate(heights.tolist())])
+        painter.end()
+        return pixmap
+
+    def paintEvent(self, event):
+        with self.paint_histogram.time():
+            if self.pixmaps is None:
+                self.pixmaps = (self._render(self.played_color), self._render(self.unplayed_color))
+            played, unplayed = self.pixmaps
+            ratio = played.devicePixelRatio()
+            painter = QPainter(self)
+            rect = event.rect()
+            split = self.played_x
+            if rect.left() < split:
+                left = QRect(rect.left(), 0, min(rect.right() + 1, split) - rect.left(), self.height())
+                painter.drawPixmap(left, played, QRect(int(left.x() * ratio), 0, int(left.width() * ratio), int(left.height() * ratio)))
+            if rect.right() >= split:
+                right = QRect(max(rect.left(), split), 0, rect.right() + 1 - max(rect.left(), split), self.height())
+                painter.drawPixmap(right, unplayed, QRect(int(right.x() * ratio), 0, int(right.width() * ratio), int(right.height() * ratio)))
+            painter.end()
+
+
+class SpectrumView(QWidget):
+    # Bars for the precomputed spectrum frame under the playhead. Runs its own
+    # frame timer only while started; a frame is only repainted when the levels
+    # changed, and if painting overruns FRAME_BUDGET_MS the frame rate halves
+    # (down to MIN_SPECTRUM_FPS) until painting is cheap again for a while.
+    def __init__(self, position_ms, parent=None):
+        super().__init__(parent)
+        self.position_ms = position_ms
+        self.setFixedHeight(48)
+        self.frames = None
+        self.levels = None
+        self.fps = SPECTRUM_FPS
+        self.cheap_frames = 0
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.next_frame)
+        self.color = QColor(200, 200, 200, 200)
+        self.paint_histogram = metrics.histogram("mplayer.spectrum_paint_ms")
+        self.slowdowns = metrics.counter("mplayer.spectrum_slowdowns")
+
+    def set_frames(self, frames):
+        self.frames = frames
+        self.levels = None
+        self.update()
+
+    def start(self):
+        if not self.timer.isActive():
+            self.timer.start(1000 // self.fps)
+
+    def stop(self):
+        self.timer.stop()
+
+    def next_frame(self):
+        if self.frames is None or not len(self.frames):
+            return
+        index = min(len(self.frames) - 1, max(0, int(self.position_ms() * SPECTRUM_FPS / 1000)))
+        levels = self.frames[index]
+        if self.levels is not None and (levels == self.levels).all():
+            return
+        self.levels = levels
+        started = time.perf_counter()
+        self.repaint()
+        spent_ms = (time.perf_counter() - started) * 1000
+        if spent_ms > FRAME_BUDGET_MS:
+            self.cheap_frames = 0
+            if self.fps > MIN_SPECTRUM_FPS:
+                self.fps = max(MIN_SPECTRUM_FPS, self.fps // 2)
+                self.slowdowns.inc()
+                self.timer.start(1000 // self.fps)
+        elif self.fps < SPECTRUM_FPS:
+            self.cheap_frames += 1
+            if self.cheap_frames >= RECOVER_FRAMES:
+                self.cheap_frames = 0
+                self.fps = min(SPECTRUM_FPS, self.fps * 2)
+                self.timer.start(1000 // self.fps)
+
+    def paintEvent(self, event):
+        if self.levels is None:
+            return
+        with self.paint_histogram.time():
+            painter = QPainter(self)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(self.color)
+            width = self.width() / len(self.levels)
+            height = self.height()
+            for band, level in enumerate(self.levels.tolist()):
+                bar = level * height / 255
+                painter.drawRect(int(band * width) + 1, int(height - bar), max(1, int(width) - 2), int(bar))
+            painter.end()
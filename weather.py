@@ -1,55 +1,174 @@
+import coldstart
 import sys
 import os
-import requests
-from dotenv import load_dotenv
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout, QPushButton, QSystemTrayIcon, QMenu, QGraphicsOpacityEffect
-from PyQt5.QtCore import Qt, QTimer, QPoint
-from PyQt5.QtGui import QColor, QFont, QFontDatabase, QPalette, QIcon, QMovie
-
-load_dotenv()
-API_KEY = os.getenv('API_KEY')
-
-def get_user_city():
-    try:
-        geo_response = requests.get('https://ipinfo.io')
-        if geo_response.status_code == 200:
-            geo_data = geo_response.json()
-            return geo_data.get('city', 'London')
-    except Exception as e:
-        print("Error fetching location:", e)
-    return 'London'
-
-def load_custom_font():
-    font_path = os.path.join("fonts", "minecraft.ttf")
-    if os.path.exists(font_path):
-        font_id = QFontDatabase.addApplicationFont(font_path)
-        if font_id != -1:
-            font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
-            return QFont(font_family)
-    return QFont("Arial")
-
-class WeatherWidget(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.city = get_user_city()
-        self.api_url = f'http://api.openweathermap.org/data/2.5/weather?q={self.city}&appid={API_KEY}&units=metric'
-        self.custom_font = load_custom_font()
+import time
+import queue
+import threading
+from weather_providers import get_config, get_provider
+from PyQt5.QtWidgets import QApplication, QLabel, QVBoxLayout, QPushButton, QSystemTrayIcon, QMenu, QGraphicsOpacityEffect, QListWidget, QListWidgetItem
+from PyQt5.QtCore import Qt, QPoint, QSize, QObject, pyqtSignal
+from PyQt5.QtGui import QColor
+from resources import get_icon, get_font, resource_path, resource_exists
+from animation_cache import animation_cache, AnimationPlayer
+from power import PowerManager
+from scheduler import Scheduler
+from panel import TranslucentPanel
+from drag import WindowDragger
+from settings import Settings
+import metrics
+from ipc import CommandServer, send_command, quit_on_terminate
+
+REFRESH_INTERVAL_MS = 600000
+
+# Box the weather GIFs are shown in; frames are scaled to it once, when decoded
+GIF_SIZE = QSize(50, 50)
+
+# Runs the blocking HTTP calls on a worker thread and reports back through signals
+class WeatherFetcher(QObject):
+    city_ready = pyqtSignal(str)
+    weather_ready = pyqtSignal(str, object)
+    weather_failed = pyqtSignal(str)
+    locations_ready = pyqtSignal(object)
+    _finished = pyqtSignal(str, int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generations = {"city": 0, "weather": 0, "locations": 0}
+        self.jobs = queue.Queue()
+        self._finished.connect(self._deliver)
+        self.latency = {kind: metrics.histogram(f"weather.fetch_{kind}_ms") for kind in self.generations}
+        self.errors = metrics.counter("weather.fetch_errors")
+        self.thread = threading.Thread(target=self._run, name="weather-fetch", daemon=True)
+        self.thread.start()
+
+    def fetch_city(self):
+        self._submit("city", lambda: get_provider().user_city())
+
+    def fetch_weather(self, city):
+        self._submit("weather", lambda: get_provider().current(city))
+
+    def fetch_locations(self, cities):
+        cities = list(cities)
+        self._submit("locations", lambda: get_provider().current_many(cities))
+
+    def stop(self):
+        self.jobs.put(None)
+
+    def _submit(self, kind, job, *args):
+        # A new request supersedes any of the same kind still queued or in flight
+        self.generations[kind] += 1
+        self.jobs.put((kind, self.generations[kind], job, args))
+
+    def _run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                return
+            kind, generation, job, args = item
+            if generation != self.generations[kind]:
+                continue
+            try:
+                with self.latency[kind].time():
+                    result = job(*args)
+            except Exception as e:
+                self.errors.inc()
+                result = e
+            try:
+                self._finished.emit(kind, generation, result)
+            except RuntimeError:
+                # The widget was destroyed while the request was in flight
+                return
+
+    def _deliver(self, kind, generation, result):
+        if generation != self.generations[kind]:
+            return
+        if isinstance(result, Exception):
+            print("Network error:", result)
+            self.weather_failed.emit(str(result))
+        elif kind == "city":
+            self.city_ready.emit(result)
+        elif kind == "locations":
+            self.locations_ready.emit(result)
+        else:
+            weather, temp = result
+            self.weather_ready.emit(weather, temp)
+
+class WeatherWidget(TranslucentPanel):
+    metrics_name = "weather"
+
+    def __init__(self, hosted=False, cities=None):
+        super().__init__(QColor(0, 0, 0, 120), radius=15)
+        self.hosted = hosted
+        self.city = None
+        # None means read WEATHER_CITIES when fetching starts; empty means follow the user's own city
+        self.cities = cities
+        self.locations_list = None
+        self.custom_font = get_font()
         self.initUI()
-        self.get_weather()
+        self.fetcher = WeatherFetcher(self)
+        self.fetcher.city_ready.connect(self.set_city)
+        self.fetcher.weather_ready.connect(self.update_ui)
+        self.fetcher.weather_failed.connect(self.show_fetch_error)
+        self.fetcher.locations_ready.connect(self.update_locations)
+        self.last_refresh = time.monotonic()
         self.setup_timer()
-        self.start_pos = None
+        self.dragger = WindowDragger(self, "weather")
+        self.control = CommandServer("weather", {
+            "show": self.show,
+            "hide": self.hide,
+            "refresh": self.get_weather,
+            "status": self.status,
+        }, self)
+        if not self.control.listen():
+            self.hand_over("weather")
+        coldstart.after_first_paint(self, self.start_fetching)
+
+        # Refreshes and the animation only run while the widget is on screen
+        self.power = PowerManager(self)
+        self.power.watch(self.timer.triggered)
+        self.power.watch(self.animation_player.timer.timeout)
+        self.power.suspended.connect(self.suspend_updates)
+        self.power.resumed.connect(self.resume_updates)
+
+    def start_fetching(self):
+        # Paint whatever is cached right away, then revalidate in the background
+        if self.cities is None:
+            self.cities = get_config()['cities']
+        if self.cities:
+            self.show_locations()
+            provider = get_provider()
+            cached = {city: provider.cached_current(city) for city in self.cities}
+            self.update_locations({city: result for city, result in cached.items() if result})
+            self.get_weather()
+            return
+        # The city from the last run, in case the location lookup has aged out of the cache
+        city = get_provider().cached_user_city() or Settings.instance().get("weather.city")
+        if city:
+            self.set_city(city)
+        self.last_refresh = time.monotonic()
+        self.fetcher.fetch_city()
+
+    def set_city(self, city):
+        if city == self.city:
+            return
+        self.city = city
+        Settings.instance().set("weather.city", city)
+        cached = get_provider().cached_current(city)
+        if cached:
+            self.update_ui(*cached)
+        self.get_weather()
 
     def initUI(self):
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnBottomHint)
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        self.setStyleSheet("background-color: rgba(0, 0, 0, 120); border-radius: 15px;")
         self.setFixedSize(300, 300)
 
         layout = QVBoxLayout()
         
         self.weather_gif_label = QLabel(self)
         self.weather_gif_label.setAlignment(Qt.AlignCenter)
+        self.weather_gif_label.setMinimumSize(GIF_SIZE)
         layout.addWidget(self.weather_gif_label)
+        self.animation_player = AnimationPlayer(self.weather_gif_label, self)
         
         self.weather_desc = QLabel("Loading...", self)
         self.weather_desc.setFont(self.custom_font)
@@ -73,44 +192,100 @@ class WeatherWidget(QWidget):
         layout.addWidget(self.close_button, alignment=Qt.AlignCenter)
 
         self.tray_icon = QSystemTrayIcon(self)
-        self.tray_icon.setIcon(QIcon("images/weather_icon.png"))
+        self.tray_icon.setIcon(get_icon("images/weather_icon.png"))
         self.tray_icon.setToolTip("Weather Widget")
 
         tray_menu = QMenu()
         show_action = tray_menu.addAction("Show")
         show_action.triggered.connect(self.show)
+        stats_action = tray_menu.addAction("Stats")
+        stats_action.triggered.connect(self.show_stats)
         exit_action = tray_menu.addAction("Exit")
-        exit_action.triggered.connect(QApplication.quit)
+        exit_action.triggered.connect(self.exit_widget)
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.activated.connect(self.on_tray_icon_left_click)
         self.tray_icon.show()
 
     def setup_timer(self):
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.get_weather)
-        self.timer.start(600000)
+        # Refreshes can slip half a minute (five when the machine is idle) to share wakeups
+        self.timer = Scheduler.instance().add_job(
+            "weather.refresh", REFRESH_INTERVAL_MS, tolerance_ms=30000, idle_tolerance_ms=300000, parent=self)
+        self.timer.triggered.connect(self.get_weather)
+
+    def suspend_updates(self):
+        self.timer.stop()
+        self.animation_player.pause()
+
+    def resume_updates(self):
+        self.animation_player.resume()
+        # Catch up straight away if a refresh fell due while suspended
+        remaining = self.timer.period_ms - int((time.monotonic() - self.last_refresh) * 1000)
+        if remaining <= 0:
+            self.get_weather()
+            self.timer.start()
+        else:
+            self.timer.start(remaining)
+
+    def adapt_interval(self):
+        # The provider may stretch the refresh, e.g. to keep within an API budget
+        interval = get_provider().refresh_interval(REFRESH_INTERVAL_MS, self.cities or [])
+        if interval != self.timer.period_ms:
+            self.timer.set_period(interval)
 
     def get_weather(self):
-        try:
-            response = requests.get(self.api_url)
-            if response.status_code == 200:
-                data = response.json()
-                weather = data['weather'][0]['main']
-                temp = data['main']['temp']
-                self.update_ui(weather, temp)
-            else:
-                self.weather_desc.setText("Error fetching weather")
-        except Exception as e:
-            print("Network error:", e)
-            self.weather_desc.setText("Error fetching weather")
+        self.last_refresh = time.monotonic()
+        self.adapt_interval()
+        if self.cities:
+            self.fetcher.fetch_locations(self.cities)
+        elif self.city is None:
+            self.fetcher.fetch_city()
+        else:
+            self.fetcher.fetch_weather(self.city)
+
+    def show_locations(self):
+        if self.locations_list is not None:
+            return
+        self.locations_list = QListWidget(self)
+        self.locations_list.setFont(self.custom_font)
+        self.locations_list.setStyleSheet("background-color: transparent; color: white; border: none; font-size: 14px;")
+        self.locations_list.setFocusPolicy(Qt.NoFocus)
+        for city in self.cities:
+            self.locations_list.addItem(QListWidgetItem(city))
+        # Above the close button
+        self.layout().insertWidget(self.layout().count() - 1, self.locations_list)
+        self.setFixedSize(300, 460)
+
+    def update_locations(self, results):
+        for row, city in enumerate(self.cities):
+            result = results.get(city)
+            if result is None:
+                continue
+            item = self.locations_list.item(row)
+            if isinstance(result, Exception):
+                # Keep showing the last good reading rather than an error
+                if item.text() == city:
+                    item.setText(f"{city}  unavailable")
+                continue
+            weather, temp = result
+            text = f"{city}  {weather}  {temp}°C"
+            if item.text() != text:
+                item.setText(text)
+        # The first city gets the big animated view
+        first = results.get(self.cities[0])
+        if first is not None and not isinstance(first, Exception):
+            self.city = self.cities[0]
+            self.update_ui(*first)
+
+    def show_fetch_error(self, message):
+        self.weather_desc.setText("Error fetching weather")
 
     def update_ui(self, weather, temp):
         self.temperature.setText(f"{temp}°C")
         self.weather_desc.setText(weather)
 
         gif_path = self.get_gif_path(weather)
-        if gif_path and os.path.exists(gif_path):
-            self.display_weather_gif(gif_path)
+        if gif_path and resource_exists(gif_path):
+            self.display_weather_gif(resource_path(gif_path))
 
     def get_gif_path(self, weather):
         weather_conditions = {
@@ -133,9 +308,26 @@ class WeatherWidget(QWidget):
         return weather_conditions.get(weather, "images/weather/clear/sunny.gif")
 
     def display_weather_gif(self, gif_path):
-        gif = QMovie(gif_path)
-        self.weather_gif_label.setMovie(gif)
-        gif.start()
+        # Same condition returns the same decoded animation, so playback just continues
+        self.animation_player.play(animation_cache.get(gif_path, self.weather_gif_label.minimumSize()))
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "hosted": self.hosted,
+            "visible": self.isVisible(),
+            "city": self.city,
+            "locations": len(self.cities or []),
+            "weather": self.weather_desc.text(),
+            "temperature": self.temperature.text(),
+            "last_refresh_s": round(time.monotonic() - self.last_refresh, 1),
+            "refresh_ms": self.timer.period_ms,
+            "wakeups_per_minute": self.power.wakeups_per_minute(),
+            **get_provider().status(),
+        }
+
+    def show_stats(self):
+        metrics.show_stats(self, {"weather", "http", "loop"})
 
     def hide_to_tray(self):
         self.hide()
@@ -146,6 +338,10 @@ class WeatherWidget(QWidget):
             3000,
         )
 
+    def teardown(self):
+        self.fetcher.stop()
+        self.animation_player.stop()
+
     def on_tray_icon_left_click(self, reason):
         if reason == QSystemTrayIcon.Trigger:
             self.show()
@@ -157,20 +353,26 @@ class WeatherWidget(QWidget):
         self.opacity_effect.setOpacity(0.01)
 
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.start_pos = event.globalPos() - self.frameGeometry().topLeft()
-            event.accept()
+        self.dragger.press(event)
 
     def mouseMoveEvent(self, event):
-        if event.buttons() == Qt.LeftButton and self.start_pos:
-            self.move(event.globalPos() - self.start_pos)
-            event.accept()
+        self.dragger.move(event)
+
+    def mouseReleaseEvent(self, event):
+        self.dragger.release(event)
+
+def create_weather(hosted=False, cities=None):
+    widget = WeatherWidget(hosted, cities)
+    widget.show()
+    widget.dragger.restore(QPoint(1440, 0))
+    return widget
 
 def run_weather():
     app = QApplication(sys.argv)
-    widget = WeatherWidget()
-    widget.show()
-    widget.move(1440, 0)
+    if send_command("weather", "show") is not None:
+        return
+    quit_on_terminate(app)
+    widget = create_weather()
     app.exec_()
 
 if __name__ == '__main__':
@@ -0,0 +1,420 @@
+import os
+import time
+import threading
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+from http_cache import HttpCache
+from quota import ApiBudget
+from storage import data_dir, FileLock, read_json, atomic_write_json
+
+_config = None
+_config_lock = threading.Lock()
+
+def _env_int(name, default):
+    # A malformed value falls back to the default instead of failing every fetch
+    value = os.getenv(name)
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        print(f"Ignoring {name}={value!r}, using {default}")
+        return default
+
+def get_config():
+    # .env is only read when the first fetch needs it, not at import
+    global _config
+    with _config_lock:
+        if _config is None:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _config = {
+                # openweather (default), record:<path> or replay:<path>
+                'provider': os.getenv('WEATHER_PROVIDER', 'openweather'),
+                'api_key': os.getenv('API_KEY'),
+                'geo_api_url': os.getenv('GEO_API_URL', 'https://ipinfo.io'),
+                'weather_api_url': os.getenv('WEATHER_API_URL', 'http://api.openweathermap.org/data/2.5/weather'),
+                'group_api_url': os.getenv('WEATHER_GROUP_API_URL', 'http://api.openweathermap.org/data/2.5/group'),
+                'find_api_url': os.getenv('WEATHER_FIND_API_URL', 'http://api.openweathermap.org/data/2.5/find'),
+                # Semicolon separated, so OpenWeather's "Paris,FR" stays one city; more
+                # than none switches the widget to the multi-location view
+                'cities': [city.strip() for city in os.getenv('WEATHER_CITIES', '').split(';') if city.strip()],
+                # OpenWeather calls allowed across every widget process on the machine
+                'calls_per_minute': _env_int('WEATHER_CALLS_PER_MINUTE', 50),
+                'calls_per_day': _env_int('WEATHER_CALLS_PER_DAY', 1000),
+            }
+        return _config
+
+# (connect, read) timeouts in seconds for every HTTP call
+REQUEST_TIMEOUT = (3.05, 10)
+
+# How long cached responses are served without revalidating, in seconds.
+# Weather stays just under the 10 minute refresh so each tick revalidates.
+GEO_TTL = 6 * 60 * 60
+WEATHER_TTL = 9 * 60
+
+http_cache = HttpCache()
+
+# OpenWeather's group endpoint answers for up to 20 city ids per request
+GROUP_BATCH_SIZE = 20
+# Requests in flight at once when cities have to be fetched one by one
+FANOUT_WORKERS = 8
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    # One keep-alive session per process, shared by every weather widget.
+    # requests is imported here, on the fetch thread, rather than at startup.
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            # Enough pooled connections for a whole fan-out to reuse
+            adapter = HTTPAdapter(pool_maxsize=FANOUT_WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+class WeatherProvider:
+    # What the weather widget needs from a backend. Readings are
+    # (condition, temperature in Celsius), with conditions named like
+    # OpenWeather's "main" field (Clear, Clouds, Rain, ...) so the widget
+    # can pick an animation. Everything except the cached_* methods may block
+    # and is only called from the fetch thread.
+    name = "base"
+
+    def user_city(self):
+        raise NotImplementedError
+
+    def current(self, city):
+        raise NotImplementedError
+
+    def current_many(self, cities):
+        # {city: reading or Exception}; providers with a batch API override this
+        results = {}
+        for city in cities:
+            try:
+                results[city] = self.current(city)
+            except Exception as e:
+                results[city] = e
+        return results
+
+    def cached_user_city(self):
+        return None
+
+    def cached_current(self, city):
+        return None
+
+    def refresh_interval(self, base_ms, cities):
+        return base_ms
+
+    def status(self):
+        return {"provider": self.name}
+
+
+class OpenWeatherProvider(WeatherProvider):
+    # OpenWeather for readings, ipinfo.io for the user's city
+    name = "openweather"
+
+    def __init__(self):
+        self._budget = None
+        self._budget_lock = threading.Lock()
+        self._city_ids = None
+        self._city_ids_lock = threading.Lock()
+
+    def budget(self):
+        with self._budget_lock:
+            if self._budget is None:
+                config = get_config()
+                self._budget = ApiBudget("openweather", config['calls_per_minute'], config['calls_per_day'])
+            return self._budget
+
+    @staticmethod
+    def parse(data):
+        return data['weather'][0]['main'], data['main']['temp']
+
+    @staticmethod
+    def url(city):
+        config = get_config()
+        # Encoded, since the URL is also the city's cache key
+        return f"{config['weather_api_url']}?q={quote(city, safe='')}&appid={config['api_key']}&units=metric"
+
+    def user_city(self):
+        try:
+            geo_data = http_cache.get(get_session(), get_config()['geo_api_url'], GEO_TTL, REQUEST_TIMEOUT)
+            return geo_data.get('city', 'London')
+        except Exception as e:
+            print("Error fetching location:", e)
+        return 'London'
+
+    def current(self, city):
+        return self.parse(http_cache.get(get_session(), self.url(city), WEATHER_TTL, REQUEST_TIMEOUT, self.budget()))
+
+    @staticmethod
+    def city_ids_path():
+        return os.path.join(data_dir(), "city_ids.json")
+
+    def city_ids(self):
+        # City name -> OpenWeather id. Ids do not change, so each city is only
+        # ever looked up once and the answer is kept for good, shared by every
+        # widget process.
+        with self._city_ids_lock:
+            if self._city_ids is None:
+                self._city_ids = read_json(self.city_ids_path(), {}) or {}
+            return self._city_ids
+
+    def remember_city_ids(self, found):
+        path = self.city_ids_path()
+        with self._city_ids_lock:
+            with FileLock(path + ".lock"):
+                ids = read_json(path, {}) or {}
+                ids.update(found)
+                atomic_write_json(path, ids)
+            self._city_ids = ids
+
+    def find_city_id(self, city):
+        config = get_config()
+        self.budget().acquire()
+        response = get_session().get(
+            f"{config['find_api_url']}?q={quote(city, safe='')}&type=accurate&appid={config['api_key']}", timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        matches = response.json().get('list', [])
+        return matches[0]['id'] if matches else None
+
+    def resolve_city_ids(self, cities, entries, pool):
+        # Ids from city_ids.json, else from a cached answer for the city, else
+        # from one find request per city, made in parallel over the pooled session
+        known = self.city_ids()
+        ids = {}
+        found = {}
+        lookups = []
+        for city in cities:
+            entry = entries[city]
+            if city in known:
+                ids[city] = known[city]
+            elif entry is not None and entry["body"].get('id'):
+                found[city] = entry["body"]['id']
+            else:
+                lookups.append((city, pool.submit(self.find_city_id, city)))
+        for city, future in lookups:
+            try:
+                city_id = future.result()
+            except Exception as e:
+                print(f"Error looking up {city}:", e)
+                continue
+            if city_id is not None:
+                found[city] = city_id
+        if found:
+            self.remember_city_ids(found)
+            ids.update(found)
+        return ids
+
+    def fetch_group(self, city_ids):
+        config = get_config()
+        ids = ",".join(str(city_id) for city_id in city_ids)
+        self.budget().acquire()
+        response = get_session().get(
+            f"{config['group_api_url']}?id={ids}&appid={config['api_key']}&units=metric", timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response, response.json().get('list', [])
+
+    def current_many(self, cities):
+        # Every city goes out by id, GROUP_BATCH_SIZE to a request. The first
+        # time a city is seen its id is looked up (see resolve_city_ids); only
+        # cities that lookup could not resolve are fetched by name. Every
+        # answer is cached under the city's own URL.
+        results = {}
+        entries = {}
+        stale = []
+        for city in cities:
+            entry = entries[city] = http_cache.load(self.url(city))
+            if http_cache.is_fresh(entry):
+                results[city] = self.parse(entry["body"])
+            else:
+                stale.append(city)
+        if not stale:
+            return results
+
+        with ThreadPoolExecutor(max_workers=FANOUT_WORKERS) as pool:
+            city_ids = self.resolve_city_ids(stale, entries, pool)
+            # Several configured names can be the same city, e.g. "NYC" and "New York"
+            by_id = {}
+            for city in stale:
+                if city in city_ids:
+                    by_id.setdefault(city_ids[city], []).append(city)
+            by_name = [city for city in stale if city not in city_ids]
+            ids = list(by_id)
+            batches = [ids[i:i + GROUP_BATCH_SIZE] for i in range(0, len(ids), GROUP_BATCH_SIZE)]
+            groups = [(batch, pool.submit(self.fetch_group, batch)) for batch in batches]
+            singles = [(city, pool.submit(self.current, city)) for city in by_name]
+            for batch, future in groups:
+                try:
+                    response, bodies = future.result()
+                    for body in bodies:
+                        for city in by_id.get(body.get('id'), []):
+                            http_cache.store(self.url(city), body, response, WEATHER_TTL)
+                            results[city] = self.parse(body)
+                except Exception as e:
+                    print("Error fetching weather group:", e)
+                # Cities the group did not answer keep their last known weather, if any
+                for city_id in batch:
+                    for city in by_id[city_id]:
+                        if city not in results:
+                            entry = entries[city]
+                            results[city] = self.parse(entry["body"]) if entry else LookupError(f"no weather for {city}")
+            for city, future in singles:
+                try:
+                    results[city] = future.result()
+                except Exception as e:
+                    results[city] = e
+        return results
+
+    def cached_user_city(self):
+        # Last known city straight from disk, without touching the network
+        entry = http_cache.load(get_config()['geo_api_url'])
+        return entry["body"].get('city') if entry else None
+
+    def cached_current(self, city):
+        entry = http_cache.load(self.url(city))
+        try:
+            return self.parse(entry["body"]) if entry else None
+        except (KeyError, IndexError, TypeError):
+            return None
+
+    def refresh_interval(self, base_ms, cities):
+        # Refresh less often once the shared daily budget would not last the
+        # day, counting the one-off lookups of cities whose id is not known yet
+        known = self.city_ids()
+        calls = -(-len(cities) // GROUP_BATCH_SIZE) + sum(1 for city in cities if city not in known) if cities else 1
+        return self.budget().refresh_interval(base_ms, calls)
+
+    def status(self):
+        return {"provider": self.name, "quota_left": self.budget().remaining()}
+
+
+class RecordReplayProvider(WeatherProvider):
+    # With an inner provider, passes every call through and records the answer,
+    # error and latency to a JSON file. Without one, answers from that file, so
+    # the widget and benchmarks run offline and deterministically; realtime
+    # also replays the recorded latency.
+    name = "replay"
+
+    def __init__(self, path, inner=None, realtime=False):
+        self.path = path
+        self.inner = inner
+        self.realtime = realtime
+        self.lock = threading.Lock()
+        self.tape = read_json(path, None) or {"user_city": None, "current": {}}
+        if inner is not None:
+            self.name = f"record({inner.name})"
+
+    def _record(self, key, city, started, result=None, error=None):
+        entry = {"latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+        if error is not None:
+            entry["error"] = str(error)
+        else:
+            entry["result"] = list(result) if isinstance(result, tuple) else result
+        with self.lock:
+            if key == "user_city":
+                self.tape["user_city"] = entry
+            else:
+                self.tape["current"][city] = entry
+            atomic_write_json(self.path, self.tape)
+
+    def _replay(self, entry, what):
+        if entry is None:
+            raise LookupError(f"nothing recorded for {what}")
+        if self.realtime:
+            time.sleep(entry["latency_ms"] / 1000)
+        if "error" in entry:
+            raise RuntimeError(entry["error"])
+        result = entry["result"]
+        return tuple(result) if isinstance(result, list) else result
+
+    def user_city(self):
+        if self.inner is None:
+            return self._replay(self.tape["user_city"], "the user's city")
+        started = time.perf_counter()
+        city = self.inner.user_city()
+        self._record("user_city", None, started, city)
+        return city
+
+    def current(self, city):
+        if self.inner is None:
+            return self._replay(self.tape["current"].get(city), city)
+        started = time.perf_counter()
+        try:
+            reading = self.inner.current(city)
+        except Exception as e:
+            self._record("current", city, started, error=e)
+            raise
+        self._record("current", city, started, reading)
+        return reading
+
+    def current_many(self, cities):
+        if self.inner is None:
+            return super().current_many(cities)
+        started = time.perf_counter()
+        results = self.inner.current_many(cities)
+        for city, result in results.items():
+            if isinstance(result, Exception):
+                self._record("current", city, started, error=result)
+            else:
+                self._record("current", city, started, result)
+        return results
+
+    def cached_user_city(self):
+        if self.inner is not None:
+            return self.inner.cached_user_city()
+        entry = self.tape["user_city"]
+        return entry.get("result") if entry else None
+
+    def cached_current(self, city):
+        if self.inner is not None:
+            return self.inner.cached_current(city)
+        entry = self.tape["current"].get(city)
+        return tuple(entry["result"]) if entry and "result" in entry else None
+
+    def refresh_interval(self, base_ms, cities):
+        return self.inner.refresh_interval(base_ms, cities) if self.inner is not None else base_ms
+
+    def status(self):
+        status = self.inner.status() if self.inner is not None else {}
+        status["provider"] = self.name
+        status["tape"] = self.path
+        return status
+
+
+# Providers selectable by name through WEATHER_PROVIDER
+PROVIDERS = {
+    "openweather": OpenWeatherProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def make_provider(spec):
+    mode, _, path = spec.partition(":")
+    if mode == "replay":
+        return RecordReplayProvider(path)
+    if mode == "record":
+        return RecordReplayProvider(path, PROVIDERS["openweather"]())
+    if spec not in PROVIDERS:
+        raise ValueError(f"unknown weather provider {spec!r}")
+    return PROVIDERS[spec]()
+
+def get_provider():
+    # One provider per process, shared by every weather widget in it
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = make_provider(get_config()['provider'])
+        return _provider
+
+def set_provider(provider):
+    global _provider
+    with _provider_lock:
+        _provider = provider